@@ -0,0 +1,19 @@
+"""壓測工具：生成大規模模擬數據，並通過應用本身併發請求所有 /api/* 接口
+
+用法示例：
+    python -m benchmarks seed --db /tmp/bench.db --likes 1000000
+    python -m benchmarks run --db /tmp/bench.db --sessions 16 --output report.json
+    python -m benchmarks register-race --db /tmp/bench.db --codes 5 --registrants-per-code 8
+    python -m benchmarks serialize --db /tmp/bench.db --rows 50000
+    python -m benchmarks startup --db /tmp/bench.db --workers 4
+    python -m benchmarks compare base.json report.json
+"""
+import os
+
+
+def load_app(db_path, **config):
+    """以指定的數據庫創建應用，config 覆蓋默認配置"""
+    from src.main import create_app
+    # 壓測在線程中模擬會話，stream_connect 場景只測量建立連接，不要求 gevent worker
+    config.setdefault('EVENT_STREAM_REQUIRE_ASYNC', False)
+    return create_app(dict(config, SQLALCHEMY_DATABASE_URI=f'sqlite:///{os.path.abspath(db_path)}'))
@@ -0,0 +1,128 @@
+import argparse
+import json
+import sys
+from benchmarks import load_app
+
+
+def _seed(args):
+    app = load_app(args.db)
+    from benchmarks.seed import seed_database
+    with app.app_context():
+        counts = seed_database(
+            users=args.users, posts=args.posts, comments=args.comments, post_likes=args.likes,
+            comment_likes=args.comment_likes, invite_codes=args.invite_codes, zipf=args.zipf,
+            chunk_size=args.chunk_size, random_seed=args.seed,
+        )
+    print(json.dumps(counts, ensure_ascii=False))
+
+
+def _run(args):
+    config = {'PASSWORD_POOL_WORKERS': args.password_workers} if args.password_workers is not None else {}
+    app = load_app(args.db, **config)
+
+    from benchmarks.load import run_load
+    report = run_load(app, sessions=args.sessions, requests_per_session=args.requests, random_seed=args.seed)
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+
+
+def _register_race(args):
+    config = {'PASSWORD_POOL_WORKERS': args.password_workers} if args.password_workers is not None else {}
+    app = load_app(args.db, **config)
+
+    from benchmarks.load import run_registration_race
+    report = run_registration_race(app, codes=args.codes, registrants_per_code=args.registrants_per_code)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 1 if report['problems'] else 0
+
+
+def _serialize(args):
+    app = load_app(args.db)
+    from benchmarks.serialization import run_serialization_benchmark
+    report = run_serialization_benchmark(app, rows=args.rows, repeat=args.repeat, user_id=args.user_id)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+def _startup(args):
+    from benchmarks.startup import run_startup_benchmark
+    report = run_startup_benchmark(args.db, repeat=args.repeat, workers=args.workers)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 1 if report.get('preload', {}).get('failed') else 0
+
+
+def _compare(args):
+    from benchmarks.load import compare_reports
+    with open(args.base, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(args.current, encoding='utf-8') as f:
+        current = json.load(f)
+
+    regressed = False
+    print(f"{'接口':<24}{'指標':<10}{base.get('commit') or 'base':>12}{current.get('commit') or 'current':>12}")
+    for name, metric, before, after, worse in compare_reports(base, current, threshold=args.threshold):
+        regressed = regressed or worse
+        print(f"{name:<24}{metric:<10}{before:>12}{after:>12}{'  <-- 退化' if worse else ''}")
+    return 1 if regressed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed = commands.add_parser('seed', help='生成模擬數據')
+    seed.add_argument('--db', required=True, help='SQLite 數據庫文件，不存在時自動創建')
+    seed.add_argument('--users', type=int, default=10000)
+    seed.add_argument('--posts', type=int, default=50000)
+    seed.add_argument('--comments', type=int, default=200000)
+    seed.add_argument('--likes', type=int, default=1000000, help='帖子點讚數')
+    seed.add_argument('--comment-likes', type=int, default=300000)
+    seed.add_argument('--invite-codes', type=int, default=1000)
+    seed.add_argument('--zipf', type=float, default=1.1, help='Zipf 分佈指數，越大越集中在熱門帖子')
+    seed.add_argument('--chunk-size', type=int, default=20000)
+    seed.add_argument('--seed', type=int, default=42)
+    seed.set_defaults(handler=_seed)
+
+    run = commands.add_parser('run', help='併發壓測所有 /api/* 接口並輸出 JSON 報告')
+    run.add_argument('--db', required=True)
+    run.add_argument('--sessions', type=int, default=16, help='併發模擬會話數')
+    run.add_argument('--requests', type=int, default=200, help='每個會話的請求數')
+    run.add_argument('--password-workers', type=int, default=None, help='覆蓋 PASSWORD_POOL_WORKERS')
+    run.add_argument('--output', help='報告寫入的文件')
+    run.add_argument('--seed', type=int, default=42)
+    run.set_defaults(handler=_run)
+
+    register_race = commands.add_parser('register-race', help='多人同時用少量邀請碼註冊，檢查沒有重複佔用')
+    register_race.add_argument('--db', required=True)
+    register_race.add_argument('--codes', type=int, default=5, help='爭搶的邀請碼數')
+    register_race.add_argument('--registrants-per-code', type=int, default=8, help='每個邀請碼同時註冊的人數')
+    register_race.add_argument('--password-workers', type=int, default=None, help='覆蓋 PASSWORD_POOL_WORKERS')
+    register_race.set_defaults(handler=_register_race)
+
+    serialize = commands.add_parser('serialize', help='對比 ORM 與列投影讀取路徑、默認與快速 JSON 的每秒行數')
+    serialize.add_argument('--db', required=True)
+    serialize.add_argument('--rows', type=int, default=50000)
+    serialize.add_argument('--repeat', type=int, default=3)
+    serialize.add_argument('--user-id', type=int, default=1, help='計算 liked_by_user 所用的用戶')
+    serialize.set_defaults(handler=_serialize)
+
+    startup = commands.add_parser('startup', help='測量冷啟動各階段耗時，以及預加載後 fork 出的 worker 就緒時間')
+    startup.add_argument('--db', required=True)
+    startup.add_argument('--repeat', type=int, default=5, help='冷啟動次數')
+    startup.add_argument('--workers', type=int, default=4, help='預加載後 fork 的 worker 數')
+    startup.set_defaults(handler=_startup)
+
+    compare = commands.add_parser('compare', help='對比兩份報告的 p95 延遲和 SQL 數')
+    compare.add_argument('base')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=0.1, help='超過該比例視為退化')
+    compare.set_defaults(handler=_compare)
+
+    args = parser.parse_args(argv)
+    return args.handler(args) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,347 @@
+import math
+import random
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from sqlalchemy import event
+from src.models.user import db, User, InviteCode, Post, Comment
+from src.utils.init_data import generate_invite_codes
+from benchmarks.seed import BENCH_PASSWORD, ZipfSampler
+
+# 場景名 -> 權重；大致模擬瀏覽為主、少量寫入的論壇流量
+DEFAULT_MIX = {
+    'list_posts': 30,
+    'list_posts_next_page': 8,
+    'get_post': 20,
+    'get_post_comments': 15,
+    'like_post': 8,
+    'like_comment': 4,
+    'create_comment': 3,
+    'delete_comment': 1,
+    'create_post': 1,
+    'search': 4,
+    'me': 3,
+    'get_user': 2,
+    'stream_connect': 1,
+}
+
+
+class StatementCounter:
+    """按線程統計 SQL 語句數；每個模擬會話在自己的線程中同步發請求"""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def install(self, engines):
+        # 讀寫分離時讀連接和寫連接屬於不同的 engine
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    def reset(self):
+        self._local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self._local, 'count', 0)
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, statements, status, ok):
+        with self._lock:
+            self.samples[name].append((seconds, statements))
+            if not ok:
+                self.errors[name][status] += 1
+
+
+def percentile(sorted_values, fraction):
+    """最近秩百分位數"""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def _summarize(samples, errors, elapsed):
+    latencies = sorted(seconds * 1000 for seconds, _ in samples)
+    statements = [count for _, count in samples]
+    return {
+        'requests': len(samples),
+        'errors': sum(errors.values()),
+        'error_status': {str(status): count for status, count in sorted(errors.items())},
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50), 3),
+            'p95': round(percentile(latencies, 0.95), 3),
+            'p99': round(percentile(latencies, 0.99), 3),
+            'max': round(latencies[-1], 3),
+        },
+        'sql_per_request': {
+            'avg': round(sum(statements) / len(statements), 2),
+            'max': max(statements),
+        },
+    }
+
+
+class Session:
+    """一個模擬用戶：自己的 test_client 和 cookie，按權重隨機選擇接口"""
+
+    def __init__(self, app, username, context, random_seed):
+        self.client = app.test_client()
+        self.username = username
+        self.context = context
+        self.rng = random.Random(f'{random_seed}:{username}')
+        self.next_cursor = None
+        self.own_comments = []
+
+    def call(self, name, method, url, recorder, counter, expected=(200,), **kwargs):
+        counter.reset()
+        started = time.perf_counter()
+        response = getattr(self.client, method)(url, **kwargs)
+        elapsed = time.perf_counter() - started
+        recorder.add(name, elapsed, counter.count, response.status_code, response.status_code in expected)
+        return response
+
+    def login(self, recorder, counter, attempts=20):
+        """登錄；哈希進程池滿時返回 503，按 Retry-After 的思路稍後重試"""
+        for _ in range(attempts):
+            response = self.call('login', 'post', '/api/login', recorder, counter, expected=(200, 503),
+                                 json={'username': self.username, 'password': BENCH_PASSWORD})
+            if response.status_code != 503:
+                return response
+            time.sleep(0.1)
+        raise RuntimeError(f'{self.username} 登錄失敗')
+
+    def hot_post(self):
+        return self.context['post_ids'][self.context['post_sampler'].sample()]
+
+    def hot_comment(self):
+        return self.context['comment_ids'][self.context['comment_sampler'].sample()]
+
+    def run_scenario(self, name, recorder, counter):
+        if name == 'list_posts':
+            data = self.call(name, 'get', '/api/posts', recorder, counter).get_json() or {}
+            self.next_cursor = data.get('next_cursor')
+        elif name == 'list_posts_next_page':
+            if not self.next_cursor:
+                return self.run_scenario('list_posts', recorder, counter)
+            data = self.call(name, 'get', f'/api/posts?cursor={self.next_cursor}', recorder, counter).get_json() or {}
+            self.next_cursor = data.get('next_cursor')
+        elif name == 'get_post':
+            self.call(name, 'get', f'/api/posts/{self.hot_post()}', recorder, counter)
+        elif name == 'get_post_comments':
+            self.call(name, 'get', f'/api/posts/{self.hot_post()}/comments', recorder, counter)
+        elif name == 'like_post':
+            self.call(name, 'post', f'/api/posts/{self.hot_post()}/like', recorder, counter)
+        elif name == 'like_comment':
+            if self.context['comment_ids']:
+                self.call(name, 'post', f'/api/comments/{self.hot_comment()}/like', recorder, counter)
+        elif name == 'create_comment':
+            response = self.call(name, 'post', f'/api/posts/{self.hot_post()}/comments', recorder, counter,
+                                 expected=(201,), json={'content': f'load test comment {self.rng.random()}'})
+            if response.status_code == 201:
+                self.own_comments.append(response.get_json()['comment']['id'])
+        elif name == 'delete_comment':
+            if self.own_comments:
+                self.call(name, 'delete', f'/api/comments/{self.own_comments.pop()}', recorder, counter)
+        elif name == 'create_post':
+            self.call(name, 'post', '/api/posts', recorder, counter, expected=(201,),
+                      json={'title': 'load test post', 'content': f'load test content {self.rng.random()}'})
+        elif name == 'search':
+            term = f'topic{self.rng.randrange(97)}'
+            self.call(name, 'get', f'/api/search?q={term}', recorder, counter)
+        elif name == 'me':
+            self.call(name, 'get', '/api/me', recorder, counter)
+        elif name == 'get_user':
+            self.call(name, 'get', f'/api/users/{self.rng.choice(self.context["user_ids"])}', recorder, counter)
+        elif name == 'stream_connect':
+            # 只測量建立 SSE 連接並收到首個消息的耗時，隨即斷開
+            counter.reset()
+            started = time.perf_counter()
+            response = self.client.get('/api/stream', buffered=False)
+            if response.status_code == 200:
+                next(response.response)
+            response.close()
+            recorder.add(name, time.perf_counter() - started, counter.count, response.status_code,
+                         response.status_code == 200)
+
+
+def _load_context(sessions, rng):
+    post_ids = [row[0] for row in db.session.query(Post.id).order_by(Post.likes_count.desc(), Post.id).limit(5000)]
+    comment_ids = [row[0] for row in db.session.query(Comment.id).order_by(Comment.likes_count.desc(), Comment.id)
+                   .limit(5000)]
+    users = db.session.query(User.id, User.username).filter(User.username.like('bench\\_%', escape='\\')) \
+        .order_by(User.id).limit(sessions * 4).all()
+    invite_codes = [row[0] for row in db.session.query(InviteCode.code).filter(InviteCode.is_used.isnot(True))
+                    .limit(sessions * 2)]
+    if not post_ids or len(users) < sessions:
+        raise RuntimeError('數據不足，請先執行 python -m benchmarks seed')
+    return {
+        'post_ids': post_ids,
+        'comment_ids': comment_ids,
+        'post_sampler': ZipfSampler(len(post_ids), 1.1, rng),
+        'comment_sampler': ZipfSampler(len(comment_ids), 1.1, rng) if comment_ids else None,
+        'user_ids': [user_id for user_id, _ in users],
+        'usernames': [username for _, username in users][:sessions],
+        'invite_codes': invite_codes,
+    }
+
+
+def run_load(app, sessions=16, requests_per_session=200, mix=None, random_seed=42):
+    """併發運行模擬會話，返回 JSON 可序列化的報告
+
+    每個會話先登錄（計入 login），按權重發出 requests_per_session 個請求，
+    最後登出並用未使用的邀請碼註冊一個新用戶（計入 register）。
+    """
+    mix = mix or DEFAULT_MIX
+    rng = random.Random(random_seed)
+    counter = StatementCounter()
+    recorder = Recorder()
+    with app.app_context():
+        counter.install(db.engines.values())
+        context = _load_context(sessions, rng)
+
+    names, weights = list(mix), list(mix.values())
+    barrier = threading.Barrier(sessions + 1)
+
+    def worker(index):
+        session = Session(app, context['usernames'][index], context, random_seed)
+        session.login(recorder, counter)
+        barrier.wait()
+        for name in session.rng.choices(names, weights=weights, k=requests_per_session):
+            session.run_scenario(name, recorder, counter)
+        session.call('logout', 'post', '/api/logout', recorder, counter)
+        if index < len(context['invite_codes']):
+            session.call('register', 'post', '/api/register', recorder, counter, expected=(201,),
+                         json={'username': f'load_{index}_{time.time_ns()}',
+                               'password': BENCH_PASSWORD, 'inviteCode': context['invite_codes'][index]})
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(sessions)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    all_samples = [sample for samples in recorder.samples.values() for sample in samples]
+    all_errors = defaultdict(int)
+    for errors in recorder.errors.values():
+        for status, count in errors.items():
+            all_errors[status] += count
+    return {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {'sessions': sessions, 'requests_per_session': requests_per_session, 'mix': mix},
+        'elapsed_s': round(elapsed, 3),
+        'total': _summarize(all_samples, all_errors, elapsed),
+        'endpoints': {
+            name: _summarize(samples, recorder.errors[name], elapsed)
+            for name, samples in sorted(recorder.samples.items())
+        },
+    }
+
+
+def run_registration_race(app, codes=5, registrants_per_code=8):
+    """多個註冊者同時搶少量邀請碼，檢查每個邀請碼只被一個用戶佔用
+
+    新生成 codes 個邀請碼，每個邀請碼由 registrants_per_code 個會話在同一時刻提交註冊。
+    每個邀請碼應恰好有一個 201，其餘返回 400 或 409；哈希進程池滿時的 503 按
+    Retry-After 的思路重試。返回的報告中 problems 為空表示沒有重複佔用。
+    """
+    counter = StatementCounter()
+    recorder = Recorder()
+    with app.app_context():
+        counter.install(db.engines.values())
+        invite_codes = generate_invite_codes(codes)
+        db.session.execute(InviteCode.__table__.insert(), [{'code': code} for code in invite_codes])
+        db.session.commit()
+
+    registrants = [(code, index) for code in invite_codes for index in range(registrants_per_code)]
+    statuses = defaultdict(list)
+    barrier = threading.Barrier(len(registrants) + 1)
+
+    def worker(code, index):
+        client = app.test_client()
+        payload = {'username': f'race_{code}_{index}_{time.time_ns()}', 'password': BENCH_PASSWORD,
+                   'inviteCode': code}
+        barrier.wait()
+        while True:
+            counter.reset()
+            started = time.perf_counter()
+            response = client.post('/api/register', json=payload)
+            status = response.status_code
+            recorder.add('register', time.perf_counter() - started, counter.count, status, status in (201, 400, 409))
+            if status != 503:
+                break
+            time.sleep(0.1)
+        statuses[code].append(status)
+
+    threads = [threading.Thread(target=worker, args=registrant) for registrant in registrants]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        users = defaultdict(list)
+        for user_id, code in db.session.query(User.id, User.invite_code).filter(User.invite_code.in_(invite_codes)):
+            users[code].append(user_id)
+        claimed_by = dict(db.session.query(InviteCode.code, InviteCode.used_by_user_id)
+                          .filter(InviteCode.code.in_(invite_codes), InviteCode.is_used.is_(True)))
+
+    problems = []
+    for code in invite_codes:
+        winners = statuses[code].count(201)
+        losers = [status for status in statuses[code] if status != 201]
+        if winners != 1 or len(users[code]) != 1:
+            problems.append(f'{code}: {winners} 個 201，{len(users[code])} 個用戶')
+        elif claimed_by.get(code) != users[code][0]:
+            problems.append(f'{code}: 邀請碼記錄的用戶 {claimed_by.get(code)} 與註冊用戶 {users[code][0]} 不一致')
+        if any(status not in (400, 409) for status in losers):
+            problems.append(f'{code}: 失敗的註冊返回了 {sorted(set(losers))}')
+
+    return {
+        'commit': _git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {'codes': codes, 'registrants_per_code': registrants_per_code},
+        'elapsed_s': round(elapsed, 3),
+        'register': _summarize(recorder.samples['register'], recorder.errors['register'], elapsed),
+        'status': {code: sorted(code_statuses) for code, code_statuses in statuses.items()},
+        'problems': problems,
+    }
+
+
+def compare_reports(base, current, threshold=0.1):
+    """對比兩份報告中各接口的 p95 和平均 SQL 數，返回 [(接口, 指標, 舊值, 新值, 是否退化)]"""
+    rows = []
+    for name, stats in sorted(current['endpoints'].items()):
+        old = base['endpoints'].get(name)
+        if old is None:
+            continue
+        for metric, before, after in (
+            ('p95_ms', old['latency_ms']['p95'], stats['latency_ms']['p95']),
+            ('sql_avg', old['sql_per_request']['avg'], stats['sql_per_request']['avg']),
+        ):
+            regressed = after > before * (1 + threshold) if before else after > before
+            rows.append((name, metric, before, after, regressed))
+    return rows
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
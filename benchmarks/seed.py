@@ -0,0 +1,143 @@
+import itertools
+import random
+import time
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, func
+from werkzeug.security import generate_password_hash
+from src.models.user import db, User, InviteCode, Post, Comment, PostLike, CommentLike
+from src.utils.init_data import generate_invite_codes
+from src.utils.ranking import rescore
+from src.utils.search import rebuild_search_index
+
+BENCH_PASSWORD = 'bench-password'
+
+# 用戶名格式固定，壓測時按編號登錄
+def bench_username(index):
+    return f'bench_{index:07d}'
+
+
+class ZipfSampler:
+    """按 Zipf 分佈抽取 0..n-1，編號越小越熱門"""
+
+    def __init__(self, n, s, rng):
+        weights = (1 / (rank ** s) for rank in range(1, n + 1))
+        self.cumulative = list(itertools.accumulate(weights))
+        self.rng = rng
+
+    def sample(self):
+        total = self.cumulative[-1]
+        return bisect_left(self.cumulative, self.rng.random() * total)
+
+    def counts(self, k, cap):
+        """把 k 次抽樣分配到各個編號上，每個編號最多 cap 次"""
+        counts = Counter(
+            self.rng.choices(range(len(self.cumulative)), cum_weights=self.cumulative, k=k)
+        )
+        return {index: min(count, cap) for index, count in counts.items()}
+
+
+def _insert_chunks(table, rows, chunk_size):
+    """按塊執行 executemany 插入並提交，rows 可以是生成器"""
+    total = 0
+    iterator = iter(rows)
+    while True:
+        chunk = list(itertools.islice(iterator, chunk_size))
+        if not chunk:
+            return total
+        db.session.execute(table.insert(), chunk)
+        db.session.commit()
+        total += len(chunk)
+
+
+def _ids(model):
+    return [row[0] for row in db.session.query(model.id).order_by(model.id)]
+
+
+def seed_database(users=10000, posts=50000, comments=200000, post_likes=1000000, comment_likes=300000,
+                  invite_codes=1000, zipf=1.1, days=90, chunk_size=20000, random_seed=42, log=print):
+    """批量生成模擬數據，點讚和評論按 Zipf 分佈集中在熱門帖子上
+
+    所有用戶使用同一個密碼 BENCH_PASSWORD，哈希只計算一次。
+    計數器按實際生成的點讚和評論數寫入，最後重建全文索引。返回各表的行數。
+    """
+    rng = random.Random(random_seed)
+    now = datetime.utcnow()
+    span = days * 86400
+
+    def random_time():
+        return now - timedelta(seconds=rng.random() * span)
+
+    started = time.perf_counter()
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    first_user = (db.session.query(func.max(User.id)).scalar() or 0) + 1
+    _insert_chunks(User.__table__, (
+        {'username': bench_username(first_user + i), 'password_hash': password_hash,
+         'invite_code': f'BENCH{first_user + i:010d}', 'created_at': random_time()}
+        for i in range(users)
+    ), chunk_size)
+    user_ids = _ids(User)
+    log(f'用戶: {users} ({time.perf_counter() - started:.1f}s)')
+
+    codes = generate_invite_codes(invite_codes)
+    _insert_chunks(InviteCode.__table__, ({'code': code} for code in codes), chunk_size)
+
+    # 熱門度由帖子在 post_ids 中的順序決定，與創建時間無關
+    post_comment_counts = ZipfSampler(posts, zipf, rng).counts(comments, comments) if posts else {}
+    _insert_chunks(Post.__table__, (
+        {'title': f'壓測帖子 {i} topic{i % 97}', 'content': f'benchmark post {i} ' * 8,
+         'user_id': rng.choice(user_ids), 'likes_count': 0,
+         'comments_count': post_comment_counts.get(i, 0), 'created_at': random_time()}
+        for i in range(posts)
+    ), chunk_size)
+    post_ids = _ids(Post)[-posts:] if posts else []
+    log(f'帖子: {posts} ({time.perf_counter() - started:.1f}s)')
+
+    _insert_chunks(Comment.__table__, (
+        {'content': f'benchmark comment {n} on post {index}', 'post_id': post_ids[index],
+         'user_id': rng.choice(user_ids), 'likes_count': 0, 'created_at': random_time()}
+        for index, count in post_comment_counts.items() for n in range(count)
+    ), chunk_size)
+    comment_ids = _ids(Comment)[-comments:] if comments else []
+    log(f'評論: {len(comment_ids)} ({time.perf_counter() - started:.1f}s)')
+
+    post_like_total = _seed_likes(PostLike, 'post_id', Post, post_ids, user_ids, post_likes, zipf, rng,
+                                  random_time, chunk_size)
+    log(f'帖子點讚: {post_like_total} ({time.perf_counter() - started:.1f}s)')
+    comment_like_total = _seed_likes(CommentLike, 'comment_id', Comment, comment_ids, user_ids, comment_likes,
+                                     zipf, rng, random_time, chunk_size)
+    log(f'評論點讚: {comment_like_total} ({time.perf_counter() - started:.1f}s)')
+
+    rebuild_search_index(chunk_size=chunk_size)
+    log(f'全文索引重建完成 ({time.perf_counter() - started:.1f}s)')
+    # 批量插入不經過 ORM 事件，熱度分需要整體計算一次
+    rescore(full=True, chunk_size=chunk_size, sleep_ratio=0, min_pause=0, log=log)
+    log(f'熱度分計算完成 ({time.perf_counter() - started:.1f}s)')
+    return {
+        'users': users, 'posts': posts, 'comments': len(comment_ids),
+        'post_likes': post_like_total, 'comment_likes': comment_like_total, 'invite_codes': len(codes),
+    }
+
+
+def _seed_likes(like_model, fk_name, target_model, target_ids, user_ids, total, zipf, rng, random_time,
+                chunk_size):
+    """按 Zipf 分佈生成點讚，同一目標的點讚用戶不重複，並回寫 likes_count"""
+    if not target_ids or not total:
+        return 0
+    counts = ZipfSampler(len(target_ids), zipf, rng).counts(total, len(user_ids))
+
+    def rows():
+        for index, count in counts.items():
+            for user_id in rng.sample(user_ids, count):
+                yield {fk_name: target_ids[index], 'user_id': user_id, 'created_at': random_time()}
+
+    inserted = _insert_chunks(like_model.__table__, rows(), chunk_size)
+
+    table = target_model.__table__
+    statement = table.update().where(table.c.id == bindparam('target_id')).values(likes_count=bindparam('count'))
+    updates = [{'target_id': target_ids[index], 'count': count} for index, count in counts.items()]
+    for start in range(0, len(updates), chunk_size):
+        db.session.execute(statement, updates[start:start + chunk_size])
+        db.session.commit()
+    return inserted
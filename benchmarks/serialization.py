@@ -0,0 +1,72 @@
+import time
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import desc
+from src.models.user import (
+    db, Post, Comment, post_rows, comment_rows, row_to_dict, serialize_posts, serialize_comments,
+    liked_post_ids, liked_comment_ids
+)
+from src.utils.json_provider import FastJSONProvider, orjson
+
+
+def _orm_posts(limit, user_id):
+    posts = Post.query.order_by(desc(Post.likes_count), desc(Post.created_at), desc(Post.id)).limit(limit).all()
+    return serialize_posts(posts, user_id)
+
+
+def _row_posts(limit, user_id):
+    rows = db.session.execute(
+        post_rows().order_by(desc(Post.likes_count), desc(Post.created_at), desc(Post.id)).limit(limit)
+    ).all()
+    liked_ids = liked_post_ids(user_id, [row.id for row in rows])
+    return [row_to_dict(row, liked_ids) for row in rows]
+
+
+def _orm_comments(limit, user_id):
+    comments = Comment.query.order_by(Comment.id).limit(limit).all()
+    return serialize_comments(comments, user_id)
+
+
+def _row_comments(limit, user_id):
+    rows = db.session.execute(comment_rows().order_by(Comment.id).limit(limit)).all()
+    liked_ids = liked_comment_ids(user_id, [row.id for row in rows])
+    return [row_to_dict(row, liked_ids) for row in rows]
+
+
+def _best_of(repeat, fn):
+    """多次運行取最快的一次，返回 (耗時, 結果)"""
+    best, result = None, None
+    for _ in range(repeat):
+        db.session.remove()
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    db.session.remove()
+    return best, result
+
+
+def run_serialization_benchmark(app, rows=50000, repeat=3, user_id=1):
+    """對比 ORM 實例 + to_dict 與列投影 Row 兩條讀取路徑，以及默認與快速 JSON 序列化的每秒行數"""
+    report = {'rows': rows, 'repeat': repeat, 'orjson': orjson is not None, 'results': {}}
+    default_json = DefaultJSONProvider(app)
+    fast_json = FastJSONProvider(app)
+
+    with app.app_context():
+        for name, orm_fn, row_fn in (('posts', _orm_posts, _row_posts), ('comments', _orm_comments, _row_comments)):
+            orm_time, orm_data = _best_of(repeat, lambda: orm_fn(rows, user_id))
+            row_time, row_data = _best_of(repeat, lambda: row_fn(rows, user_id))
+            if orm_data != row_data:
+                raise AssertionError(f'{name}: 列投影的輸出與 to_dict 不一致')
+
+            default_dump, _ = _best_of(repeat, lambda: default_json.dumps(orm_data, separators=(',', ':')))
+            fast_dump, _ = _best_of(repeat, lambda: fast_json.dumps(row_data))
+            count = len(orm_data)
+            report['results'][name] = {
+                'fetched': count,
+                'orm_rows_per_s': round(count / orm_time),
+                'row_rows_per_s': round(count / row_time),
+                'default_json_rows_per_s': round(count / default_dump),
+                'fast_json_rows_per_s': round(count / fast_dump),
+                'end_to_end_speedup': round((orm_time + default_dump) / (row_time + fast_dump), 2),
+            }
+    return report
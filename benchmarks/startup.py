@@ -0,0 +1,115 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from benchmarks import load_app
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在全新的解釋器中分階段計時：導入、create_app、第一個請求
+_COLD_START = '''
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {root!r})
+from src.main import create_app
+imported = time.perf_counter()
+app = create_app({config!r})
+created = time.perf_counter()
+status = app.test_client().get('/api/posts').status_code
+finished = time.perf_counter()
+print(json.dumps({{'import_s': imported - started, 'create_app_s': created - imported,
+                   'first_request_s': finished - created, 'status': status}}))
+'''
+
+
+def _summary(values):
+    return {
+        'min': round(min(values), 4),
+        'median': round(statistics.median(values), 4),
+        'max': round(max(values), 4),
+    }
+
+
+def measure_cold_start(db_path, repeat=5, schema_check=True):
+    """每次啟動一個新進程，返回各階段耗時以及進程總耗時的統計"""
+    config = {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.abspath(db_path)}',
+        'SCHEMA_CHECK_ON_STARTUP': schema_check,
+    }
+    script = _COLD_START.format(root=ROOT, config=config)
+    phases = {}
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', script], check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result['process_s'] = time.perf_counter() - started
+        for name, value in result.items():
+            if name != 'status':
+                phases.setdefault(name, []).append(value)
+    return {name: _summary(values) for name, values in phases.items()}
+
+
+def _worker_ready(app):
+    """子進程中的第一次讀寫連接訪問，返回耗時"""
+    from sqlalchemy import func, select
+    from src.models.user import db, Post
+    started = time.perf_counter()
+    with app.app_context():
+        db.session.execute(select(func.count()).select_from(Post)).scalar()
+        db.session.connection().exec_driver_sql('SELECT count(*) FROM post').scalar()
+        db.session.rollback()
+    return time.perf_counter() - started
+
+
+def measure_preload(db_path, workers=4):
+    """模擬 --preload：主進程創建應用並訪問數據庫後 fork 出 workers 個子進程
+
+    每個子進程各自訪問讀寫連接；繼承的連接池沒有被丟棄時這裡會出錯或讀到錯亂的結果。
+    """
+    started = time.perf_counter()
+    app = load_app(db_path)
+    create_app_s = time.perf_counter() - started
+    # 主進程在 fork 之前再次打開連接，相當於服務器鉤子裡的數據庫訪問
+    _worker_ready(app)
+
+    read_fd, write_fd = os.pipe()
+    children = []
+    fork_started = time.perf_counter()
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            try:
+                result = {'ok': True, 'ready_s': _worker_ready(app)}
+            except Exception as e:
+                result = {'ok': False, 'error': str(e)}
+            os.write(write_fd, (json.dumps(result) + '\n').encode('utf-8'))
+            os._exit(0)
+        children.append(pid)
+    os.close(write_fd)
+    for pid in children:
+        os.waitpid(pid, 0)
+    all_ready_s = time.perf_counter() - fork_started
+    with os.fdopen(read_fd, encoding='utf-8') as f:
+        results = [json.loads(line) for line in f if line.strip()]
+
+    ready = [result['ready_s'] for result in results if result['ok']]
+    return {
+        'workers': workers,
+        'create_app_s': round(create_app_s, 4),
+        'worker_first_query_s': _summary(ready) if ready else None,
+        'all_workers_ready_s': round(all_ready_s, 4),
+        'failed': [result['error'] for result in results if not result['ok']],
+    }
+
+
+def run_startup_benchmark(db_path, repeat=5, workers=4):
+    report = {
+        'cold_start': measure_cold_start(db_path, repeat),
+        'cold_start_without_schema_check': measure_cold_start(db_path, repeat, schema_check=False),
+    }
+    if hasattr(os, 'fork'):
+        report['preload'] = measure_preload(db_path, workers)
+    return report
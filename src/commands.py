@@ -0,0 +1,111 @@
+import click
+from flask.cli import with_appcontext
+from src.utils.schema import ensure_schema
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """建表並初始化邀請碼和示例數據（只需在部署時執行一次）"""
+    from src.utils.archive import archive
+    from src.utils.init_data import init_all_data
+    ensure_schema()
+    archive.ensure_tables()
+    archive.ensure_id_floor()
+    init_all_data()
+
+
+@click.command('seed-invites')
+@click.option('--count', default=10000, show_default=True, help='要生成的邀請碼數量')
+@click.option('--chunk-size', default=5000, show_default=True, help='每批插入並提交的數量')
+@with_appcontext
+def seed_invites_command(count, chunk_size):
+    """分批生成並插入邀請碼，可用於生成數百萬個邀請碼"""
+    from src.utils.init_data import seed_invite_codes
+    ensure_schema()
+    inserted = seed_invite_codes(count, chunk_size=chunk_size)
+    click.echo(f"成功生成並保存了 {inserted} 個邀請碼")
+
+
+@click.command('rebuild-search')
+@click.option('--chunk-size', default=2000, show_default=True, help='每批寫入索引的記錄數')
+@with_appcontext
+def rebuild_search_command(chunk_size):
+    """按現有帖子和評論重建全文索引"""
+    from src.utils.search import rebuild_search_index
+    ensure_schema()
+    posts, comments = rebuild_search_index(chunk_size=chunk_size)
+    click.echo(f"全文索引重建完成：{posts} 個帖子，{comments} 條評論")
+
+
+@click.command('reconcile-counters')
+@click.option('--only', type=click.Choice(['post', 'comment']), multiple=True, help='只校正指定類型，可重複')
+@click.option('--chunk-size', default=1000, show_default=True, help='每批檢查的記錄數')
+@click.option('--sleep-ratio', default=1.0, show_default=True, help='每批之後休眠的時間與本批耗時之比')
+@click.option('--restart', is_flag=True, help='忽略上次中斷的進度，從頭開始')
+@with_appcontext
+def reconcile_counters_command(only, chunk_size, sleep_ratio, restart):
+    """按點讚表和評論表重新核對帖子和評論的點讚數、評論數，可在線上運行"""
+    from src.utils.reconcile import reconcile_counters
+    ensure_schema()
+    results = reconcile_counters(only or None, chunk_size=chunk_size, sleep_ratio=sleep_ratio, restart=restart,
+                                 log=click.echo)
+    for name, (scanned, fixed) in results.items():
+        click.echo(f"{name}: 檢查 {scanned} 條，修正 {fixed} 條")
+
+
+@click.command('rescore')
+@click.option('--full', is_flag=True, help='重算全部帖子和評論，而不只是上次之後有新互動的記錄')
+@click.option('--chunk-size', default=1000, show_default=True, help='每批處理的記錄數')
+@click.option('--sleep-ratio', default=1.0, show_default=True, help='每批之後休眠的時間與本批耗時之比')
+@with_appcontext
+def rescore_command(full, chunk_size, sleep_ratio):
+    """重算熱度分，修正批量導入等繞過增量更新的寫入，可定期運行"""
+    from src.utils.ranking import rescore
+    ensure_schema()
+    rescore(full=full, chunk_size=chunk_size, sleep_ratio=sleep_ratio, log=click.echo)
+
+
+@click.command('purge-deleted')
+@click.option('--sleep-ratio', default=1.0, show_default=True, help='每批之後休眠的時間與本批耗時之比')
+@with_appcontext
+def purge_deleted_command(sleep_ratio):
+    """執行未完成的分批刪除任務（例如進程重啟前沒有做完的）"""
+    from src.models.user import db, DeletionJob
+    from src.utils.deletion import deletion_worker
+    ensure_schema()
+    pending = db.session.query(DeletionJob.id).count()
+    deletion_worker.background = False
+    deletion_worker.run_pending(sleep_ratio=sleep_ratio)
+    click.echo(f"完成了 {pending} 個刪除任務")
+
+
+@click.command('archive-posts')
+@click.option('--older-than-days', default=180, show_default=True, help='只歸檔發布超過這麼多天的帖子')
+@click.option('--idle-days', default=30, show_default=True, help='統計最近互動的天數')
+@click.option('--max-recent-activity', default=0, show_default=True,
+              help='最近 idle-days 天內點讚數加評論數不超過該值的帖子才歸檔')
+@click.option('--chunk-size', default=500, show_default=True, help='每批檢查的帖子數')
+@click.option('--sleep-ratio', default=1.0, show_default=True, help='每批之後休眠的時間與本批耗時之比')
+@with_appcontext
+def archive_posts_command(older_than_days, idle_days, max_recent_activity, chunk_size, sleep_ratio):
+    """把長期沒有互動的舊帖子連同評論和點讚移到歸檔庫，可在線上運行"""
+    from src.utils.archive import archive
+    ensure_schema()
+    archive.ensure_tables()
+    archived = archive.archive_posts(older_than_days=older_than_days, idle_days=idle_days,
+                                     max_recent_activity=max_recent_activity, chunk_size=chunk_size,
+                                     sleep_ratio=sleep_ratio, log=click.echo)
+    archive.ensure_id_floor()
+    click.echo(f"歸檔了 {archived} 個帖子")
+
+
+def init_app(app):
+    """註冊命令行工具，例如 flask --app src.main seed-invites --count 1000000"""
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(seed_invites_command)
+    app.cli.add_command(rebuild_search_command)
+    app.cli.add_command(reconcile_counters_command)
+    app.cli.add_command(rescore_command)
+    app.cli.add_command(purge_deleted_command)
+    app.cli.add_command(archive_posts_command)
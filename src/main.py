@@ -3,54 +3,111 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+from flask import Flask, current_app
 from flask_cors import CORS
-from src.models.user import db
-from src.routes.user import user_bp
-from src.routes.auth import auth_bp
-from src.routes.posts import posts_bp
-from src.routes.comments import comments_bp
-
-app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
-
-# 啟用CORS支持
-CORS(app, supports_credentials=True)
-
-# 註冊藍圖
-app.register_blueprint(user_bp, url_prefix='/api')
-app.register_blueprint(auth_bp, url_prefix='/api')
-app.register_blueprint(posts_bp, url_prefix='/api')
-app.register_blueprint(comments_bp, url_prefix='/api')
-
-# 數據庫配置
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-
-# 初始化數據庫和數據
-with app.app_context():
-    db.create_all()
-    
-    # 初始化邀請碼和示例數據
-    from src.utils.init_data import init_all_data
-    init_all_data()
-
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
+from src import commands
+from src.utils import json_provider
+from src.models.user import db, InviteCode
+from src.utils.archive import archive
+from src.utils.deletion import deletion_worker
+from src.utils.event_hub import event_hub
+from src.utils.feed_cache import feed_cache
+from src.utils.like_buffer import like_buffer
+from src.utils.liked_index import liked_index
+from src.utils.metrics import metrics
+from src.utils.n_plus_one import n_plus_one
+from src.utils.pagination import IdConverter
+from src.utils.password_pool import password_hasher
+from src.utils.prefork import prefork_guard
+from src.utils.schema import ensure_schema
+from src.utils.sqlite_profile import sqlite_profile
+from src.utils.static_assets import static_assets
+from src.utils.user_cache import user_cache
+
+# 藍圖所在模塊及其 url_prefix，在 create_app 中才導入
+BLUEPRINTS = (
+    ('src.routes.user', 'user_bp'),
+    ('src.routes.auth', 'auth_bp'),
+    ('src.routes.posts', 'posts_bp'),
+    ('src.routes.comments', 'comments_bp'),
+    ('src.routes.search', 'search_bp'),
+    ('src.routes.stream', 'stream_bp'),
+)
+
+def _register_blueprints(app):
+    from importlib import import_module
+    for module_name, name in BLUEPRINTS:
+        app.register_blueprint(getattr(import_module(module_name), name), url_prefix='/api')
+
+def create_app(config=None):
+    """創建應用；導入本模塊本身沒有副作用
+
+    config 中的配置優先於默認值。多進程部署時結構升級和初始數據應通過一次性的
+    flask --app src.main init-db 完成，並設置 SCHEMA_CHECK_ON_STARTUP=False，
+    worker 啟動時不再訪問數據庫。
+    """
+    app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
+    app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+    # 數據庫配置
+    # 可通過環境變量 DATABASE_URL 指向其他數據庫，例如壓測用的數據庫
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+        'DATABASE_URL', f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+    )
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # 可以刪除任何用戶的管理員id
+    app.config['ADMIN_USER_IDS'] = ()
+    app.config.update(config or {})
+    json_provider.init_app(app)
+
+    # 啟用CORS支持
+    CORS(app, supports_credentials=True)
+
+    # 註冊藍圖；路由中的 <int:...> 限制在 SQLite 整數範圍內
+    app.url_map.converters['int'] = IdConverter
+    _register_blueprints(app)
+
+    sqlite_profile.init_app(app)
+    archive.init_app(app)
+    db.init_app(app)
+    feed_cache.init_app(app)
+    like_buffer.init_app(app)
+    deletion_worker.init_app(app)
+    user_cache.init_app(app)
+    liked_index.init_app(app)
+    password_hasher.init_app(app)
+    static_assets.init_app(app)
+    event_hub.init_app(app)
+    metrics.init_app(app)
+    n_plus_one.init_app(app)
+    prefork_guard.init_app(app)
+
+    # 啟動時只做結構版本檢查；邀請碼和示例數據通過 flask init-db / seed-invites 初始化
+    if app.config.setdefault('SCHEMA_CHECK_ON_STARTUP', True):
+        with app.app_context():
+            if ensure_schema() and db.session.query(InviteCode.id).first() is None:
+                print("如需初始化邀請碼和示例數據，請執行: flask --app src.main init-db")
+        # 啟動期間打開的連接不帶入 fork 出的 worker
+        prefork_guard.release(app)
+
+    commands.init_app(app)
+
+    app.add_url_rule('/', 'serve', serve, defaults={'path': ''})
+    app.add_url_rule('/<path:path>', 'serve', serve)
+    return app
+
 def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
+    if current_app.static_folder is None:
             return "Static folder not configured", 404
 
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
+    # 靜態文件在啟動時已讀入內存，這裡只查清單，不訪問文件系統
+    asset = static_assets.get(path) if path != "" else None
+    if asset is None:
+        # 單頁應用：其他路徑都返回 index.html
+        asset = static_assets.get('index.html')
+        if asset is None:
             return "index.html not found", 404
 
+    return static_assets.respond(asset)
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    create_app().run(host='0.0.0.0', port=5000, debug=True)
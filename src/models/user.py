@@ -1,8 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy import select
 from werkzeug.security import generate_password_hash, check_password_hash
+from src.utils.sqlite_profile import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -60,24 +62,38 @@ class Post(db.Model):
     likes_count = db.Column(db.Integer, default=0)
     comments_count = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # 隨時間衰減的熱度分，由 src/utils/ranking.py 在點讚數、評論數變化時更新
+    hot_score = db.Column(db.Float, nullable=False, default=0, server_default='0')
 
     # 關聯關係
     comments = db.relationship('Comment', backref='post', lazy=True, cascade='all, delete-orphan')
     likes = db.relationship('PostLike', backref='post', lazy=True, cascade='all, delete-orphan')
 
+    # 首頁排序 (likes_count DESC, created_at DESC, id DESC) 的複合索引，供游標分頁做索引範圍掃描
+    # sort=hot / sort=new 同樣各有一個索引，首頁第一頁是索引範圍掃描
+    __table_args__ = (
+        db.Index('ix_post_feed_rank', 'likes_count', 'created_at', 'id'),
+        db.Index('ix_post_hot', 'hot_score', 'id'),
+        db.Index('ix_post_new', 'created_at', 'id'),
+        # 刪除用戶時按作者查找內容
+        db.Index('ix_post_user', 'user_id', 'id'),
+        # 歸檔後主庫中不再有這些id，AUTOINCREMENT 保證新行不會重用它們
+        {'sqlite_autoincrement': True},
+    )
+
     def __repr__(self):
         return f'<Post {self.title}>'
 
-    def to_dict(self, current_user_id=None):
-        liked_by_user = False
-        if current_user_id:
-            liked_by_user = any(like.user_id == current_user_id for like in self.likes)
+    def to_dict(self, current_user_id=None, author=None, liked_by_user=None):
+        # author / liked_by_user 可由批量序列化預先算好傳入，避免逐條懶加載
+        if liked_by_user is None:
+            liked_by_user = self.id in liked_post_ids(current_user_id, [self.id])
         
         return {
             'id': self.id,
             'title': self.title,
             'content': self.content,
-            'author': self.author.username,
+            'author': author if author is not None else self.author.username,
             'user_id': self.user_id,
             'likes_count': self.likes_count,
             'comments_count': self.comments_count,
@@ -92,22 +108,32 @@ class Comment(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     likes_count = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    hot_score = db.Column(db.Float, nullable=False, default=0, server_default='0')
 
     # 關聯關係
     likes = db.relationship('CommentLike', backref='comment', lazy=True, cascade='all, delete-orphan')
 
+    # 評論列表按 (likes_count DESC, created_at DESC) 排序；也用於按帖子分組統計評論數
+    __table_args__ = (
+        db.Index('ix_comment_post_rank', 'post_id', 'likes_count', 'created_at'),
+        db.Index('ix_comment_post_hot', 'post_id', 'hot_score', 'id'),
+        db.Index('ix_comment_post_new', 'post_id', 'created_at', 'id'),
+        db.Index('ix_comment_user', 'user_id', 'id'),
+        {'sqlite_autoincrement': True},
+    )
+
     def __repr__(self):
         return f'<Comment {self.id}>'
 
-    def to_dict(self, current_user_id=None):
-        liked_by_user = False
-        if current_user_id:
-            liked_by_user = any(like.user_id == current_user_id for like in self.likes)
+    def to_dict(self, current_user_id=None, author=None, liked_by_user=None):
+        # author / liked_by_user 可由批量序列化預先算好傳入，避免逐條懶加載
+        if liked_by_user is None:
+            liked_by_user = self.id in liked_comment_ids(current_user_id, [self.id])
         
         return {
             'id': self.id,
             'content': self.content,
-            'author': self.author.username,
+            'author': author if author is not None else self.author.username,
             'user_id': self.user_id,
             'post_id': self.post_id,
             'likes_count': self.likes_count,
@@ -122,7 +148,11 @@ class PostLike(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # 確保每個用戶只能對每個帖子點讚一次
-    __table_args__ = (db.UniqueConstraint('post_id', 'user_id', name='unique_post_like'),)
+    __table_args__ = (
+        db.UniqueConstraint('post_id', 'user_id', name='unique_post_like'),
+        db.Index('ix_post_like_user', 'user_id', 'id'),
+        {'sqlite_autoincrement': True},
+    )
 
     def __repr__(self):
         return f'<PostLike post_id={self.post_id} user_id={self.user_id}>'
@@ -134,7 +164,114 @@ class CommentLike(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # 確保每個用戶只能對每個評論點讚一次
-    __table_args__ = (db.UniqueConstraint('comment_id', 'user_id', name='unique_comment_like'),)
+    __table_args__ = (
+        db.UniqueConstraint('comment_id', 'user_id', name='unique_comment_like'),
+        db.Index('ix_comment_like_user', 'user_id', 'id'),
+        {'sqlite_autoincrement': True},
+    )
 
     def __repr__(self):
         return f'<CommentLike comment_id={self.comment_id} user_id={self.user_id}>'
+
+class ContentVersion(db.Model):
+    """內容版本計數器，寫操作在同一事務中遞增，用於生成 ETag"""
+    key = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ContentVersion {self.key}={self.version}>'
+
+class ReconcileCheckpoint(db.Model):
+    """計數器校正任務的進度，中斷後從 last_id 之後繼續"""
+    name = db.Column(db.String(64), primary_key=True)
+    last_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ReconcileCheckpoint {self.name}={self.last_id}>'
+
+class DeletionJob(db.Model):
+    """待完成的分批刪除任務：kind 為 post、archived_post 或 user，任務完成後刪除該行"""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(16), nullable=False)
+    target_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (db.UniqueConstraint('kind', 'target_id', name='unique_deletion_job'),)
+
+    def __repr__(self):
+        return f'<DeletionJob {self.kind}:{self.target_id}>'
+
+def _usernames_by_id(user_ids):
+    """一條查詢取得一組用戶的用戶名"""
+    if not user_ids:
+        return {}
+    rows = db.session.query(User.id, User.username).filter(User.id.in_(user_ids)).all()
+    return {user_id: username for user_id, username in rows}
+
+def liked_post_ids(user_id, post_ids):
+    """用戶在給定帖子中點讚過的帖子id，由進程內的點讚索引回答（見 src/utils/liked_index.py）"""
+    from src.utils.liked_index import liked_index
+    return liked_index.liked_ids('post', user_id, post_ids)
+
+def liked_comment_ids(user_id, comment_ids):
+    """用戶在給定評論中點讚過的評論id，用法同 liked_post_ids"""
+    from src.utils.liked_index import liked_index
+    return liked_index.liked_ids('comment', user_id, comment_ids)
+
+def serialize_posts(posts, current_user_id=None):
+    """批量序列化帖子列表，查詢次數與帖子數量無關"""
+    if not posts:
+        return []
+
+    authors = _usernames_by_id({post.user_id for post in posts})
+
+    liked_ids = liked_post_ids(current_user_id, [post.id for post in posts])
+
+    return [
+        post.to_dict(current_user_id, author=authors.get(post.user_id), liked_by_user=post.id in liked_ids)
+        for post in posts
+    ]
+
+def serialize_comments(comments, current_user_id=None):
+    """批量序列化評論列表，查詢次數與評論數量無關"""
+    if not comments:
+        return []
+
+    authors = _usernames_by_id({comment.user_id for comment in comments})
+
+    liked_ids = liked_comment_ids(current_user_id, [comment.id for comment in comments])
+
+    return [
+        comment.to_dict(current_user_id, author=authors.get(comment.user_id), liked_by_user=comment.id in liked_ids)
+        for comment in comments
+    ]
+
+def post_rows(post=Post.__table__):
+    """帖子的列投影查詢：只取 to_dict 需要的列並連接作者用戶名，返回 Row 而不構建 ORM 實例
+
+    調用方再追加 where / order_by / limit，結果用 row_to_dict 轉換。
+    post 可換成歸檔庫中結構相同的表（見 src/utils/archive.py）。
+    """
+    return select(
+        post.c.id, post.c.title, post.c.content, User.username.label('author'), post.c.user_id,
+        post.c.likes_count, post.c.comments_count, post.c.created_at
+    ).select_from(post).outerjoin(User, User.id == post.c.user_id)
+
+def comment_rows(comment=Comment.__table__):
+    """評論的列投影查詢，用法同 post_rows"""
+    return select(
+        comment.c.id, comment.c.content, User.username.label('author'), comment.c.user_id, comment.c.post_id,
+        comment.c.likes_count, comment.c.created_at
+    ).select_from(comment).outerjoin(User, User.id == comment.c.user_id)
+
+def row_to_dict(row, liked_ids=()):
+    """把 post_rows / comment_rows 的一行轉為與 to_dict 相同的字典
+
+    liked_ids 為當前用戶點讚過的id（liked_post_ids / liked_comment_ids 的結果）。
+    """
+    data = row._asdict()
+    created_at = data['created_at']
+    data['created_at'] = created_at.isoformat() if created_at else None
+    data['liked_by_user'] = data['id'] in liked_ids
+    return data
@@ -1,8 +1,27 @@
 from flask import Blueprint, request, jsonify, session
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
 from src.models.user import db, User, InviteCode
+from src.utils.password_pool import PoolSaturated, password_hasher
+from src.utils.user_cache import CachedUser, user_cache
 
 auth_bp = Blueprint('auth', __name__)
 
+def _busy_response():
+    """密碼哈希進程池已滿時快速拒絕"""
+    response = jsonify({'error': '服務繁忙，請稍後再試'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+def _invite_error(code):
+    """返回邀請碼不可用的原因，可用時返回 None"""
+    invite = db.session.query(InviteCode.is_used).filter_by(code=code).first()
+    if not invite:
+        return '邀請碼無效，請聯繫獲取新的邀請碼'
+    if invite.is_used:
+        return '該邀請碼已被註冊，請聯繫獲取新的邀請碼'
+    return None
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     try:
@@ -21,31 +40,45 @@ def register():
         if len(password) < 6:
             return jsonify({'error': '密碼長度至少6個字符'}), 400
 
-        # 檢查用戶名是否已存在
-        if User.query.filter_by(username=username).first():
+        # 預先檢查用戶名和邀請碼（只讀，不持有寫鎖），避免為注定失敗的請求計算密碼哈希；
+        # 真正的防重由下面的寫事務保證
+        if db.session.query(User.id).filter_by(username=username).first():
             return jsonify({'error': '用戶名已存在'}), 400
 
-        # 檢查邀請碼是否有效且未被使用
-        invite = InviteCode.query.filter_by(code=invite_code).first()
-        if not invite:
-            return jsonify({'error': '邀請碼無效，請聯繫獲取新的邀請碼'}), 400
-        
-        if invite.is_used:
-            return jsonify({'error': '該邀請碼已被註冊，請聯繫獲取新的邀請碼'}), 400
-
-        # 創建新用戶
-        user = User(username=username, invite_code=invite_code)
-        user.set_password(password)
-        
-        db.session.add(user)
-        db.session.flush() # 獲取user.id，但不提交事務
+        invite_error = _invite_error(invite_code)
+        if invite_error:
+            return jsonify({'error': invite_error}), 400
+
+        # 密碼哈希在獨立進程池中計算，不佔用寫事務時間
+        password_hash = password_hasher.hash(password)
+
+        # 寫事務只有兩條語句：插入用戶，再以條件 UPDATE 原子地佔用邀請碼
+        try:
+            user_row = db.session.execute(
+                insert(User.__table__)
+                .values(username=username, invite_code=invite_code, password_hash=password_hash)
+                .returning(User.__table__.c.id, User.__table__.c.username, User.__table__.c.created_at)
+            ).one()
+        except IntegrityError as e:
+            db.session.rollback()
+            if 'user.invite_code' in str(e.orig):
+                return jsonify({'error': '該邀請碼已被註冊，請聯繫獲取新的邀請碼'}), 400
+            return jsonify({'error': '用戶名已存在'}), 400
 
-        # 標記邀請碼為已使用
-        invite.is_used = True
-        invite.used_by_user_id = user.id
+        claimed = db.session.execute(
+            update(InviteCode.__table__)
+            .where(InviteCode.__table__.c.code == invite_code, InviteCode.__table__.c.is_used.is_not(True))
+            .values(is_used=True, used_by_user_id=user_row.id)
+        ).rowcount
+        if not claimed:
+            # 預檢查之後邀請碼被他人佔用或刪除
+            db.session.rollback()
+            return jsonify({'error': _invite_error(invite_code) or '該邀請碼已被註冊，請聯繫獲取新的邀請碼'}), 400
 
         db.session.commit()
 
+        user = CachedUser(*user_row)
+
         # 設置會話
         session['user_id'] = user.id
         session['username'] = user.username
@@ -55,6 +88,9 @@ def register():
             'user': user.to_dict()
         }), 201
 
+    except PoolSaturated:
+        db.session.rollback()
+        return _busy_response()
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'註冊失敗: {str(e)}'}), 500
@@ -71,9 +107,18 @@ def login():
 
         # 查找用戶
         user = User.query.filter_by(username=username).first()
-        if not user or not user.check_password(password):
+        if not user:
+            return jsonify({'error': '用戶名或密碼錯誤'}), 401
+
+        password_ok, new_hash = password_hasher.verify(user.password_hash, password)
+        if not password_ok:
             return jsonify({'error': '用戶名或密碼錯誤'}), 401
 
+        if new_hash:
+            # 存儲的哈希參數已過時，登錄成功時按當前參數重新哈希
+            user.password_hash = new_hash
+            db.session.commit()
+
         # 設置會話
         session['user_id'] = user.id
         session['username'] = user.username
@@ -83,7 +128,11 @@ def login():
             'user': user.to_dict()
         }), 200
 
+    except PoolSaturated:
+        db.session.rollback()
+        return _busy_response()
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': f'登錄失敗: {str(e)}'}), 500
 
 @auth_bp.route('/logout', methods=['POST'])
@@ -97,7 +146,7 @@ def get_current_user():
     if not user_id:
         return jsonify({'error': '未登錄'}), 401
 
-    user = User.query.get(user_id)
+    user = user_cache.get(user_id)
     if not user:
         session.clear()
         return jsonify({'error': '用戶不存在'}), 401
@@ -111,7 +160,8 @@ def require_auth(f):
         if not user_id:
             return jsonify({'error': '請先登錄'}), 401
         
-        user = User.query.get(user_id)
+        # 優先使用進程內緩存，常見情況下不需要查詢數據庫
+        user = user_cache.get(user_id)
         if not user:
             session.clear()
             return jsonify({'error': '用戶不存在'}), 401
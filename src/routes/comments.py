@@ -1,6 +1,12 @@
 from flask import Blueprint, request, jsonify
-from src.models.user import db, Comment, CommentLike
+from src.models.user import db, Comment
 from src.routes.auth import require_auth
+from src.utils.deletion import DeleteBatch, delete_comment_rows
+from src.utils.event_hub import event_hub
+from src.utils.like_buffer import like_buffer
+from src.utils.liked_index import liked_index
+from src.utils.likes import flip_comment_like
+from src.utils.versions import bump_versions, post_version_key, user_likes_version_key
 
 comments_bp = Blueprint('comments', __name__)
 
@@ -8,30 +14,31 @@ comments_bp = Blueprint('comments', __name__)
 @require_auth
 def toggle_comment_like(comment_id):
     try:
-        comment = Comment.query.get_or_404(comment_id)
-        user_id = request.current_user.id
-
-        # 檢查是否已經點讚
-        existing_like = CommentLike.query.filter_by(comment_id=comment_id, user_id=user_id).first()
-
-        if existing_like:
-            # 取消點讚
-            db.session.delete(existing_like)
-            comment.likes_count = max(0, comment.likes_count - 1)
-            action = 'unliked'
+        if like_buffer.enabled:
+            # 寫回模式：只記入內存緩衝，由後台線程批量寫庫
+            result = like_buffer.toggle('comment', comment_id, request.current_user.id)
         else:
-            # 添加點讚
-            like = CommentLike(comment_id=comment_id, user_id=user_id)
-            db.session.add(like)
-            comment.likes_count += 1
-            action = 'liked'
+            result = flip_comment_like(comment_id, request.current_user.id)
+        if result is None:
+            db.session.rollback()
+            return jsonify({'error': '評論不存在'}), 404
+
+        liked, likes_count = result[:2]
+        action = 'liked' if liked else 'unliked'
 
+        likes_key = user_likes_version_key(request.current_user.id)
+        versions = {}
+        if not like_buffer.enabled:
+            # 評論點讚只影響所屬帖子的詳情和評論列表；寫回模式下在批量寫入時遞增
+            versions = bump_versions(post_version_key(result[2]), likes_key)
         db.session.commit()
+        liked_index.update('comment', request.current_user.id, comment_id, liked, versions.get(likes_key))
+        event_hub.publish('comment_liked', {'comment_id': comment_id, 'likes_count': likes_count})
 
         return jsonify({
             'message': f'評論{action}',
-            'likes_count': comment.likes_count,
-            'liked': action == 'liked'
+            'likes_count': likes_count,
+            'liked': liked
         }), 200
 
     except Exception as e:
@@ -42,18 +49,26 @@ def toggle_comment_like(comment_id):
 @require_auth
 def delete_comment(comment_id):
     try:
-        comment = Comment.query.get_or_404(comment_id)
-        
+        comment = db.session.execute(
+            db.select(Comment.user_id, Comment.post_id).where(Comment.id == comment_id)
+        ).first()
+        if comment is None:
+            return jsonify({'error': '評論不存在'}), 404
+
         # 檢查是否是評論作者
         if comment.user_id != request.current_user.id:
             return jsonify({'error': '只能刪除自己的評論'}), 403
 
-        # 更新帖子的評論數
-        post = comment.post
-        post.comments_count = max(0, post.comments_count - 1)
-
-        db.session.delete(comment)
-        db.session.commit()
+        # 評論的點讚和全文索引按評論id整體刪除，帖子的評論數在 SQL 中遞減
+        batch = DeleteBatch()
+        delete_comment_rows(batch, [comment_id])
+        batch.commit()
+        comments_count = batch.post_counts.get(comment.post_id, {}).get('comments_count', 0)
+        event_hub.publish('comment_deleted', {
+            'post_id': comment.post_id,
+            'comment_id': comment_id,
+            'comments_count': comments_count
+        })
 
         return jsonify({'message': '評論已刪除'}), 200
 
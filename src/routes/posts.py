@@ -1,21 +1,206 @@
-from flask import Blueprint, request, jsonify
-from sqlalchemy import desc
-from src.models.user import db, Post, PostLike, Comment
+from datetime import datetime
+from flask import Blueprint, g, request, jsonify
+from sqlalchemy import desc, tuple_, update
+from src.models.user import (
+    db, Post, Comment, post_rows, comment_rows, row_to_dict, liked_post_ids, liked_comment_ids
+)
 from src.routes.auth import require_auth
+from src.utils.archive import archive
+from src.utils.deletion import deletion_worker
+from src.utils.event_hub import event_hub
+from src.utils.feed_cache import feed_cache, post_sort_key
+from src.utils.like_buffer import like_buffer
+from src.utils.liked_index import liked_index
+from src.utils.likes import flip_post_like
+from src.utils.pagination import (
+    InvalidCursor, encode_cursor, decode_cursor, encode_sort_cursor, decode_sort_cursor, parse_id,
+    parse_limit
+)
+from src.utils.ranking import post_hot_score_sql
+from src.utils.versions import (
+    FEED_VERSION, bump_versions, conditional_get, post_version_key, user_likes_version_key
+)
 
 posts_bp = Blueprint('posts', __name__)
 
+# 首頁除默認的 top 外支持的排序方式 -> (排序鍵, 游標中各鍵的轉換函數)，均按降序，各有索引
+POST_SORTS = {
+    'hot': ((Post.hot_score, Post.id), (float, parse_id)),
+    'new': ((Post.created_at, Post.id), (datetime.fromisoformat, parse_id)),
+}
+
+# 評論排序方式 -> 排序鍵（均按降序）
+COMMENT_SORTS = {
+    'top': (Comment.likes_count, Comment.created_at),
+    'hot': (Comment.hot_score, Comment.id),
+    'new': (Comment.created_at, Comment.id),
+}
+
+# GET /posts?ids=... 一次最多讀取的帖子數，以及 include 中可附帶的內容
+MAX_BATCH_IDS = 50
+BATCH_INCLUDES = {'comments', 'me'}
+
+def _ranked_posts(after, limit):
+    """按首頁排序讀取排在 after 之後的 limit 個帖子，返回 post_rows 的 Row"""
+    # 按點讚數降序，然後按創建時間降序排序，id 作為最終的決勝鍵保證順序唯一
+    query = post_rows().order_by(desc(Post.likes_count), desc(Post.created_at), desc(Post.id))
+    if after is not None:
+        # 鍵集分頁：只取排在游標位置之後的帖子，走 ix_post_feed_rank 索引範圍掃描
+        query = query.where(tuple_(Post.likes_count, Post.created_at, Post.id) < tuple_(*after))
+    return db.session.execute(query.limit(limit)).all()
+
+def _sorted_posts_page(sort, cursor, limit, current_user_id):
+    """按 hot / new 排序讀取一頁帖子，返回 (帖子列表, 下一頁游標)
+
+    這兩種排序的結果不經過首頁緩存，直接對相應索引做鍵集分頁。
+    """
+    columns, types = POST_SORTS[sort]
+    query = post_rows().add_columns(Post.hot_score).order_by(*(desc(column) for column in columns))
+    if cursor:
+        query = query.where(tuple_(*columns) < tuple_(*decode_sort_cursor(cursor, sort, types)))
+    rows = db.session.execute(query.limit(limit + 1)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_sort_cursor(sort, [getattr(rows[-1], column.key) for column in columns])
+    liked_ids = liked_post_ids(current_user_id, [row.id for row in rows])
+    posts_data = []
+    for row in rows:
+        data = row_to_dict(row, liked_ids)
+        data.pop('hot_score')
+        posts_data.append(data)
+    return posts_data, next_cursor
+
+def _parse_ids(value):
+    """解析逗號分隔的帖子id，去重並保持順序"""
+    post_ids = list(dict.fromkeys(parse_id(item) for item in value.split(',') if item.strip()))
+    if not post_ids or len(post_ids) > MAX_BATCH_IDS:
+        raise ValueError(value)
+    return post_ids
+
+def _posts_version_keys():
+    """首頁依賴 FEED_VERSION；按 ids 批量讀取時只依賴這些帖子各自的版本"""
+    try:
+        return [post_version_key(post_id) for post_id in _parse_ids(request.args['ids'])]
+    except (KeyError, ValueError):
+        return [FEED_VERSION]
+
+def _posts_batch(post_ids, include, comment_sort, current_user):
+    """按 ids 一次讀取多個帖子（可附帶評論和當前用戶）
+
+    帖子和評論各用一條 IN 查詢並在同一條查詢中連接作者，當前用戶的點讚狀態由點讚索引
+    批量回答；主庫中沒有的帖子再到歸檔庫中批量查找。返回的帖子按請求中的順序排列。
+    """
+    current_user_id = current_user.id
+    rows = {row.id: row for row in db.session.execute(post_rows().where(Post.id.in_(post_ids)))}
+    archived = archive.post_rows([post_id for post_id in post_ids if post_id not in rows])
+    liked_ids = liked_post_ids(current_user_id, post_ids)
+    posts = {
+        post_id: row_to_dict(rows.get(post_id) or archived[post_id], liked_ids)
+        for post_id in post_ids if post_id in rows or post_id in archived
+    }
+
+    if 'comments' in include:
+        for data in posts.values():
+            data['comments'] = []
+        order_by = COMMENT_SORTS[comment_sort]
+        comment_results = []
+        if rows:
+            # 先按帖子分組再按排序鍵，每個帖子各走一次 ix_comment_post_* 索引範圍掃描
+            comment_results.append(db.session.execute(
+                comment_rows()
+                .where(Comment.post_id.in_(list(rows)))
+                .order_by(Comment.post_id, *(desc(column) for column in order_by))
+            ))
+        if archived:
+            comment_results.append(archive.comment_rows(list(archived), [column.key for column in order_by]))
+        comment_rows_list = [row for results in comment_results for row in results]
+        liked_ids = liked_comment_ids(current_user_id, [row.id for row in comment_rows_list])
+        for row in comment_rows_list:
+            posts[row.post_id]['comments'].append(row_to_dict(row, liked_ids))
+
+    result = {
+        'posts': list(posts.values()),
+        'missing': [post_id for post_id in post_ids if post_id not in posts],
+    }
+    if 'me' in include:
+        result['user'] = current_user.to_dict()
+    return result
+
+def _shared_payload(data):
+    """去掉與當前用戶相關的字段，得到可在用戶間共享的緩存或推送數據"""
+    return {key: value for key, value in data.items() if key != 'liked_by_user'}
+
+def _feed_entries(rows):
+    return [
+        (post_sort_key(row.likes_count, row.created_at, row.id), _shared_payload(row_to_dict(row)))
+        for row in rows
+    ]
+
 @posts_bp.route('/posts', methods=['GET'])
 @require_auth
+@conditional_get(_posts_version_keys, also_read=[FEED_VERSION])
 def get_posts():
     try:
-        # 獲取所有帖子，按點讚數降序，然後按創建時間降序排序
-        posts = Post.query.order_by(desc(Post.likes_count), desc(Post.created_at)).all()
-        
-        current_user_id = request.current_user.id
-        posts_data = [post.to_dict(current_user_id) for post in posts]
-        
-        return jsonify({'posts': posts_data}), 200
+        if 'ids' in request.args:
+            # 打開帖子頁時一次取回帖子、評論和當前用戶，只做一次認證，共用一個數據庫會話
+            try:
+                post_ids = _parse_ids(request.args['ids'])
+            except ValueError:
+                return jsonify({'error': f'ids 參數無效，最多 {MAX_BATCH_IDS} 個帖子id'}), 400
+            include = {item for item in request.args.get('include', '').split(',') if item}
+            if not include <= BATCH_INCLUDES:
+                return jsonify({'error': 'include 參數無效'}), 400
+            comment_sort = request.args.get('comment_sort', 'top')
+            if comment_sort not in COMMENT_SORTS:
+                return jsonify({'error': 'comment_sort 參數無效'}), 400
+            return jsonify(_posts_batch(post_ids, include, comment_sort, request.current_user)), 200
+
+        try:
+            limit = parse_limit(request.args.get('limit'))
+        except ValueError:
+            return jsonify({'error': 'limit 參數無效'}), 400
+
+        sort = request.args.get('sort', 'top')
+        if sort != 'top' and sort not in POST_SORTS:
+            return jsonify({'error': 'sort 參數無效'}), 400
+
+        after = None
+        cursor = request.args.get('cursor')
+        if sort != 'top':
+            try:
+                posts_data, next_cursor = _sorted_posts_page(sort, cursor, limit, request.current_user.id)
+            except InvalidCursor:
+                return jsonify({'error': '分頁游標無效'}), 400
+            return jsonify({'posts': posts_data, 'next_cursor': next_cursor}), 200
+
+        if cursor:
+            try:
+                after = decode_cursor(cursor)
+            except InvalidCursor:
+                return jsonify({'error': '分頁游標無效'}), 400
+
+        feed_cache.sync_version(g.content_versions[FEED_VERSION])
+        page = feed_cache.get_page(after, limit)
+        if page is None and feed_cache.needs_reload():
+            generation = feed_cache.generation
+            feed_cache.reload(_feed_entries(_ranked_posts(None, feed_cache.max_posts)), generation)
+            page = feed_cache.get_page(after, limit)
+
+        if page is None:
+            # 超出緩存範圍的深分頁直接查庫，多取一條用於判斷是否還有下一頁
+            entries = _feed_entries(_ranked_posts(after, limit + 1))
+            page = entries[:limit], len(entries) > limit
+        entries, has_more = page
+
+        # 共享緩存不區分用戶，讀取時再疊加當前用戶的點讚狀態
+        liked_ids = liked_post_ids(request.current_user.id, [key[2] for key, _ in entries])
+        posts_data = [dict(payload, liked_by_user=key[2] in liked_ids) for key, payload in entries]
+
+        next_cursor = encode_cursor(*entries[-1][0]) if has_more else None
+
+        return jsonify({'posts': posts_data, 'next_cursor': next_cursor}), 200
 
     except Exception as e:
         return jsonify({'error': f'獲取帖子失敗: {str(e)}'}), 500
@@ -45,11 +230,19 @@ def create_post():
         )
 
         db.session.add(post)
+        db.session.flush()
+        # 帖子自己的版本也遞增，按 ids 批量讀取時之前返回為 missing 的結果隨之失效
+        versions = bump_versions(FEED_VERSION, post_version_key(post.id))
         db.session.commit()
 
+        post_data = post.to_dict(request.current_user.id, liked_by_user=False)
+        feed_cache.add_post(post_sort_key(post.likes_count, post.created_at, post.id), _shared_payload(post_data))
+        feed_cache.advance_version(versions[FEED_VERSION])
+        event_hub.publish('post_created', {'post': _shared_payload(post_data)})
+
         return jsonify({
             'message': '帖子發布成功',
-            'post': post.to_dict(request.current_user.id)
+            'post': post_data
         }), 201
 
     except Exception as e:
@@ -58,44 +251,86 @@ def create_post():
 
 @posts_bp.route('/posts/<int:post_id>', methods=['GET'])
 @require_auth
+@conditional_get(lambda post_id: [post_version_key(post_id)], also_read=[FEED_VERSION])
 def get_post(post_id):
     try:
-        post = Post.query.get_or_404(post_id)
         current_user_id = request.current_user.id
-        
-        return jsonify({'post': post.to_dict(current_user_id)}), 200
+        feed_cache.sync_version(g.content_versions[FEED_VERSION])
+
+        payload = feed_cache.get_payload(post_id)
+        if payload is None:
+            generation = feed_cache.generation
+            row = db.session.execute(post_rows().where(Post.id == post_id)).first()
+            if row is None:
+                # 主庫中沒有時查歸檔庫；歸檔的帖子不再變化，也不進入緩存
+                row = archive.post_row(post_id)
+                if row is None:
+                    return jsonify({'error': '帖子不存在'}), 404
+                return jsonify({'post': row_to_dict(row, liked_post_ids(current_user_id, [post_id]))}), 200
+            payload = _shared_payload(row_to_dict(row))
+            feed_cache.put_payload(post_id, payload, generation)
+
+        liked_by_user = post_id in liked_post_ids(current_user_id, [post_id])
+        return jsonify({'post': dict(payload, liked_by_user=liked_by_user)}), 200
 
     except Exception as e:
         return jsonify({'error': f'獲取帖子失敗: {str(e)}'}), 500
 
-@posts_bp.route('/posts/<int:post_id>/like', methods=['POST'])
+@posts_bp.route('/posts/<int:post_id>', methods=['DELETE'])
 @require_auth
-def toggle_post_like(post_id):
+def delete_post(post_id):
     try:
-        post = Post.query.get_or_404(post_id)
-        user_id = request.current_user.id
+        archived = False
+        author_id = db.session.execute(db.select(Post.user_id).where(Post.id == post_id)).scalar()
+        if author_id is None:
+            row = archive.post_row(post_id)
+            if row is None:
+                return jsonify({'error': '帖子不存在'}), 404
+            archived, author_id = True, row.user_id
+
+        if author_id != request.current_user.id:
+            return jsonify({'error': '只能刪除自己的帖子'}), 403
 
-        # 檢查是否已經點讚
-        existing_like = PostLike.query.filter_by(post_id=post_id, user_id=user_id).first()
+        # 帖子行在一個短事務中刪除後立即不可見，評論和點讚按批清理，多的在後台繼續
+        deletion_worker.delete_post(post_id, archived)
+        event_hub.publish('post_deleted', {'post_id': post_id})
 
-        if existing_like:
-            # 取消點讚
-            db.session.delete(existing_like)
-            post.likes_count = max(0, post.likes_count - 1)
-            action = 'unliked'
+        return jsonify({'message': '帖子已刪除'}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'刪除帖子失敗: {str(e)}'}), 500
+
+@posts_bp.route('/posts/<int:post_id>/like', methods=['POST'])
+@require_auth
+def toggle_post_like(post_id):
+    try:
+        if like_buffer.enabled:
+            # 寫回模式：只記入內存緩衝，由後台線程批量寫庫
+            result = like_buffer.toggle('post', post_id, request.current_user.id)
         else:
-            # 添加點讚
-            like = PostLike(post_id=post_id, user_id=user_id)
-            db.session.add(like)
-            post.likes_count += 1
-            action = 'liked'
+            result = flip_post_like(post_id, request.current_user.id)
+        if result is None:
+            db.session.rollback()
+            return jsonify({'error': '帖子不存在'}), 404
+
+        liked, likes_count = result
+        action = 'liked' if liked else 'unliked'
 
+        # 寫回模式下版本號在批量寫入時遞增
+        likes_key = user_likes_version_key(request.current_user.id)
+        versions = {} if like_buffer.enabled else bump_versions(FEED_VERSION, post_version_key(post_id), likes_key)
         db.session.commit()
+        liked_index.update('post', request.current_user.id, post_id, liked, versions.get(likes_key))
+        feed_cache.update_post(post_id, likes_count=likes_count)
+        if versions:
+            feed_cache.advance_version(versions[FEED_VERSION])
+        event_hub.publish('post_liked', {'post_id': post_id, 'likes_count': likes_count})
 
         return jsonify({
             'message': f'帖子{action}',
-            'likes_count': post.likes_count,
-            'liked': action == 'liked'
+            'likes_count': likes_count,
+            'liked': liked
         }), 200
 
     except Exception as e:
@@ -104,18 +339,28 @@ def toggle_post_like(post_id):
 
 @posts_bp.route('/posts/<int:post_id>/comments', methods=['GET'])
 @require_auth
+@conditional_get(lambda post_id: [post_version_key(post_id)])
 def get_post_comments(post_id):
     try:
-        post = Post.query.get_or_404(post_id)
-        
-        # 獲取評論，按點讚數降序，然後按創建時間降序排序
-        comments = Comment.query.filter_by(post_id=post_id).order_by(
-            desc(Comment.likes_count), desc(Comment.created_at)
-        ).all()
-        
-        current_user_id = request.current_user.id
-        comments_data = [comment.to_dict(current_user_id) for comment in comments]
-        
+        sort = request.args.get('sort', 'top')
+        if sort not in COMMENT_SORTS:
+            return jsonify({'error': 'sort 參數無效'}), 400
+
+        if db.session.query(Post.id).filter_by(id=post_id).first() is not None:
+            # 默認按點讚數降序，然後按創建時間降序排序；
+            # 作者在同一條查詢中取得，不構建 ORM 實例，當前用戶的點讚狀態由點讚索引回答
+            rows = db.session.execute(
+                comment_rows()
+                .where(Comment.post_id == post_id)
+                .order_by(*(desc(column) for column in COMMENT_SORTS[sort]))
+            ).all()
+        elif archive.has_post(post_id):
+            rows = archive.comment_rows([post_id], [column.key for column in COMMENT_SORTS[sort]])
+        else:
+            return jsonify({'error': '帖子不存在'}), 404
+        liked_ids = liked_comment_ids(request.current_user.id, [row.id for row in rows])
+        comments_data = [row_to_dict(row, liked_ids) for row in rows]
+
         return jsonify({'comments': comments_data}), 200
 
     except Exception as e:
@@ -125,8 +370,6 @@ def get_post_comments(post_id):
 @require_auth
 def create_comment(post_id):
     try:
-        post = Post.query.get_or_404(post_id)
-        
         data = request.get_json()
         content = data.get('content', '').strip()
 
@@ -143,15 +386,36 @@ def create_comment(post_id):
             user_id=request.current_user.id
         )
 
-        # 更新帖子的評論數
-        post.comments_count += 1
+        # 評論數在 SQL 中自增，熱度分在同一條 UPDATE 中按新的評論數計算；
+        # 歸檔的帖子是只讀的，與不存在的帖子一樣返回 404
+        new_count = Post.comments_count + 1
+        comments_count = db.session.execute(
+            update(Post)
+            .where(Post.id == post_id)
+            .values(comments_count=new_count, hot_score=post_hot_score_sql(comments_count=new_count))
+            .returning(Post.comments_count),
+            execution_options={'synchronize_session': False}
+        ).scalar()
+        if comments_count is None:
+            db.session.rollback()
+            return jsonify({'error': '帖子不存在'}), 404
 
         db.session.add(comment)
+        versions = bump_versions(FEED_VERSION, post_version_key(post_id))
         db.session.commit()
+        feed_cache.update_post(post_id, comments_count=comments_count)
+        feed_cache.advance_version(versions[FEED_VERSION])
+
+        comment_data = comment.to_dict(request.current_user.id, liked_by_user=False)
+        event_hub.publish('comment_created', {
+            'post_id': post_id,
+            'comments_count': comments_count,
+            'comment': _shared_payload(comment_data)
+        })
 
         return jsonify({
             'message': '評論發表成功',
-            'comment': comment.to_dict(request.current_user.id)
+            'comment': comment_data
         }), 201
 
     except Exception as e:
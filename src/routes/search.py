@@ -0,0 +1,69 @@
+from flask import Blueprint, request, jsonify
+from src.models.user import (
+    Post, Comment, row_to_dict, serialize_posts, serialize_comments, liked_post_ids, liked_comment_ids
+)
+from src.routes.auth import require_auth
+from src.utils.archive import archive
+from src.utils.pagination import parse_limit
+from src.utils.search import build_match_query, search_post_ids, search_comment_ids
+
+search_bp = Blueprint('search', __name__)
+
+def _in_rank_order(model, ids):
+    """按搜索結果的相關度順序加載記錄"""
+    if not ids:
+        return []
+    records = {record.id: record for record in model.query.filter(model.id.in_(ids))}
+    return [records[record_id] for record_id in ids if record_id in records]
+
+def _with_archived(ids, results, load_archived, liked_ids):
+    """主庫中找不到的搜索結果（已歸檔）從歸檔庫補上，保持相關度順序"""
+    found = {item['id']: item for item in results}
+    missing = [record_id for record_id in ids if record_id not in found]
+    if missing:
+        liked = liked_ids(missing)
+        found.update({record_id: row_to_dict(row, liked) for record_id, row in load_archived(missing).items()})
+    return [found[record_id] for record_id in ids if record_id in found]
+
+@search_bp.route('/search', methods=['GET'])
+@require_auth
+def search():
+    try:
+        match = build_match_query(request.args.get('q', '').strip())
+        if not match:
+            return jsonify({'error': '請輸入搜索關鍵詞'}), 400
+
+        search_type = request.args.get('type', 'posts')
+        if search_type not in ('posts', 'comments'):
+            return jsonify({'error': 'type 參數只能是 posts 或 comments'}), 400
+
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            page = max(1, int(request.args.get('page', 1)))
+        except ValueError:
+            return jsonify({'error': '分頁參數無效'}), 400
+
+        # 多取一條用於判斷是否還有下一頁
+        offset = (page - 1) * limit
+        current_user_id = request.current_user.id
+        if search_type == 'posts':
+            ids = search_post_ids(match, limit + 1, offset)
+            results = _with_archived(
+                ids[:limit], serialize_posts(_in_rank_order(Post, ids[:limit]), current_user_id),
+                archive.post_rows, lambda missing: liked_post_ids(current_user_id, missing)
+            )
+        else:
+            ids = search_comment_ids(match, limit + 1, offset)
+            results = _with_archived(
+                ids[:limit], serialize_comments(_in_rank_order(Comment, ids[:limit]), current_user_id),
+                archive.comment_rows_by_id, lambda missing: liked_comment_ids(current_user_id, missing)
+            )
+
+        return jsonify({
+            search_type: results,
+            'page': page,
+            'has_more': len(ids) > limit
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': f'搜索失敗: {str(e)}'}), 500
@@ -0,0 +1,79 @@
+import queue
+import sys
+from flask import Blueprint, Response, request, jsonify
+from src.routes.auth import require_auth
+from src.utils.event_hub import event_hub
+
+stream_bp = Blueprint('stream', __name__)
+
+def _format_event(event_id, event_type, payload):
+    return f'id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n'
+
+def _async_worker():
+    """是否運行在 gevent worker 中：socket 已被 monkey patch，阻塞等待只掛起協程"""
+    monkey = sys.modules.get('gevent.monkey')
+    return monkey is not None and monkey.is_module_patched('socket')
+
+def _parse_last_event_id():
+    # 瀏覽器重連時通過請求頭發送，手動重連時也可以用查詢參數
+    value = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+@stream_bp.route('/stream', methods=['GET'])
+@require_auth
+def stream():
+    """SSE 推送點讚和評論變化
+
+    事件類型：post_created、post_liked、comment_created、comment_deleted、comment_liked，
+    以及 Last-Event-ID 無法補發時的 reset（客戶端應重新拉取數據）。
+    空閒連接不佔用數據庫連接；每個連接阻塞一個線程，只有在 gevent worker 中部署
+    （gunicorn -k gevent src.wsgi:app）才能支撐大量長連接。在同步 worker 中
+    幾個連接就會佔滿所有 worker，因此默認返回 503（見 EVENT_STREAM_REQUIRE_ASYNC）。
+    """
+    if event_hub.require_async and not _async_worker():
+        return jsonify({'error': '實時推送需要以 gevent worker 部署'}), 503
+
+    subscriber, missed = event_hub.subscribe(_parse_last_event_id())
+    if subscriber is None:
+        response = jsonify({'error': '連接數已滿，請稍後重試'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+
+    def generate():
+        last_sent = 0
+        try:
+            yield f'retry: {event_hub.retry_ms}\n\n'
+            if missed is None:
+                yield 'event: reset\ndata: {}\n\n'
+            for event in missed or ():
+                last_sent = event[0]
+                yield _format_event(*event)
+
+            while True:
+                try:
+                    event = subscriber.queue.get(timeout=event_hub.heartbeat)
+                except queue.Empty:
+                    # 心跳註釋行，保持代理連接並及時發現已斷開的客戶端
+                    yield ': ping\n\n'
+                    continue
+                if event is None:
+                    # 被判定為慢消費者，結束響應讓客戶端重連補發
+                    return
+                if event[0] <= last_sent:
+                    # 訂閱時已經通過補發送出
+                    continue
+                last_sent = event[0]
+                yield _format_event(*event)
+        finally:
+            # 生成器未開始就斷開的連接不會執行到這裡，它的隊列寫滿後會被當作慢消費者移除
+            event_hub.unsubscribe(subscriber)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # 關閉 nginx 等反向代理的響應緩衝
+        'X-Accel-Buffering': 'no',
+    })
@@ -1,5 +1,8 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
 from src.models.user import User, db
+from src.routes.auth import require_auth
+from src.utils.deletion import deletion_worker
+from src.utils.user_cache import user_cache
 
 user_bp = Blueprint('user', __name__)
 
@@ -29,11 +32,18 @@ def update_user(user_id):
     user.username = data.get('username', user.username)
     user.email = data.get('email', user.email)
     db.session.commit()
+    user_cache.invalidate(user_id)
     return jsonify(user.to_dict())
 
 @user_bp.route('/users/<int:user_id>', methods=['DELETE'])
+@require_auth
 def delete_user(user_id):
-    user = User.query.get_or_404(user_id)
-    db.session.delete(user)
-    db.session.commit()
-    return '', 204
+    # 只能刪除自己的賬號，ADMIN_USER_IDS 中的管理員可以刪除任何用戶
+    current_user_id = request.current_user.id
+    if user_id != current_user_id and current_user_id not in current_app.config['ADMIN_USER_IDS']:
+        return jsonify({'error': '只能刪除自己的賬號'}), 403
+    User.query.get_or_404(user_id)
+    # 帖子、評論和點讚按批刪除並批量調整計數，內容多的用戶在後台刪完後再刪除用戶本身
+    if deletion_worker.submit('user', user_id):
+        return '', 204
+    return jsonify({'message': '用戶數據正在後台刪除'}), 202
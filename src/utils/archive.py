@@ -0,0 +1,250 @@
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import Column, Index, MetaData, Table, UniqueConstraint, delete, event, func, insert, select
+from sqlalchemy.engine import Engine
+from src.models.user import db, Post, PostLike, Comment, CommentLike, post_rows, comment_rows
+from src.utils.feed_cache import feed_cache
+from src.utils.sqlite_profile import sqlite_profile
+from src.utils.versions import FEED_VERSION, bump_versions, post_version_key
+
+# 歸檔庫在每個連接上以這個名字 ATTACH，表名與主庫相同
+ARCHIVE_SCHEMA = 'archive'
+
+archive_metadata = MetaData(schema=ARCHIVE_SCHEMA)
+
+
+def _archive_table(table):
+    """在歸檔庫中建立與主庫結構和索引相同的表（不含外鍵，SQLite 不支持跨庫外鍵）"""
+    columns = [Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+               for column in table.columns]
+    indexes = [Index(index.name, *(column.name for column in index.columns), unique=index.unique)
+               for index in table.indexes]
+    indexes += [Index(constraint.name, *(column.name for column in constraint.columns), unique=True)
+                for constraint in table.constraints if isinstance(constraint, UniqueConstraint)]
+    return Table(table.name, archive_metadata, *columns, *indexes)
+
+
+archived_post = _archive_table(Post.__table__)
+archived_comment = _archive_table(Comment.__table__)
+archived_post_like = _archive_table(PostLike.__table__)
+archived_comment_like = _archive_table(CommentLike.__table__)
+
+# 主庫表 -> 歸檔表，按外鍵依賴順序排列
+ARCHIVED_TABLES = (
+    (Post.__table__, archived_post),
+    (Comment.__table__, archived_comment),
+    (PostLike.__table__, archived_post_like),
+    (CommentLike.__table__, archived_comment_like),
+)
+
+
+class Archive:
+    """冷數據歸檔：長期沒有互動的舊帖子連同評論和點讚移到單獨的 SQLite 文件
+
+    歸檔庫在每個連接建立時 ATTACH 為 archive，讀寫連接都能訪問，歸檔任務
+    在一個寫事務中完成複製和刪除。首頁、排序和計數器只涉及主庫，主庫的表、
+    索引和頁緩存只包含熱數據；單帖詳情、評論列表和搜索在主庫找不到時再查歸檔庫。
+    歸檔的帖子是只讀的，點讚和評論按帖子不存在處理。
+
+    ARCHIVE_DATABASE 默認為主庫旁邊的 <主庫名>-archive.db，設為 None 時關閉歸檔。
+    """
+
+    def __init__(self):
+        self.path = None
+        self._listening = False
+
+    def init_app(self, app):
+        uri = app.config.get('SQLALCHEMY_DATABASE_URI', '')
+        default = None
+        if uri.startswith('sqlite:///') and uri != 'sqlite:///:memory:':
+            root, ext = os.path.splitext(uri[len('sqlite:///'):])
+            default = f'{root}-archive{ext or ".db"}'
+        self.path = app.config.setdefault('ARCHIVE_DATABASE', default)
+
+        if self.path and not self._listening:
+            event.listen(Engine, 'connect', self._on_connect)
+            self._listening = True
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        if self.path and isinstance(dbapi_connection, sqlite3.Connection):
+            dbapi_connection.execute(f'ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}', (self.path,))
+            # 連接級的 PRAGMA 在 ATTACH 之前已設置，WAL 等按庫生效的需要對歸檔庫再設置一次
+            sqlite_profile.apply_to_schema(dbapi_connection, ARCHIVE_SCHEMA)
+
+    def create_tables(self, conn):
+        """在 conn 的事務中創建歸檔庫中缺少的表和索引"""
+        if self.enabled:
+            archive_metadata.create_all(conn)
+
+    def ensure_tables(self):
+        """創建歸檔庫中缺少的表和索引（結構升級和 flask init-db 時調用，不在普通啟動路徑上）"""
+        if not self.enabled:
+            return
+        with db.engine.begin() as conn:
+            self.create_tables(conn)
+
+    def ensure_id_floor(self):
+        """在一個寫事務中執行 raise_id_floor（flask init-db 和 archive-posts 中調用）"""
+        if not self.enabled:
+            return
+        with db.engine.begin() as conn:
+            self.raise_id_floor(conn)
+
+    def raise_id_floor(self, conn):
+        """保證主庫新行的id大於歸檔庫中已有的id
+
+        帖子、評論和點讚表使用 AUTOINCREMENT，歸檔後主庫中不再有的id也不會被重用；
+        升級為 AUTOINCREMENT 之前就已歸檔的id不在 sqlite_sequence 中，這裡把各表的
+        sqlite_sequence 提高到歸檔庫中的最大id。
+        """
+        if not self.enabled:
+            return
+        archived_names = {row[0] for row in conn.exec_driver_sql(
+            f"SELECT name FROM {ARCHIVE_SCHEMA}.sqlite_master WHERE type = 'table'"
+        )}
+        has_sequence = conn.exec_driver_sql(
+            "SELECT 1 FROM main.sqlite_master WHERE name = 'sqlite_sequence'"
+        ).first() is not None
+        if not has_sequence:
+            return
+        for table, archived in ARCHIVED_TABLES:
+            if archived.name not in archived_names:
+                continue
+            max_id = conn.execute(select(func.max(archived.c.id))).scalar()
+            if max_id is None:
+                continue
+            raised = conn.exec_driver_sql(
+                'UPDATE main.sqlite_sequence SET seq = max(seq, ?) WHERE name = ?', (max_id, table.name)
+            ).rowcount
+            if not raised:
+                conn.exec_driver_sql('INSERT INTO main.sqlite_sequence(name, seq) VALUES (?, ?)', (table.name, max_id))
+
+    # 讀取：與 post_rows / comment_rows 的列相同，結果同樣用 row_to_dict 轉換；
+    # 點讚索引同時加載歸檔庫中的點讚，liked_post_ids / liked_comment_ids 對歸檔內容同樣適用
+
+    def post_row(self, post_id):
+        if not self.enabled:
+            return None
+        return db.session.execute(post_rows(archived_post).where(archived_post.c.id == post_id)).first()
+
+    def post_rows(self, post_ids):
+        """按id批量讀取歸檔的帖子，返回 {id: Row}"""
+        if not self.enabled or not post_ids:
+            return {}
+        rows = db.session.execute(post_rows(archived_post).where(archived_post.c.id.in_(post_ids)))
+        return {row.id: row for row in rows}
+
+    def has_post(self, post_id):
+        if not self.enabled:
+            return False
+        return db.session.execute(select(archived_post.c.id).where(archived_post.c.id == post_id)).first() is not None
+
+    def comment_rows(self, post_ids, order_by):
+        """歸檔帖子的評論，按帖子id分組，組內按 order_by 中的列名（均按降序）排序"""
+        return db.session.execute(
+            comment_rows(archived_comment)
+            .where(archived_comment.c.post_id.in_(post_ids))
+            .order_by(archived_comment.c.post_id, *(archived_comment.c[name].desc() for name in order_by))
+        ).all()
+
+    def comment_rows_by_id(self, comment_ids):
+        """按id批量讀取歸檔的評論，返回 {id: Row}"""
+        if not self.enabled or not comment_ids:
+            return {}
+        rows = db.session.execute(comment_rows(archived_comment).where(archived_comment.c.id.in_(comment_ids)))
+        return {row.id: row for row in rows}
+
+    # 歸檔任務
+
+    def candidate_ids(self, created_before, active_since, max_recent_activity, after_id, chunk_size):
+        """id 大於 after_id 的一批可歸檔帖子，返回 (可歸檔的id, 本批掃描到的最大id或None)
+
+        可歸檔：發布時間早於 created_before，且 active_since 之後的點讚數加評論數
+        不超過 max_recent_activity。
+        """
+        post = Post.__table__
+        rows = db.session.execute(
+            select(post.c.id).where(post.c.id > after_id, post.c.created_at < created_before)
+            .order_by(post.c.id).limit(chunk_size)
+        ).all()
+        if not rows:
+            return [], None
+        ids = [row[0] for row in rows]
+
+        recent = {}
+        for model in (PostLike, Comment):
+            counts = db.session.execute(
+                select(model.post_id, func.count())
+                .where(model.post_id.in_(ids), model.created_at >= active_since)
+                .group_by(model.post_id)
+            )
+            for post_id, count in counts:
+                recent[post_id] = recent.get(post_id, 0) + count
+        return [post_id for post_id in ids if recent.get(post_id, 0) <= max_recent_activity], ids[-1]
+
+    def move_posts(self, post_ids):
+        """在當前事務中把帖子連同評論和點讚複製到歸檔庫並從主庫刪除，返回移動的帖子數
+
+        WAL 模式下跨庫事務只對每個庫分別原子：先寫歸檔庫再刪主庫，中斷時最多
+        兩邊各有一份，讀取優先主庫不受影響，再次歸檔時 INSERT OR REPLACE 覆蓋。
+        全文索引保留在主庫，搜索結果通過歸檔庫回填。
+        """
+        post, comment = Post.__table__, Comment.__table__
+        comment_ids = select(comment.c.id).where(comment.c.post_id.in_(post_ids)).scalar_subquery()
+        conditions = {
+            post: post.c.id.in_(post_ids),
+            comment: comment.c.post_id.in_(post_ids),
+            PostLike.__table__: PostLike.__table__.c.post_id.in_(post_ids),
+            CommentLike.__table__: CommentLike.__table__.c.comment_id.in_(comment_ids),
+        }
+        for table, archived in ARCHIVED_TABLES:
+            columns = [column.name for column in table.columns]
+            db.session.execute(
+                insert(archived).prefix_with('OR REPLACE')
+                .from_select(columns, select(*(table.c[name] for name in columns)).where(conditions[table]))
+            )
+        # 評論點讚按評論定位，需在刪除評論之前刪除
+        moved = 0
+        for table, _ in reversed(ARCHIVED_TABLES):
+            deleted = db.session.execute(delete(table).where(conditions[table])).rowcount
+            if table is post:
+                moved = deleted
+        return moved
+
+    def archive_posts(self, older_than_days=180, idle_days=30, max_recent_activity=0, chunk_size=500,
+                      sleep_ratio=1.0, min_pause=0.01, log=print):
+        """按id分批歸檔舊帖子，每批一個短寫事務，返回歸檔的帖子數"""
+        if not self.enabled:
+            raise RuntimeError('ARCHIVE_DATABASE 未配置')
+        now = datetime.utcnow()
+        created_before = now - timedelta(days=older_than_days)
+        active_since = now - timedelta(days=idle_days)
+
+        after_id = archived = 0
+        while True:
+            started = time.perf_counter()
+            ids, last_id = self.candidate_ids(created_before, active_since, max_recent_activity, after_id, chunk_size)
+            db.session.rollback()
+            if last_id is None:
+                break
+            after_id = last_id
+            if ids:
+                moved = self.move_posts(ids)
+                versions = bump_versions(FEED_VERSION, *(post_version_key(post_id) for post_id in ids))
+                db.session.commit()
+                for post_id in ids:
+                    feed_cache.remove_post(post_id)
+                feed_cache.advance_version(versions[FEED_VERSION])
+                archived += moved
+                log(f'已歸檔到 id {last_id}，本批 {moved} 個帖子')
+            time.sleep(max(min_pause, (time.perf_counter() - started) * sleep_ratio))
+        return archived
+
+
+archive = Archive()
@@ -0,0 +1,329 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from sqlalchemy import bindparam, case, delete, func, select, text, update
+from sqlalchemy.dialects.sqlite import insert
+from src.models.user import db, User, InviteCode, Post, PostLike, Comment, CommentLike, DeletionJob
+from src.utils.archive import archive, archived_comment, archived_comment_like, archived_post, archived_post_like
+from src.utils.feed_cache import feed_cache
+from src.utils.liked_index import liked_index
+from src.utils.ranking import comment_hot_score_sql, post_hot_score_sql
+from src.utils.user_cache import user_cache
+from src.utils.versions import FEED_VERSION, bump_versions, post_version_key
+
+logger = logging.getLogger(__name__)
+
+_DELETE_POST_FTS = text('DELETE FROM post_fts WHERE rowid IN :ids').bindparams(bindparam('ids', expanding=True))
+_DELETE_COMMENT_FTS = text('DELETE FROM comment_fts WHERE rowid IN :ids').bindparams(bindparam('ids', expanding=True))
+
+
+class DeleteBatch:
+    """一批刪除在當前事務中產生的影響：刪除的行數、要遞增的版本鍵、首頁緩存和點讚索引的更新"""
+
+    def __init__(self):
+        self.rows = 0
+        self.version_keys = set()
+        self.post_counts = {}
+        self.removed_posts = set()
+        self.removed_users = set()
+        # 點讚索引中要移除的目標：類型 -> id集合（包括歸檔庫中刪除的）
+        self.removed_targets = {'post': set(), 'comment': set()}
+
+    def commit(self):
+        """遞增版本號並提交，然後同步進程內緩存"""
+        versions = bump_versions(*sorted(self.version_keys)) if self.version_keys else {}
+        db.session.commit()
+        for post_id in self.removed_posts:
+            feed_cache.remove_post(post_id)
+        for post_id, changes in self.post_counts.items():
+            feed_cache.update_post(post_id, **changes)
+        if FEED_VERSION in versions:
+            feed_cache.advance_version(versions[FEED_VERSION])
+        for user_id in self.removed_users:
+            user_cache.invalidate(user_id)
+            liked_index.invalidate_user(user_id)
+        for kind, target_ids in self.removed_targets.items():
+            liked_index.forget(kind, target_ids)
+
+
+def _tables(archived):
+    """返回 (帖子表, 評論表, 帖子點讚表, 評論點讚表)：主庫的或歸檔庫中的"""
+    if archived:
+        return archived_post, archived_comment, archived_post_like, archived_comment_like
+    return Post.__table__, Comment.__table__, PostLike.__table__, CommentLike.__table__
+
+
+# 以下函數都在當前事務中執行，每條語句按一組 id 整體刪除或更新，不加載 ORM 實例；
+# archived 為 True 時操作歸檔庫中的表（全文索引只在主庫，兩種情況都要刪除）
+
+def delete_post_rows(batch, post_ids, archived=False):
+    """刪除帖子行和全文索引，並登記後台清理其評論和點讚的任務"""
+    table = _tables(archived)[0]
+    deleted = [row[0] for row in db.session.execute(
+        delete(table).where(table.c.id.in_(post_ids)).returning(table.c.id)
+    )]
+    if not deleted:
+        return
+    db.session.execute(_DELETE_POST_FTS, {'ids': deleted})
+    db.session.execute(
+        insert(DeletionJob.__table__).on_conflict_do_nothing(),
+        [{'kind': 'archived_post' if archived else 'post', 'target_id': post_id} for post_id in deleted]
+    )
+    batch.rows += len(deleted)
+    batch.version_keys.update(post_version_key(post_id) for post_id in deleted)
+    batch.removed_targets['post'].update(deleted)
+    if not archived:
+        batch.removed_posts.update(deleted)
+        batch.version_keys.add(FEED_VERSION)
+
+
+def delete_comment_rows(batch, comment_ids, archived=False):
+    """刪除評論及其點讚和全文索引，並按帖子分組減少評論數"""
+    _, table, _, like_table = _tables(archived)
+    rows = db.session.execute(
+        delete(table).where(table.c.id.in_(comment_ids)).returning(table.c.id, table.c.post_id)
+    ).all()
+    if not rows:
+        return
+    deleted = [row[0] for row in rows]
+    removed_likes = db.session.execute(delete(like_table).where(like_table.c.comment_id.in_(deleted))).rowcount
+    db.session.execute(_DELETE_COMMENT_FTS, {'ids': deleted})
+    batch.rows += len(deleted) + removed_likes
+    batch.removed_targets['comment'].update(deleted)
+    _decrement_posts(batch, 'comments_count', Counter(row[1] for row in rows), archived)
+
+
+def _decrement_posts(batch, column, counts, archived=False):
+    """一條 UPDATE 按 {帖子id: 減少數} 減少帖子的計數並重算熱度分"""
+    table = _tables(archived)[0]
+    new_value = func.max(0, func.coalesce(table.c[column], 0) - case(counts, value=table.c.id, else_=0))
+    rows = db.session.execute(
+        update(table).where(table.c.id.in_(list(counts)))
+        .values({column: new_value, 'hot_score': post_hot_score_sql(**{column: new_value}, table=table)})
+        .returning(table.c.id, table.c[column])
+    ).all()
+    for post_id, value in rows:
+        batch.version_keys.add(post_version_key(post_id))
+        if not archived:
+            batch.post_counts.setdefault(post_id, {})[column] = value
+    if rows and not archived:
+        batch.version_keys.add(FEED_VERSION)
+
+
+def _decrement_comments(batch, counts, archived=False):
+    """一條 UPDATE 按 {評論id: 減少數} 減少評論的點讚數並重算熱度分"""
+    table = _tables(archived)[1]
+    new_value = func.max(0, func.coalesce(table.c.likes_count, 0) - case(counts, value=table.c.id, else_=0))
+    rows = db.session.execute(
+        update(table).where(table.c.id.in_(list(counts)))
+        .values(likes_count=new_value, hot_score=comment_hot_score_sql(new_value, table=table))
+        .returning(table.c.post_id)
+    ).all()
+    batch.version_keys.update(post_version_key(row[0]) for row in rows)
+
+
+def _delete_likes(batch, table, fk_name, user_id, chunk_size):
+    """刪除用戶的一批點讚，返回 {目標id: 刪除數}"""
+    rows = db.session.execute(
+        delete(table)
+        .where(table.c.id.in_(
+            select(table.c.id).where(table.c.user_id == user_id).order_by(table.c.id).limit(chunk_size)
+        ))
+        .returning(table.c[fk_name])
+    ).all()
+    batch.rows += len(rows)
+    return Counter(row[0] for row in rows)
+
+
+# 分批任務的步驟：每步處理至多 chunk_size 行，全部步驟都沒有可刪除的行時任務完成
+
+def _next_ids(table, owner_column, owner_id, chunk_size):
+    return [row[0] for row in db.session.execute(
+        select(table.c.id).where(table.c[owner_column] == owner_id).order_by(table.c.id).limit(chunk_size)
+    )]
+
+
+def _post_comments_step(batch, post_id, chunk_size, archived=False):
+    ids = _next_ids(_tables(archived)[1], 'post_id', post_id, chunk_size)
+    if ids:
+        delete_comment_rows(batch, ids, archived)
+
+
+def _post_likes_step(batch, post_id, chunk_size, archived=False):
+    table = _tables(archived)[2]
+    batch.rows += db.session.execute(
+        delete(table).where(table.c.id.in_(
+            select(table.c.id).where(table.c.post_id == post_id).limit(chunk_size)
+        ))
+    ).rowcount
+
+
+def _user_posts_step(batch, user_id, chunk_size, archived=False):
+    ids = _next_ids(_tables(archived)[0], 'user_id', user_id, chunk_size)
+    if ids:
+        delete_post_rows(batch, ids, archived)
+
+
+def _user_comments_step(batch, user_id, chunk_size, archived=False):
+    ids = _next_ids(_tables(archived)[1], 'user_id', user_id, chunk_size)
+    if ids:
+        delete_comment_rows(batch, ids, archived)
+
+
+def _user_post_likes_step(batch, user_id, chunk_size, archived=False):
+    counts = _delete_likes(batch, _tables(archived)[2], 'post_id', user_id, chunk_size)
+    if counts:
+        _decrement_posts(batch, 'likes_count', counts, archived)
+
+
+def _user_comment_likes_step(batch, user_id, chunk_size, archived=False):
+    counts = _delete_likes(batch, _tables(archived)[3], 'comment_id', user_id, chunk_size)
+    if counts:
+        _decrement_comments(batch, counts, archived)
+
+
+def _finish_user(batch, user_id):
+    invite_table = InviteCode.__table__
+    db.session.execute(
+        update(invite_table).where(invite_table.c.used_by_user_id == user_id).values(used_by_user_id=None)
+    )
+    db.session.execute(delete(User.__table__).where(User.__table__.c.id == user_id))
+    batch.removed_users.add(user_id)
+
+
+def _in_archive(step):
+    """同一步驟作用於歸檔庫；未配置歸檔庫時跳過"""
+    def archived_step(batch, target_id, chunk_size):
+        if archive.enabled:
+            step(batch, target_id, chunk_size, archived=True)
+    return archived_step
+
+
+_USER_STEPS = (_user_posts_step, _user_comments_step, _user_post_likes_step, _user_comment_likes_step)
+
+# 任務類型 -> (按順序執行的步驟, 全部完成後在同一事務中執行的收尾)
+JOB_STEPS = {
+    'post': ((_post_comments_step, _post_likes_step), None),
+    'archived_post': ((_in_archive(_post_comments_step), _in_archive(_post_likes_step)), None),
+    'user': (_USER_STEPS + tuple(_in_archive(step) for step in _USER_STEPS), _finish_user),
+}
+
+
+def run_job_chunk(job_id, kind, target_id, chunk_size):
+    """在一個短事務中執行任務的下一批刪除，返回 (刪除的行數, 任務是否已完成)"""
+    steps, finish = JOB_STEPS[kind]
+    for step in steps:
+        batch = DeleteBatch()
+        step(batch, target_id, chunk_size)
+        if batch.rows:
+            batch.commit()
+            return batch.rows, False
+        db.session.rollback()
+
+    batch = DeleteBatch()
+    if finish is not None:
+        finish(batch, target_id)
+    db.session.execute(delete(DeletionJob.__table__).where(DeletionJob.__table__.c.id == job_id))
+    batch.commit()
+    return batch.rows, True
+
+
+class DeletionWorker:
+    """分批刪除任務的執行器
+
+    任務記錄在 deletion_job 表中。提交任務後先在請求中同步執行至多
+    DELETE_INLINE_ROWS 行，小的刪除在返回前就已完成；剩下的由後台線程
+    每批 DELETE_CHUNK_SIZE 行、每批一個短事務地繼續刪除，批次之間按
+    DELETE_SLEEP_RATIO 休眠，寫鎖不會被長時間佔用。進程重啟後未完成的任務
+    在下次提交任務時或通過 flask purge-deleted 繼續執行。
+    """
+
+    def __init__(self):
+        self.chunk_size = 500
+        self.inline_rows = 2000
+        self.sleep_ratio = 1.0
+        self.background = True
+        self._app = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        self.chunk_size = app.config.setdefault('DELETE_CHUNK_SIZE', self.chunk_size)
+        self.inline_rows = app.config.setdefault('DELETE_INLINE_ROWS', self.inline_rows)
+        self.sleep_ratio = app.config.setdefault('DELETE_SLEEP_RATIO', self.sleep_ratio)
+        self.background = app.config.setdefault('DELETE_IN_BACKGROUND', self.background)
+        self._app = app
+
+    def submit(self, kind, target_id):
+        """登記刪除任務並在當前請求中執行一部分，返回任務是否已經完成"""
+        db.session.execute(
+            insert(DeletionJob.__table__).on_conflict_do_nothing(),
+            {'kind': kind, 'target_id': target_id}
+        )
+        db.session.commit()
+        return self._run_inline(kind, target_id)
+
+    def delete_post(self, post_id, archived=False):
+        """刪除帖子：帖子行在一個事務中刪除並立即不可見，評論和點讚分批清理"""
+        batch = DeleteBatch()
+        delete_post_rows(batch, [post_id], archived)
+        batch.commit()
+        return self._run_inline('archived_post' if archived else 'post', post_id)
+
+    def _run_inline(self, kind, target_id):
+        done = self.run_pending(max_rows=self.inline_rows, only=(kind, target_id))
+        # 沒做完的部分，以及刪除用戶時產生的帖子清理任務，交給後台線程
+        pending = db.session.execute(select(DeletionJob.id).limit(1)).first() is not None
+        db.session.rollback()
+        if pending and self.background:
+            self._ensure_thread()
+            self._wakeup.set()
+        return done
+
+    def run_pending(self, max_rows=None, only=None, sleep_ratio=0):
+        """按登記順序執行任務，刪除 max_rows 行後停止；返回指定的任務（或全部任務）是否已完成"""
+        removed = 0
+        while max_rows is None or removed < max_rows:
+            query = select(DeletionJob.id, DeletionJob.kind, DeletionJob.target_id)
+            if only is not None:
+                query = query.where(DeletionJob.kind == only[0], DeletionJob.target_id == only[1])
+            job = db.session.execute(query.order_by(DeletionJob.id).limit(1)).first()
+            db.session.rollback()
+            if job is None:
+                return True
+
+            started = time.perf_counter()
+            chunk_size = self.chunk_size if max_rows is None else min(self.chunk_size, max_rows - removed)
+            rows, _ = run_job_chunk(job.id, job.kind, job.target_id, max(chunk_size, 1))
+            removed += rows
+            if sleep_ratio:
+                time.sleep((time.perf_counter() - started) * sleep_ratio)
+        return False
+
+    def _ensure_thread(self):
+        # 按進程懶啟動，fork 出的子進程會啟動自己的線程
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='deletion-worker', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                with self._app.app_context():
+                    self.run_pending(sleep_ratio=self.sleep_ratio)
+            except Exception:
+                logger.exception('後台刪除任務失敗，將在下次提交任務時重試')
+
+
+deletion_worker = DeletionWorker()
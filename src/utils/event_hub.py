@@ -0,0 +1,111 @@
+import itertools
+import json
+import queue
+import threading
+from collections import deque
+
+
+class Subscriber:
+    """一個 SSE 連接的有界事件隊列"""
+
+    __slots__ = ('queue', 'dropped')
+
+    def __init__(self, max_queue):
+        self.queue = queue.Queue(max_queue)
+        self.dropped = False
+
+
+class EventHub:
+    """進程內的發佈/訂閱中心，供 /api/stream 推送點讚和評論變化
+
+    每個連接有自己的有界隊列，隊列滿（客戶端讀得太慢）時直接斷開該連接，
+    發佈方永遠不會被阻塞；客戶端重連時帶上 Last-Event-ID，從最近
+    EVENT_HUB_BACKLOG 條事件的環形緩衝中補發。事件只在本進程內傳遞，
+    多進程部署時每個進程只推送自己處理的寫請求。
+
+    每個連接在等待事件時阻塞所在的線程，只有在 gevent worker 中才不佔用真正的線程；
+    EVENT_STREAM_REQUIRE_ASYNC 為 True（默認）時，/api/stream 在其他 worker 中返回 503。
+    """
+
+    def __init__(self):
+        self.max_queue = 100
+        self.max_subscribers = 5000
+        self.heartbeat = 15
+        self.retry_ms = 3000
+        self.require_async = True
+        self._ids = itertools.count(1)
+        self._backlog = deque(maxlen=1000)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_queue = app.config.setdefault('EVENT_HUB_MAX_QUEUE', 100)
+        self.max_subscribers = app.config.setdefault('EVENT_HUB_MAX_SUBSCRIBERS', 5000)
+        self.heartbeat = app.config.setdefault('EVENT_STREAM_HEARTBEAT', 15)
+        self.retry_ms = app.config.setdefault('EVENT_STREAM_RETRY_MS', 3000)
+        self.require_async = app.config.setdefault('EVENT_STREAM_REQUIRE_ASYNC', True)
+        self._backlog = deque(maxlen=app.config.setdefault('EVENT_HUB_BACKLOG', 1000))
+
+    def publish(self, event_type, data):
+        """發佈事件；應在數據庫事務提交之後調用"""
+        payload = json.dumps(data, ensure_ascii=False, default=str)
+        with self._lock:
+            event = (next(self._ids), event_type, payload)
+            self._backlog.append(event)
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(event)
+            except queue.Full:
+                # 慢消費者：斷開連接，讓它重連後按 Last-Event-ID 補發
+                self._drop(subscriber)
+
+    def subscribe(self, last_event_id=None):
+        """註冊新連接，返回 (訂閱者, 需要補發的事件)
+
+        連接數已滿時返回 (None, None)。Last-Event-ID 已不在環形緩衝中時，
+        補發事件為 None，客戶端需要重新拉取數據。
+        """
+        subscriber = Subscriber(self.max_queue)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None, None
+            self._subscribers.add(subscriber)
+            missed = self._replay(last_event_id)
+        return subscriber, missed
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _replay(self, last_event_id):
+        """返回 last_event_id 之後的事件（調用方需持有鎖）"""
+        if last_event_id is None:
+            return []
+        if self._backlog:
+            first_id, last_id = self._backlog[0][0], self._backlog[-1][0]
+            if first_id - 1 <= last_event_id <= last_id:
+                return [event for event in self._backlog if event[0] > last_event_id]
+        # 事件已被環形緩衝覆蓋，或 id 來自重啟之前
+        return None
+
+    def _drop(self, subscriber):
+        self.unsubscribe(subscriber)
+        subscriber.dropped = True
+        # 清空未發送的事件並放入結束標記：客戶端重連時從最後收到的 id 開始補發，不會漏掉中間的事件
+        try:
+            while True:
+                subscriber.queue.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            subscriber.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+event_hub = EventHub()
@@ -0,0 +1,226 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import datetime
+
+
+def post_sort_key(likes_count, created_at, post_id):
+    """首頁排序鍵，升序存放；首頁按此鍵降序展示"""
+    return (likes_count or 0, created_at, post_id)
+
+
+class FeedCache:
+    """進程內的首頁熱門帖子緩存
+
+    緩存保存排名最前的 max_posts 個帖子（排序鍵 + 不含 liked_by_user 的序列化數據），
+    並保證它始終是完整排名的一個前綴：所有排序鍵不小於緩存最低鍵的帖子都在緩存中。
+    寫路由在提交後增量更新緩存；當無法在不查庫的情況下保持前綴正確時，
+    緩存標記為需要重新加載。序列化數據另有一個帶 LRU 淘汰的存儲，供單帖讀取共用。
+    """
+
+    def __init__(self, max_posts=200, max_payloads=2000, ttl=30):
+        self.enabled = True
+        self.max_posts = max_posts
+        self.max_payloads = max_payloads
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._keys = []
+        self._key_by_id = {}
+        self._payloads = OrderedDict()
+        self._complete = False
+        self._loaded_at = None
+        self._generation = 0
+        self._version = None
+
+    def init_app(self, app):
+        self.enabled = app.config.setdefault('FEED_CACHE_ENABLED', True)
+        self.max_posts = app.config.setdefault('FEED_CACHE_MAX_POSTS', self.max_posts)
+        self.max_payloads = max(app.config.setdefault('FEED_CACHE_MAX_PAYLOADS', self.max_payloads), self.max_posts)
+        self.ttl = app.config.setdefault('FEED_CACHE_TTL', self.ttl)
+        self.clear()
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def clear(self):
+        with self._lock:
+            self._keys = []
+            self._key_by_id = {}
+            self._payloads.clear()
+            self._complete = False
+            self._loaded_at = None
+            self._generation += 1
+
+    def sync_version(self, version):
+        """與數據庫中的首頁版本號對齊；版本不同說明有其他進程寫入，整個緩存作廢"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if version != self._version:
+                self.clear()
+                self._version = version
+
+    def advance_version(self, version):
+        """本進程的寫操作把版本號遞增到 version 後調用
+
+        只有緩存恰好處於上一個版本時才前進：中間若夾雜其他進程的寫入，
+        保持舊版本號，下次讀取時由 sync_version 作廢緩存。
+        """
+        with self._lock:
+            if self._version is not None and self._version == version - 1:
+                self._version = version
+
+    def needs_reload(self):
+        """緩存未加載或已過期（用於限制多進程間的數據陳舊時間）"""
+        if not self.enabled:
+            return False
+        with self._lock:
+            return self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+    def reload(self, entries, generation):
+        """用數據庫中排名最前的帖子重建緩存
+
+        entries 為按排名降序的 (key, payload) 列表。若讀取期間有寫操作更新過緩存
+        （generation 已變化），這批數據可能比緩存舊，直接丟棄，下次讀取再加載。
+        """
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self._keys = sorted(key for key, _ in entries)
+            self._key_by_id = {key[2]: key for key, _ in entries}
+            self._payloads.clear()
+            for key, payload in entries:
+                self._payloads[key[2]] = payload
+            self._complete = len(entries) < self.max_posts
+            self._loaded_at = time.monotonic()
+            self._generation += 1
+            return True
+
+    def get_page(self, after, limit):
+        """從緩存取一頁，after 為游標的排序鍵（首頁為 None）
+
+        返回 ([(key, payload), ...], has_more)；緩存無法完整回答時返回 None。
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+                return None
+            end = len(self._keys) if after is None else bisect_left(self._keys, after)
+            if end <= limit and not self._complete:
+                return None
+            keys = self._keys[max(0, end - limit):end]
+            keys.reverse()
+            page = []
+            for key in keys:
+                payload = self._payloads.get(key[2])
+                if payload is None:
+                    return None
+                self._payloads.move_to_end(key[2])
+                page.append((key, payload))
+            return page, end > limit
+
+    def get_payload(self, post_id):
+        """取單個帖子的緩存數據；緩存過期時不返回，與排名前綴一起重新加載"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+                return None
+            payload = self._payloads.get(post_id)
+            if payload is not None:
+                self._payloads.move_to_end(post_id)
+            return payload
+
+    def put_payload(self, post_id, payload, generation):
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation != self._generation or self._loaded_at is None:
+                return
+            self._store_payload(post_id, payload)
+
+    def add_post(self, key, payload):
+        """新帖子發布後寫入緩存"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._generation += 1
+            self._store_payload(key[2], payload)
+            if self._loaded_at is not None and (self._complete or (self._keys and key > self._keys[0])):
+                self._insert_key(key)
+
+    def update_post(self, post_id, **changes):
+        """帖子計數變化後更新緩存，changes 為 likes_count / comments_count 等字段"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._generation += 1
+            payload = self._payloads.get(post_id)
+            if payload is not None:
+                payload = dict(payload, **changes)
+                self._payloads[post_id] = payload
+
+            if 'likes_count' not in changes or self._loaded_at is None:
+                return
+
+            old_key = self._key_by_id.get(post_id)
+            if old_key is not None:
+                new_key = post_sort_key(changes['likes_count'], old_key[1], post_id)
+                self._remove_key(old_key)
+                if self._complete or (self._keys and new_key > self._keys[0]):
+                    self._insert_key(new_key)
+            elif payload is not None and payload.get('created_at'):
+                created_at = datetime.fromisoformat(payload['created_at'])
+                new_key = post_sort_key(changes['likes_count'], created_at, post_id)
+                if self._complete or (self._keys and new_key > self._keys[0]):
+                    self._insert_key(new_key)
+            elif not self._complete and self._keys and changes['likes_count'] >= self._keys[0][0]:
+                # 不在緩存中的帖子可能升入前綴，但沒有它的數據，只能等待重新加載
+                self._loaded_at = None
+
+    def remove_post(self, post_id):
+        """帖子刪除後移出緩存；從前綴中去掉一個帖子，剩下的仍是完整排名的前綴"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._generation += 1
+            self._payloads.pop(post_id, None)
+            key = self._key_by_id.get(post_id)
+            if key is not None:
+                self._remove_key(key)
+
+    def _insert_key(self, key):
+        insort(self._keys, key)
+        self._key_by_id[key[2]] = key
+        while len(self._keys) > self.max_posts:
+            dropped = self._keys.pop(0)
+            self._key_by_id.pop(dropped[2], None)
+            self._complete = False
+
+    def _remove_key(self, key):
+        index = bisect_left(self._keys, key)
+        if index < len(self._keys) and self._keys[index] == key:
+            del self._keys[index]
+        self._key_by_id.pop(key[2], None)
+
+    def _store_payload(self, post_id, payload):
+        self._payloads[post_id] = payload
+        self._payloads.move_to_end(post_id)
+        while len(self._payloads) > self.max_payloads:
+            evicted, _ = self._payloads.popitem(last=False)
+            if evicted in self._key_by_id:
+                # 排名前綴中的帖子失去數據後無法再回答分頁，截斷到它為止以保持前綴正確
+                self._truncate_at(self._key_by_id[evicted])
+
+    def _truncate_at(self, key):
+        index = bisect_left(self._keys, key)
+        for dropped in self._keys[:index + 1]:
+            self._key_by_id.pop(dropped[2], None)
+        del self._keys[:index + 1]
+        self._complete = False
+
+
+feed_cache = FeedCache()
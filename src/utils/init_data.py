@@ -1,18 +1,37 @@
 import random
 import string
+from sqlalchemy.dialects.sqlite import insert
 from src.models.user import db, InviteCode, User, Post, Comment
 
+INVITE_CODE_ALPHABET = string.ascii_uppercase + string.digits
+
 def generate_invite_codes(count=10000):
     """生成邀請碼"""
     codes = set()
     while len(codes) < count:
         # 生成8位隨機字符串
-        code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
+        code = ''.join(random.choices(INVITE_CODE_ALPHABET, k=8))
         codes.add(code)
     
     return list(codes)
 
-def init_invite_codes():
+def seed_invite_codes(count, chunk_size=5000):
+    """分批生成並插入邀請碼，內存佔用只與 chunk_size 有關
+
+    每批用一條 executemany 的 INSERT OR IGNORE 寫入並單獨提交，
+    與已有邀請碼重複的會被忽略並在下一批補足。返回實際插入的數量。
+    """
+    table = InviteCode.__table__
+    statement = insert(table).on_conflict_do_nothing(index_elements=['code'])
+    inserted = 0
+    while inserted < count:
+        batch = min(chunk_size, count - inserted)
+        rows = [{'code': code} for code in generate_invite_codes(batch)]
+        inserted += db.session.execute(statement, rows).rowcount
+        db.session.commit()
+    return inserted
+
+def init_invite_codes(count=10000):
     """初始化邀請碼到數據庫"""
     try:
         # 檢查是否已經有邀請碼
@@ -21,21 +40,14 @@ def init_invite_codes():
             print(f"數據庫中已有 {existing_count} 個邀請碼")
             return
 
-        print("正在生成10000個邀請碼...")
-        codes = generate_invite_codes(10000)
-        
-        print("正在保存到數據庫...")
-        for code in codes:
-            invite_code = InviteCode(code=code)
-            db.session.add(invite_code)
-        
-        db.session.commit()
-        print(f"成功生成並保存了 {len(codes)} 個邀請碼")
+        print(f"正在生成並保存{count}個邀請碼...")
+        inserted = seed_invite_codes(count)
+        print(f"成功生成並保存了 {inserted} 個邀請碼")
         
         # 顯示前10個邀請碼作為示例
         print("前10個邀請碼示例:")
-        for i, code in enumerate(codes[:10]):
-            print(f"  {i+1}. {code}")
+        for i, invite_code in enumerate(InviteCode.query.filter_by(is_used=False).limit(10)):
+            print(f"  {i+1}. {invite_code.code}")
 
     except Exception as e:
         db.session.rollback()
@@ -0,0 +1,45 @@
+import json
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson 為可選依賴，未安裝時使用標準庫 json
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """更快的 JSON 序列化：安裝了 orjson 時用 orjson，否則用不轉義非 ASCII 字符的標準庫 json
+
+    與默認實現一樣按鍵排序，日期等特殊類型仍交給 DefaultJSONProvider.default 處理，
+    輸出的 JSON 與之前語義相同（只是中文不再轉義為 \\uXXXX）。
+    """
+
+    ensure_ascii = False
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            kwargs.setdefault('default', self.default)
+            kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+            kwargs.setdefault('sort_keys', self.sort_keys)
+            return json.dumps(obj, **kwargs)
+        return self._orjson_dumps(obj, indent=kwargs.get('indent')).decode('utf-8')
+
+    def _orjson_dumps(self, obj, indent=None):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        # 直接輸出 bytes，省去一次解碼和編碼
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self._orjson_dumps(obj, indent=indent) + b'\n', mimetype=self.mimetype)
+
+
+def init_app(app):
+    app.json = FastJSONProvider(app)
@@ -0,0 +1,239 @@
+import atexit
+import logging
+import os
+import threading
+from datetime import datetime
+from sqlalchemy import bindparam, delete, exists, func, select, update
+from sqlalchemy.dialects.sqlite import insert
+from src.models.user import db, Post, PostLike, Comment, CommentLike
+from src.utils.feed_cache import feed_cache
+from src.utils.ranking import comment_hot_score_sql, post_hot_score_sql
+from src.utils.versions import FEED_VERSION, bump_versions, post_version_key, user_likes_version_key
+
+logger = logging.getLogger(__name__)
+
+# 點讚類型 -> (點讚表模型, 外鍵字段名, 目標模型)
+_KINDS = {
+    'post': (PostLike, 'post_id', Post, post_hot_score_sql),
+    'comment': (CommentLike, 'comment_id', Comment, comment_hot_score_sql),
+}
+
+
+class LikeBuffer:
+    """點讚寫回緩衝（write-behind）
+
+    開啟後點讚/取消點讚只在內存中按 (類型, 目標, 用戶) 合併，立即返回預計的點讚數，
+    由後台線程每 LIKE_FLUSH_INTERVAL_MS 毫秒或累計 LIKE_FLUSH_MAX_EVENTS 個事件時
+    在一個事務中批量寫入點讚表並重算計數器。進程正常退出時會寫入剩餘事件，
+    崩潰時最多丟失一個刷新窗口內的點讚。預計點讚數只反映本進程的緩衝。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.flush_interval = 0.2
+        self.max_pending = 500
+        self._app = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending = {}
+        self._inflight = {}
+        # 每批寫入結束（清空 _inflight）時遞增，toggle 據此判斷讀到的數據庫狀態是否已過時
+        self._flushes = 0
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        self.enabled = app.config.setdefault('LIKE_WRITE_BEHIND', False)
+        self.flush_interval = app.config.setdefault('LIKE_FLUSH_INTERVAL_MS', 200) / 1000
+        self.max_pending = app.config.setdefault('LIKE_FLUSH_MAX_EVENTS', 500)
+        self._app = app
+        if self.enabled:
+            atexit.register(self.shutdown)
+
+    def toggle(self, kind, target_id, user_id):
+        """切換點讚狀態並返回 (liked, 預計點讚數)；目標不存在時返回 None"""
+        like_model, fk_name, target_model, _ = _KINDS[kind]
+        fk = getattr(like_model, fk_name)
+        key = (kind, target_id, user_id)
+        while True:
+            with self._lock:
+                flushes = self._flushes
+            row = db.session.execute(
+                select(target_model.likes_count, exists().where(fk == target_id, like_model.user_id == user_id))
+                .where(target_model.id == target_id)
+            ).first()
+            if row is None:
+                return None
+            db_count, db_liked = row[0] or 0, bool(row[1])
+
+            self._lock.acquire()
+            if self._flushes == flushes:
+                break
+            # 讀取期間有一批寫入完成並移出了 _inflight，讀到的可能是寫入前的狀態，重新讀取
+            self._lock.release()
+
+        try:
+            entry = self._pending.get(key) or self._inflight.get(key)
+            current = entry[1] if entry else db_liked
+            original = self._pending[key][0] if key in self._pending else current
+            liked = not current
+            if liked == original:
+                # 與數據庫中的狀態一致，兩次切換相互抵消
+                self._pending.pop(key, None)
+            else:
+                self._pending[key] = (original, liked)
+            likes_count = max(0, db_count + self._delta(kind, target_id))
+            full = len(self._pending) >= self.max_pending
+        finally:
+            self._lock.release()
+
+        self._ensure_thread()
+        if full:
+            self._wakeup.set()
+        return liked, likes_count
+
+    def _delta(self, kind, target_id):
+        """尚未寫入數據庫的點讚數變化（調用方需持有鎖）"""
+        delta = 0
+        for events in (self._inflight, self._pending):
+            for (k, t, _), (original, liked) in events.items():
+                if k == kind and t == target_id:
+                    delta += int(liked) - int(original)
+        return delta
+
+    def pending_likes(self, kind, user_id):
+        """用戶尚未寫入數據庫的點讚切換，返回 {目標id: liked}"""
+        with self._lock:
+            result = {}
+            for events in (self._inflight, self._pending):
+                for (k, t, u), (_, liked) in events.items():
+                    if k == kind and u == user_id:
+                        result[t] = liked
+            return result
+
+    def flush(self):
+        """把緩衝中的點讚在一個事務中批量寫入數據庫
+
+        返回 ({(類型, 目標id): 點讚數}, {版本鍵: 新版本號})。
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._inflight = batch
+            if not batch:
+                return {}, {}
+
+            try:
+                with self._app.app_context():
+                    counts, versions = self._apply(batch)
+            except Exception:
+                logger.exception('點讚批量寫入失敗，事件已放回緩衝')
+                with self._lock:
+                    self._requeue(batch)
+                    self._inflight = {}
+                    self._flushes += 1
+                return {}, {}
+
+            with self._lock:
+                self._inflight = {}
+                self._flushes += 1
+            return counts, versions
+
+    def _apply(self, batch):
+        """寫入一批點讚並遞增相關的內容版本號，返回 (計數, 新版本號)"""
+        counts = {}
+        version_keys = set()
+        try:
+            for kind, (like_model, fk_name, target_model, score_sql) in _KINDS.items():
+                table = like_model.__table__
+                now = datetime.utcnow()
+                liked = [
+                    {fk_name: t, 'user_id': u, 'created_at': now}
+                    for (k, t, u), (_, l) in batch.items() if k == kind and l
+                ]
+                unliked = [{'t': t, 'u': u} for (k, t, u), (_, l) in batch.items() if k == kind and not l]
+                target_ids = {t for (k, t, _) in batch if k == kind}
+                if not target_ids:
+                    continue
+
+                if liked:
+                    db.session.execute(
+                        insert(table).on_conflict_do_nothing(),
+                        liked
+                    )
+                if unliked:
+                    db.session.execute(
+                        delete(table).where(table.c[fk_name] == bindparam('t'), table.c.user_id == bindparam('u')),
+                        unliked
+                    )
+
+                # 按點讚表重算受影響目標的計數，順帶修正之前可能存在的偏差
+                target_table = target_model.__table__
+                like_count = (
+                    select(func.count())
+                    .where(table.c[fk_name] == target_table.c.id)
+                    .scalar_subquery()
+                )
+                post_id_column = target_table.c.id if kind == 'post' else target_table.c.post_id
+                rows = db.session.execute(
+                    update(target_table)
+                    .where(target_table.c.id.in_(target_ids))
+                    .values(likes_count=like_count, hot_score=score_sql(like_count))
+                    .returning(target_table.c.id, target_table.c.likes_count, post_id_column)
+                )
+                for target_id, count, post_id in rows:
+                    counts[(kind, target_id)] = count
+                    version_keys.add(post_version_key(post_id))
+                if kind == 'post':
+                    version_keys.add(FEED_VERSION)
+                version_keys.update(user_likes_version_key(u) for (k, _, u) in batch if k == kind)
+
+            versions = bump_versions(*sorted(version_keys))
+            db.session.commit()
+            return counts, versions
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def _requeue(self, batch):
+        """寫入失敗時把事件合併回緩衝，原始狀態以失敗批次的為準（調用方需持有鎖）"""
+        for key, (original, liked) in batch.items():
+            if key in self._pending:
+                liked = self._pending[key][1]
+            if liked == original:
+                self._pending.pop(key, None)
+            else:
+                self._pending[key] = (original, liked)
+
+    def _ensure_thread(self):
+        # 按進程懶啟動，fork 出的子進程會啟動自己的刷新線程
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='like-buffer-flush', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self._flush_and_publish()
+
+    def _flush_and_publish(self):
+        counts, versions = self.flush()
+        for (kind, target_id), likes_count in counts.items():
+            if kind == 'post':
+                feed_cache.update_post(target_id, likes_count=likes_count)
+        if FEED_VERSION in versions:
+            feed_cache.advance_version(versions[FEED_VERSION])
+
+    def shutdown(self):
+        """進程退出前寫入緩衝中剩餘的點讚"""
+        self._flush_and_publish()
+
+
+like_buffer = LikeBuffer()
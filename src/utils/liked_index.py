@@ -0,0 +1,205 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from flask import g, has_request_context
+from sqlalchemy import select, union_all
+from src.models.user import db, PostLike, CommentLike
+from src.utils.archive import archive, archived_comment_like, archived_post_like
+from src.utils.like_buffer import like_buffer
+from src.utils.versions import read_versions, user_likes_version_key
+
+# 點讚類型 -> (點讚表, 外鍵列名, 歸檔庫中的點讚表)
+_KINDS = {
+    'post': (PostLike.__table__, 'post_id', archived_post_like),
+    'comment': (CommentLike.__table__, 'comment_id', archived_comment_like),
+}
+
+
+def _contains(ids, target_id):
+    i = bisect_left(ids, target_id)
+    return i < len(ids) and ids[i] == target_id
+
+
+class LikedIndex:
+    """進程內的用戶點讚索引：每個活躍用戶點讚過的帖子id和評論id（TTL + LRU）
+
+    每個 (類型, 用戶) 保存一個有序的 64 位整數數組，第一次用到時用一條查詢加載
+    （包括歸檔庫中的點讚和寫回緩衝中尚未寫庫的切換），之後 liked_by_user 用二分查找
+    回答，不再按帖子或評論查詢點讚表。本進程的點讚切換通過 update 即時更新。
+    每個條目記錄加載時用戶的點讚版本號（user_likes_version_key），任何進程的切換都會
+    遞增它；使用條目前與本請求讀到的版本號比較，不一致時重新加載，其他工作進程中的
+    切換因此在下一個請求就能反映。所有數組中的id總數不超過 LIKED_INDEX_MAX_IDS，
+    超出時淘汰最久未用的條目；條目最多保留 LIKED_INDEX_TTL 秒。
+    """
+
+    def __init__(self, max_ids=2000000, ttl=60):
+        self.max_ids = max_ids
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # 正在加載的條目 -> 令牌；加載期間有更新時置為 None，加載結果不再寫入緩存
+        self._loading = {}
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def init_app(self, app):
+        self.max_ids = app.config.setdefault('LIKED_INDEX_MAX_IDS', self.max_ids)
+        self.ttl = app.config.setdefault('LIKED_INDEX_TTL', self.ttl)
+        self.clear()
+
+    def liked_ids(self, kind, user_id, target_ids):
+        """返回用戶在給定目標中點讚過的id集合"""
+        if not user_id or not target_ids:
+            return set()
+        ids = self._get(kind, user_id)
+        with self._lock:
+            return {target_id for target_id in target_ids if _contains(ids, target_id)}
+
+    def _current_version(self, user_id):
+        """用戶的點讚版本號；conditional_get 已讀取時直接使用，否則每個請求只讀取一次"""
+        key = user_likes_version_key(user_id)
+        if not has_request_context():
+            return read_versions([key])[key]
+        versions = g.setdefault('content_versions', {})
+        if key not in versions:
+            versions.update(read_versions([key]))
+        return versions[key]
+
+    def _get(self, kind, user_id):
+        key = (kind, user_id)
+        version = self._current_version(user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now and entry[2] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            token = object()
+            self._loading[key] = token
+
+        try:
+            ids = self._load(kind, user_id)
+        finally:
+            with self._lock:
+                current = self._loading.get(key, token)
+                if current is token or current is None:
+                    self._loading.pop(key, None)
+
+        with self._lock:
+            if current is token:
+                self._discard(key)
+                self._entries[key] = (ids, now + self.ttl, version)
+                self._size += len(ids) + 1
+                self._evict()
+        return ids
+
+    def _load(self, kind, user_id):
+        like_table, fk_name, archived_table = _KINDS[kind]
+        query = select(like_table.c[fk_name]).where(like_table.c.user_id == user_id)
+        if archive.enabled:
+            query = union_all(query, select(archived_table.c[fk_name]).where(archived_table.c.user_id == user_id))
+        liked = {target_id for (target_id,) in db.session.execute(query)}
+        for target_id, is_liked in like_buffer.pending_likes(kind, user_id).items():
+            if is_liked:
+                liked.add(target_id)
+            else:
+                liked.discard(target_id)
+        return array('q', sorted(liked))
+
+    def update(self, kind, user_id, target_id, liked, version=None):
+        """點讚切換提交（或記入寫回緩衝）之後調用
+
+        version 為本次切換遞增後的用戶點讚版本號。條目的版本恰好比它小 1 時，說明期間
+        沒有其他進程的切換，更新後的條目仍然完整，版本號隨之前移；否則丟棄條目。
+        寫回模式下版本號在批量寫入時才遞增，之後的第一次讀取會重新加載。
+        """
+        key = (kind, user_id)
+        with self._lock:
+            if key in self._loading:
+                self._loading[key] = None
+            if version is not None:
+                for entry_key in [(entry_kind, user_id) for entry_kind in _KINDS]:
+                    entry = self._entries.get(entry_key)
+                    if entry is None:
+                        continue
+                    if entry[2] == version - 1:
+                        self._entries[entry_key] = (entry[0], entry[1], version)
+                    else:
+                        self._discard(entry_key)
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            ids = entry[0]
+            i = bisect_left(ids, target_id)
+            present = i < len(ids) and ids[i] == target_id
+            if liked and not present:
+                ids.insert(i, target_id)
+                self._size += 1
+                self._evict()
+            elif not liked and present:
+                del ids[i]
+                self._size -= 1
+
+    def forget(self, kind, target_ids):
+        """目標被刪除後從所有用戶的數組中移除，避免 SQLite 重用id時誤判為已點讚"""
+        if not target_ids:
+            return
+        with self._lock:
+            for key in [key for key in self._loading if key[0] == kind]:
+                self._loading[key] = None
+            for (entry_kind, _), (ids, _, _) in self._entries.items():
+                if entry_kind != kind:
+                    continue
+                for target_id in target_ids:
+                    i = bisect_left(ids, target_id)
+                    if i < len(ids) and ids[i] == target_id:
+                        del ids[i]
+                        self._size -= 1
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for kind in _KINDS:
+                key = (kind, user_id)
+                if key in self._loading:
+                    self._loading[key] = None
+                self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._loading.clear()
+            self._size = 0
+
+    def _discard(self, key):
+        """調用方需持有鎖"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[0]) + 1
+
+    def _evict(self):
+        """按最久未用淘汰，直到總大小不超過上限；至少保留最近的一個條目（調用方需持有鎖）"""
+        while self._size > self.max_ids and len(self._entries) > 1:
+            _, (ids, _, _) = self._entries.popitem(last=False)
+            self._size -= len(ids) + 1
+            self.evictions += 1
+
+    def stats(self):
+        """命中率和內存佔用統計，用於調整 LIKED_INDEX_MAX_IDS"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'ids': self._size,
+                'max_ids': self.max_ids,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+liked_index = LikedIndex()
@@ -0,0 +1,53 @@
+from datetime import datetime
+from sqlalchemy import delete, func, update
+from sqlalchemy.dialects.sqlite import insert
+from src.models.user import db, Post, PostLike, Comment, CommentLike
+from src.utils.ranking import comment_hot_score_sql, post_hot_score_sql
+
+def _flip_like(like_model, target_column, target_model, score_sql, target_id, user_id, *extra_columns):
+    """在當前事務中原子地切換點讚狀態，返回 (liked, likes_count, *extra_columns)；目標不存在時返回 None
+
+    第一條語句就是寫操作，SQLite 會立即獲取寫鎖，並發請求因此被串行化；
+    計數器在 SQL 中自增自減，不會因讀-改-寫而丟失更新。
+    """
+    removed = db.session.execute(
+        delete(like_model).where(target_column == target_id, like_model.user_id == user_id),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+
+    if removed:
+        liked, delta = False, -removed
+    else:
+        # 重複點擊等競爭情況下唯一約束衝突時不插入也不報錯
+        inserted = db.session.execute(
+            insert(like_model).values({
+                target_column.key: target_id,
+                'user_id': user_id,
+                'created_at': datetime.utcnow()
+            }).on_conflict_do_nothing()
+        ).rowcount
+        liked, delta = True, inserted
+
+    # 熱度分在同一條 UPDATE 中按新的點讚數計算
+    new_count = func.max(0, func.coalesce(target_model.likes_count, 0) + delta)
+    row = db.session.execute(
+        update(target_model)
+        .where(target_model.id == target_id)
+        .values(likes_count=new_count, hot_score=score_sql(new_count))
+        .returning(target_model.likes_count, *extra_columns),
+        execution_options={'synchronize_session': False}
+    ).first()
+
+    if row is None:
+        return None
+    return (liked,) + tuple(row)
+
+def flip_post_like(post_id, user_id):
+    """切換帖子點讚狀態，調用方負責提交或回滾"""
+    return _flip_like(PostLike, PostLike.post_id, Post, post_hot_score_sql, post_id, user_id)
+
+def flip_comment_like(comment_id, user_id):
+    """切換評論點讚狀態，返回 (liked, likes_count, post_id)，調用方負責提交或回滾"""
+    return _flip_like(
+        CommentLike, CommentLike.comment_id, Comment, comment_hot_score_sql, comment_id, user_id, Comment.post_id
+    )
@@ -0,0 +1,272 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from src.utils.event_hub import event_hub
+from src.utils.liked_index import liked_index
+from src.utils.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+# 直方圖的桶上界
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_HELP = {
+    'http_requests_total': ('counter', '按接口、方法和狀態碼統計的請求數'),
+    'http_request_duration_seconds': ('histogram', '請求處理耗時'),
+    'db_statements_per_request': ('histogram', '每個請求執行的 SQL 語句數'),
+    'db_statements_total': ('counter', '按接口統計的 SQL 語句數'),
+    'db_statement_duration_seconds_total': ('counter', '按接口統計的 SQL 執行耗時'),
+    'user_cache': ('gauge', '用戶緩存統計'),
+    'liked_index': ('gauge', '點讚索引統計'),
+    'event_stream_subscribers': ('gauge', '當前 SSE 連接數'),
+}
+
+
+class Metrics:
+    """請求耗時和 SQL 統計，以 Prometheus 文本格式在 /metrics 輸出
+
+    指標保存在進程內存中。多進程部署時配置 METRICS_DIR，每個進程定期把自己的快照
+    寫成 METRICS_DIR/metrics-<pid>.json，/metrics 合併所有快照，任一進程都能返回全局數據。
+    進程已退出的快照在合併時刪除；超過 METRICS_STALE_AFTER 秒沒有更新的快照不參與合併
+    （pid 被其他進程復用，或是其他主機、容器留下的文件）。
+    超過 METRICS_SLOW_REQUEST_MS 的請求連同其執行的 SQL 語句一起寫入警告日誌。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.directory = None
+        self.flush_interval = 5
+        self.stale_after = 60
+        self.slow_request = 0.5
+        self.max_statements = 50
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._last_flush = 0
+        self._listening = False
+
+    def init_app(self, app):
+        self.enabled = app.config.setdefault('METRICS_ENABLED', True)
+        if not self.enabled:
+            return
+        self.directory = app.config.setdefault('METRICS_DIR', None)
+        self.flush_interval = app.config.setdefault('METRICS_FLUSH_INTERVAL', 5)
+        self.stale_after = app.config.setdefault('METRICS_STALE_AFTER', self.flush_interval * 12)
+        self.slow_request = app.config.setdefault('METRICS_SLOW_REQUEST_MS', 500) / 1000
+        self.max_statements = app.config.setdefault('METRICS_SLOW_MAX_STATEMENTS', 50)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self.render_response)
+
+        if not self._listening:
+            # 監聽所有引擎，讀連接池和寫連接都會被統計
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            self._listening = True
+
+    # 請求和 SQL 鉤子
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_statements = []
+        g.metrics_sql_time = 0.0
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None and has_request_context() and 'metrics_statements' in g:
+            context.metrics_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, 'metrics_started', None)
+        if started is None or not has_request_context() or 'metrics_statements' not in g:
+            return
+        elapsed = time.perf_counter() - started
+        g.metrics_sql_time += elapsed
+        g.metrics_statements.append((statement, elapsed))
+
+    def _after_request(self, response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        statements = g.pop('metrics_statements', [])
+        sql_time = g.pop('metrics_sql_time', 0.0)
+        endpoint = request.endpoint or 'unmatched'
+        method = request.method
+
+        with self._lock:
+            self._inc('http_requests_total', (('endpoint', endpoint), ('method', method),
+                                               ('status', str(response.status_code))))
+            self._observe('http_request_duration_seconds', (('endpoint', endpoint), ('method', method)),
+                          elapsed, LATENCY_BUCKETS)
+            self._observe('db_statements_per_request', (('endpoint', endpoint),), len(statements),
+                          STATEMENT_BUCKETS)
+            self._inc('db_statements_total', (('endpoint', endpoint),), len(statements))
+            self._inc('db_statement_duration_seconds_total', (('endpoint', endpoint),), sql_time)
+
+        if elapsed >= self.slow_request:
+            self._log_slow_request(endpoint, elapsed, sql_time, statements)
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.write_snapshot()
+        return response
+
+    def _log_slow_request(self, endpoint, elapsed, sql_time, statements):
+        lines = [
+            f'  {duration * 1000:8.2f}ms  {" ".join(statement.split())}'
+            for statement, duration in statements[:self.max_statements]
+        ]
+        if len(statements) > self.max_statements:
+            lines.append(f'  ... 另有 {len(statements) - self.max_statements} 條語句')
+        logger.warning(
+            '慢請求 %s %s (%s): %.1fms，SQL %d 條共 %.1fms\n%s',
+            request.method, request.full_path.rstrip('?'), endpoint, elapsed * 1000, len(statements), sql_time * 1000,
+            '\n'.join(lines)
+        )
+
+    # 指標存儲（調用方需持有鎖）
+
+    def _inc(self, name, labels, value=1):
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def _observe(self, name, labels, value, buckets):
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            # 每個桶的計數（最後一個是 +Inf），以及總和、總數
+            histogram = self._histograms[key] = [list(buckets), [0] * (len(buckets) + 1), 0, 0]
+        histogram[1][bisect_left(buckets, value)] += 1
+        histogram[2] += value
+        histogram[3] += 1
+
+    # 快照和多進程合併
+
+    def snapshot(self):
+        with self._lock:
+            counters = [[name, list(labels), value] for (name, labels), value in self._counters.items()]
+            histograms = [
+                [name, list(labels), bounds, list(counts), total, count]
+                for (name, labels), (bounds, counts, total, count) in self._histograms.items()
+            ]
+        gauges = [['user_cache', [['stat', stat]], value] for stat, value in user_cache.stats().items()]
+        gauges += [['liked_index', [['stat', stat]], value] for stat, value in liked_index.stats().items()]
+        gauges.append(['event_stream_subscribers', [], event_hub.subscriber_count()])
+        return {'pid': os.getpid(), 'counters': counters, 'histograms': histograms, 'gauges': gauges}
+
+    def write_snapshot(self):
+        """把本進程的快照原子地寫入 METRICS_DIR"""
+        self._last_flush = time.monotonic()
+        path = os.path.join(self.directory, f'metrics-{os.getpid()}.json')
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(temp_path, path)
+        except OSError:
+            logger.exception('寫入指標快照失敗')
+
+    def _collect(self):
+        """本進程的最新快照加上其他進程寫入的快照"""
+        snapshots = [self.snapshot()]
+        if self.directory:
+            own = f'metrics-{os.getpid()}.json'
+            now = time.time()
+            for filename in os.listdir(self.directory):
+                if not filename.startswith('metrics-') or not filename.endswith('.json') or filename == own:
+                    continue
+                path = os.path.join(self.directory, filename)
+                try:
+                    pid = int(filename[len('metrics-'):-len('.json')])
+                    if not _process_exists(pid):
+                        # 退出的 worker 不再更新快照，留著會讓它的計數一直被合併
+                        os.remove(path)
+                        continue
+                    if now - os.path.getmtime(path) > self.stale_after:
+                        continue
+                    with open(path, encoding='utf-8') as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return snapshots
+
+    def render(self):
+        """合併所有進程的快照並輸出 Prometheus 文本格式"""
+        counters, histograms, gauges = {}, {}, {}
+        for snapshot in self._collect():
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, bounds, counts, total, count in snapshot['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                merged = histograms.setdefault(key, [bounds, [0] * len(counts), 0, 0])
+                merged[1] = [a + b for a, b in zip(merged[1], counts)]
+                merged[2] += total
+                merged[3] += count
+            # 狀態類指標不能相加，按進程分別輸出
+            for name, labels, value in snapshot['gauges']:
+                gauges[(name, tuple(map(tuple, labels)) + (('pid', str(snapshot['pid'])),))] = value
+
+        lines = []
+        for name in sorted({key[0] for key in list(counters) + list(histograms) + list(gauges)}):
+            kind, help_text = _HELP.get(name, ('untyped', name))
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+            for (metric, labels), value in sorted(gauges.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+            for (metric, labels), (bounds, counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(list(bounds) + ['+Inf'], counts):
+                    cumulative += bucket_count
+                    le = bound if bound == '+Inf' else _format_value(bound)
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", le),))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total)}')
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def render_response(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+
+def _process_exists(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # 進程存在，但屬於其他用戶
+        return True
+    return True
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape_label(value)}"' for key, value in labels) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+metrics = Metrics()
@@ -0,0 +1,127 @@
+import logging
+from collections import Counter
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from src.utils.sqlite_profile import RoutingSession
+
+logger = logging.getLogger(__name__)
+
+
+class NPlusOneDetected(Exception):
+    """同一請求中同一關係被延遲加載的次數超過閾值"""
+
+
+class QueryBudgetExceeded(AssertionError):
+    """代碼塊執行的 SQL 語句數或延遲加載次數超過預算"""
+
+
+def _lazy_load_attribute(orm_execute_state):
+    """延遲加載時返回 'Model.attribute'，其他查詢返回 None"""
+    # 非 SELECT 語句上訪問 lazy_loaded_from 會拋出異常
+    if not orm_execute_state.is_select or orm_execute_state.lazy_loaded_from is None:
+        return None
+    path = orm_execute_state.loader_strategy_path
+    prop = path.path[-1] if path is not None and path.path else None
+    if prop is None or not hasattr(prop, 'key'):
+        return f'{orm_execute_state.lazy_loaded_from.class_.__name__}.?'
+    return f'{prop.parent.class_.__name__}.{prop.key}'
+
+
+class NPlusOneDetector:
+    """開發和測試用：統計每個請求中各關係的延遲加載次數
+
+    N_PLUS_ONE_MODE 為 'warn' 時記錄警告，為 'raise' 時拋出 NPlusOneDetected；
+    默認關閉，不註冊任何鉤子。同一關係在一個請求中延遲加載超過
+    N_PLUS_ONE_THRESHOLD 次即視為 N+1，應改用 serialize_posts 等批量序列化函數。
+    """
+
+    def __init__(self):
+        self.mode = None
+        self.threshold = 3
+        self._listening = False
+
+    def init_app(self, app):
+        self.mode = app.config.setdefault('N_PLUS_ONE_MODE', None)
+        self.threshold = app.config.setdefault('N_PLUS_ONE_THRESHOLD', 3)
+        if self.mode not in (None, 'warn', 'raise'):
+            raise ValueError(f'N_PLUS_ONE_MODE 只能是 None、warn 或 raise: {self.mode!r}')
+        if self.mode and not self._listening:
+            event.listen(RoutingSession, 'do_orm_execute', self._on_orm_execute)
+            self._listening = True
+
+    def _on_orm_execute(self, orm_execute_state):
+        if not self.mode or not has_request_context():
+            return
+        attribute = _lazy_load_attribute(orm_execute_state)
+        if attribute is None:
+            return
+
+        if 'lazy_loads' not in g:
+            g.lazy_loads = Counter()
+        g.lazy_loads[attribute] += 1
+        count = g.lazy_loads[attribute]
+        if count != self.threshold + 1:
+            # 每個關係每個請求只報告一次
+            return
+
+        message = (
+            f'N+1 查詢：{request.method} {request.path} ({request.endpoint}) '
+            f'中 {attribute} 已延遲加載 {count} 次'
+        )
+        if self.mode == 'raise':
+            raise NPlusOneDetected(message)
+        logger.warning(message)
+
+
+class QueryBudget:
+    """統計代碼塊中的 SQL 語句數和延遲加載次數，超出預算時拋出 QueryBudgetExceeded
+
+    用法：
+        with QueryBudget(max_statements=5, max_lazy_loads=0) as budget:
+            client.get('/api/posts')
+        print(budget.statements, budget.lazy_loads)
+
+    統計所有引擎上的語句，測試中應在同一線程裡發請求（例如 Flask test_client）。
+    """
+
+    def __init__(self, max_statements=None, max_lazy_loads=None):
+        self.max_statements = max_statements
+        self.max_lazy_loads = max_lazy_loads
+        self.statements = []
+        self.lazy_loads = Counter()
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def _on_orm_execute(self, orm_execute_state):
+        attribute = _lazy_load_attribute(orm_execute_state)
+        if attribute is not None:
+            self.lazy_loads[attribute] += 1
+
+    def __enter__(self):
+        event.listen(Engine, 'before_cursor_execute', self._on_execute)
+        event.listen(RoutingSession, 'do_orm_execute', self._on_orm_execute)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        event.remove(Engine, 'before_cursor_execute', self._on_execute)
+        event.remove(RoutingSession, 'do_orm_execute', self._on_orm_execute)
+        if exc_type is None:
+            self.check()
+        return False
+
+    def check(self):
+        problems = []
+        if self.max_statements is not None and len(self.statements) > self.max_statements:
+            problems.append(f'執行了 {len(self.statements)} 條 SQL，預算為 {self.max_statements}')
+        total_lazy = sum(self.lazy_loads.values())
+        if self.max_lazy_loads is not None and total_lazy > self.max_lazy_loads:
+            details = ', '.join(f'{name} x{count}' for name, count in self.lazy_loads.most_common())
+            problems.append(f'延遲加載 {total_lazy} 次，預算為 {self.max_lazy_loads}（{details}）')
+        if problems:
+            statements = '\n'.join(f'  {" ".join(statement.split())}' for statement in self.statements)
+            raise QueryBudgetExceeded('；'.join(problems) + '\n' + statements)
+
+
+n_plus_one = NPlusOneDetector()
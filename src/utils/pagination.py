@@ -0,0 +1,79 @@
+import base64
+import json
+from datetime import datetime
+from werkzeug.routing import IntegerConverter
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# SQLite 整數是 64 位有符號數，超出範圍的參數綁定時會拋出 OverflowError
+MAX_ID = 2 ** 63 - 1
+
+
+class InvalidCursor(ValueError):
+    """游標格式錯誤"""
+
+
+class IdConverter(IntegerConverter):
+    """URL 中的 <int:...>，超出 SQLite 整數範圍的 id 不匹配路由，直接返回 404"""
+
+    def __init__(self, map, fixed_digits=0, min=None, max=MAX_ID, signed=False):
+        super().__init__(map, fixed_digits=fixed_digits, min=min, max=max, signed=signed)
+
+
+def parse_id(value):
+    """解析請求參數或游標中的 id，不在 1 到 MAX_ID 之間時拋出 ValueError"""
+    value = int(value)
+    if not 1 <= value <= MAX_ID:
+        raise ValueError(value)
+    return value
+
+
+def encode_cursor(likes_count, created_at, post_id):
+    """將排序鍵編碼為不透明的游標字符串
+
+    游標只記錄排序位置的值，而不是引用某個帖子，
+    因此即使該帖子的點讚數之後發生變化，游標仍然有效且含義不變。
+    """
+    payload = [likes_count or 0, created_at.isoformat() if created_at else None, post_id]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """解碼游標，返回 (likes_count, created_at, id)"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        likes_count, created_at, post_id = json.loads(base64.urlsafe_b64decode(padded))
+        return int(likes_count), datetime.fromisoformat(created_at), parse_id(post_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor(token)
+
+
+def encode_sort_cursor(sort, values):
+    """編碼其他排序方式的游標，游標中記錄排序方式，不能混用"""
+    payload = [sort] + [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_sort_cursor(token, sort, types):
+    """解碼 encode_sort_cursor 生成的游標，types 為各排序鍵的轉換函數"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        if not isinstance(payload, list) or payload[:1] != [sort] or len(payload) != len(types) + 1:
+            raise ValueError(token)
+        return tuple(convert(value) for convert, value in zip(types, payload[1:]))
+    except (ValueError, TypeError):
+        raise InvalidCursor(token)
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """解析每頁數量參數，限制在 1 到 maximum 之間"""
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('limit')
+    return max(1, min(limit, maximum))
@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from functools import lru_cache
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PoolSaturated(Exception):
+    """哈希進程池排隊已滿或等待超時"""
+
+
+@lru_cache(maxsize=None)
+def _method_signature(method):
+    """當前配置下哈希方法的完整參數，例如 scrypt:32768:8:1"""
+    return generate_password_hash('', method=method).split('$', 1)[0]
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _verify(pwhash, password, method):
+    """校驗密碼；成功且存儲的哈希參數已過時時，順便返回按當前參數生成的新哈希"""
+    if not check_password_hash(pwhash, password):
+        return False, None
+    if pwhash.split('$', 1)[0] != _method_signature(method):
+        return True, generate_password_hash(password, method=method)
+    return True, None
+
+
+class PasswordHasher:
+    """在獨立進程池中執行密碼哈希，避免登錄高峰佔滿請求線程
+
+    排隊中的任務數超過 PASSWORD_POOL_MAX_QUEUE 時立即拋出 PoolSaturated，
+    由路由返回 503。PASSWORD_POOL_WORKERS 為 0 時在當前線程中直接計算。
+    """
+
+    def __init__(self):
+        self.method = 'scrypt'
+        self.workers = 0
+        self.timeout = 10
+        self._slots = None
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.method = app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt')
+        self.workers = app.config.setdefault('PASSWORD_POOL_WORKERS', os.cpu_count() or 1)
+        self.timeout = app.config.setdefault('PASSWORD_POOL_TIMEOUT', 10)
+        max_queue = app.config.setdefault('PASSWORD_POOL_MAX_QUEUE', self.workers * 4)
+        self._slots = threading.BoundedSemaphore(max_queue) if self.workers else None
+
+    def hash(self, password):
+        return self._run(_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        """返回 (是否匹配, 需要寫回的新哈希或 None)"""
+        return self._run(_verify, pwhash, password, self.method)
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PoolSaturated()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise PoolSaturated()
+
+    def _get_executor(self):
+        # 進程池按進程懶創建；使用 spawn 避免在多線程的服務進程中 fork
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+                    self._pid = os.getpid()
+        return self._executor
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,39 @@
+import os
+import weakref
+from src.models.user import db
+
+
+class PreforkGuard:
+    """多進程部署（gunicorn --preload 等先建應用再 fork）時的連接池處理
+
+    create_app 結束時關閉啟動期間打開的連接，主進程不帶着連接 fork；
+    之後在主進程中仍有數據庫訪問的（例如服務器鉤子裡的查詢），fork 後
+    在子進程中丟棄繼承的連接池。dispose(close=False) 只丟棄引用而不關閉，
+    避免影響父進程仍在使用的同一個 SQLite 連接。子進程按需建立自己的連接；
+    各單例中的後台線程和進程池本來就按 pid 懶啟動。
+    """
+
+    def __init__(self):
+        self._apps = weakref.WeakSet()
+        self._registered = False
+
+    def init_app(self, app):
+        self._apps.add(app)
+        if not self._registered and hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork_in_child)
+            self._registered = True
+
+    def release(self, app):
+        """關閉應用當前持有的所有數據庫連接"""
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+
+    def _after_fork_in_child(self):
+        for app in list(self._apps):
+            with app.app_context():
+                for engine in db.engines.values():
+                    engine.dispose(close=False)
+
+
+prefork_guard = PreforkGuard()
@@ -0,0 +1,184 @@
+import math
+import sqlite3
+import time
+from datetime import datetime
+from sqlalchemy import event, func, select, update
+from sqlalchemy.engine import Engine
+from src.models.user import db, Post, PostLike, Comment, CommentLike
+from src.utils.feed_cache import feed_cache
+from src.utils.versions import FEED_VERSION, bump_versions
+
+# 熱度分 = log10(互動數) + (發布時間 - HOT_EPOCH) / HOT_DECAY_SECONDS
+# 時間項只與發布時間有關，分數不需要隨時間推移重新計算：晚發布 12.5 小時的帖子
+# 需要多 10 倍的互動才能排在前面，舊帖子自然下沉。只有互動數變化時才需要更新分數。
+HOT_EPOCH = datetime(2024, 1, 1)
+HOT_DECAY_SECONDS = 45000
+# 一條評論相當於幾個點讚
+HOT_COMMENT_WEIGHT = 2
+
+
+def hot_score(likes_count, comments_count, created_at):
+    """計算熱度分；created_at 可以是 datetime 或 SQLite 中存儲的字符串"""
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at)
+    engagement = (likes_count or 0) + HOT_COMMENT_WEIGHT * (comments_count or 0)
+    age = (created_at - HOT_EPOCH).total_seconds() if created_at else 0
+    return round(math.log10(max(engagement, 1)) + age / HOT_DECAY_SECONDS, 7)
+
+
+def post_hot_score_sql(likes_count=None, comments_count=None, table=None):
+    """帖子熱度分的 SQL 表達式，可傳入新的點讚數/評論數表達式（UPDATE 中右側引用的是舊值）
+
+    table 默認為帖子表，也可以是歸檔庫中結構相同的表。
+    """
+    columns = (table if table is not None else Post.__table__).c
+    return func.hot_score(
+        columns.likes_count if likes_count is None else likes_count,
+        columns.comments_count if comments_count is None else comments_count,
+        columns.created_at
+    )
+
+
+def comment_hot_score_sql(likes_count=None, table=None):
+    columns = (table if table is not None else Comment.__table__).c
+    return func.hot_score(columns.likes_count if likes_count is None else likes_count, 0, columns.created_at)
+
+
+@event.listens_for(Engine, 'connect')
+def _register_sql_functions(dbapi_connection, connection_record):
+    # 讀寫連接都註冊，UPDATE 和遷移中可以直接在 SQL 裡計算熱度分
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function('hot_score', 3, hot_score, deterministic=True)
+
+
+# ORM 寫入時維護熱度分；Core 的 UPDATE 語句需自行使用 *_hot_score_sql
+
+@event.listens_for(Post, 'before_insert')
+def _score_new_post(mapper, connection, post):
+    if post.created_at is None:
+        post.created_at = datetime.utcnow()
+    post.hot_score = hot_score(post.likes_count, post.comments_count, post.created_at)
+
+
+@event.listens_for(Post, 'before_update')
+def _rescore_post(mapper, connection, post):
+    state = db.inspect(post)
+    if state.attrs.likes_count.history.has_changes() or state.attrs.comments_count.history.has_changes():
+        post.hot_score = hot_score(post.likes_count, post.comments_count, post.created_at)
+
+
+@event.listens_for(Comment, 'before_insert')
+def _score_new_comment(mapper, connection, comment):
+    if comment.created_at is None:
+        comment.created_at = datetime.utcnow()
+    comment.hot_score = hot_score(comment.likes_count, 0, comment.created_at)
+
+
+@event.listens_for(Comment, 'before_update')
+def _rescore_comment(mapper, connection, comment):
+    if db.inspect(comment).attrs.likes_count.history.has_changes():
+        comment.hot_score = hot_score(comment.likes_count, 0, comment.created_at)
+
+
+# 定期重算：只處理上次運行之後有新點讚或新評論的記錄
+
+# 任務名 -> (目標模型, 熱度分表達式, [(活動表模型, 指向目標的外鍵)])
+RESCORE_JOBS = {
+    'post': (Post, post_hot_score_sql, [(PostLike, 'post_id'), (Comment, 'post_id')]),
+    'comment': (Comment, comment_hot_score_sql, [(CommentLike, 'comment_id')]),
+}
+
+
+def rescore_ids(name, ids):
+    """在當前事務中重算一組記錄的熱度分，只寫入分數有變化的行，返回 [(id, post_id)]"""
+    target_model, score_sql, _ = RESCORE_JOBS[name]
+    if not ids:
+        return []
+    table = target_model.__table__
+    score = score_sql()
+    post_id_column = table.c.id if name == 'post' else table.c.post_id
+    return db.session.execute(
+        update(target_model)
+        .where(target_model.id.in_(ids), target_model.hot_score.is_distinct_from(score))
+        .values(hot_score=score)
+        .returning(table.c.id, post_id_column),
+        execution_options={'synchronize_session': False}
+    ).all()
+
+
+def recently_active_ids(activity_model, fk_name, after_id, chunk_size):
+    """按主鍵順序讀取 after_id 之後的一批活動記錄，返回 (涉及的目標id集合, 本批最大id或None)"""
+    fk = getattr(activity_model, fk_name)
+    rows = db.session.execute(
+        select(activity_model.id, fk).where(activity_model.id > after_id).order_by(activity_model.id).limit(chunk_size)
+    ).all()
+    if not rows:
+        return set(), None
+    return {row[1] for row in rows}, rows[-1][0]
+
+
+def rescore(full=False, chunk_size=1000, sleep_ratio=1.0, min_pause=0.01, log=print):
+    """重算熱度分，返回 {任務名: 更新的行數}
+
+    默認只處理上次運行之後新增的點讚和評論涉及的帖子/評論（按活動表主鍵記錄進度，
+    保存在 reconcile_checkpoint 表中），用於修正寫回緩衝、計數器校正等繞過增量更新的寫入；
+    full 為 True 時按 id 分批重算全部記錄。每批一個短事務，批次之間按 sleep_ratio 休眠。
+    """
+    from src.utils.reconcile import load_checkpoint, save_checkpoint
+
+    def finish_chunk(name, ids, checkpoint_name, last_id, started):
+        changed = rescore_ids(name, sorted(ids))
+        versions = bump_versions(FEED_VERSION) if changed else {}
+        if checkpoint_name:
+            save_checkpoint(checkpoint_name, last_id)
+        db.session.commit()
+        if versions:
+            feed_cache.advance_version(versions[FEED_VERSION])
+        time.sleep(max(min_pause, (time.perf_counter() - started) * sleep_ratio))
+        return len(changed)
+
+    if full:
+        # 全量重算覆蓋了此刻之前的所有互動，增量進度從當前位置開始
+        start_rescore_checkpoints(db.session.connection())
+        db.session.commit()
+
+    results = {}
+    for name, (target_model, _, sources) in RESCORE_JOBS.items():
+        updated = 0
+        if full:
+            after_id = 0
+            while True:
+                started = time.perf_counter()
+                ids = [row[0] for row in db.session.execute(
+                    select(target_model.id).where(target_model.id > after_id).order_by(target_model.id).limit(chunk_size)
+                )]
+                if not ids:
+                    break
+                after_id = ids[-1]
+                updated += finish_chunk(name, ids, None, None, started)
+        else:
+            for activity_model, fk_name in sources:
+                checkpoint_name = f'rescore:{activity_model.__tablename__}'
+                after_id = load_checkpoint(checkpoint_name)
+                while True:
+                    started = time.perf_counter()
+                    ids, last_id = recently_active_ids(activity_model, fk_name, after_id, chunk_size)
+                    if last_id is None:
+                        break
+                    after_id = last_id
+                    updated += finish_chunk(name, ids, checkpoint_name, last_id, started)
+        db.session.rollback()
+        results[name] = updated
+        log(f'{name}: 更新了 {updated} 條記錄的熱度分')
+    return results
+
+
+def start_rescore_checkpoints(conn):
+    """把增量重算的進度設為各活動表當前的最大id（全量回填之後調用）"""
+    for _, _, sources in RESCORE_JOBS.values():
+        for activity_model, _ in sources:
+            table = activity_model.__tablename__
+            conn.exec_driver_sql(
+                'INSERT OR REPLACE INTO reconcile_checkpoint (name, last_id, updated_at) '
+                f"SELECT 'rescore:{table}', COALESCE(MAX(id), 0), CURRENT_TIMESTAMP FROM {table}"
+            )
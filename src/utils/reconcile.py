@@ -0,0 +1,121 @@
+import time
+from datetime import datetime
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.sqlite import insert
+from src.models.user import db, Post, PostLike, Comment, CommentLike, ReconcileCheckpoint
+from src.utils.feed_cache import feed_cache
+from src.utils.ranking import rescore_ids
+from src.utils.versions import FEED_VERSION, bump_versions, post_version_key
+
+# 任務名 -> (目標模型, [(計數字段, 來源模型, 來源表中指向目標的外鍵)])
+COUNTER_JOBS = {
+    'post': (Post, [('likes_count', PostLike, 'post_id'), ('comments_count', Comment, 'post_id')]),
+    'comment': (Comment, [('likes_count', CommentLike, 'comment_id')]),
+}
+
+
+def _actual_counts(source_model, fk_name, low_id, high_id):
+    """一條分組聚合查詢統計 id 區間內每個目標的實際數量，只掃描該區間的索引"""
+    fk = getattr(source_model, fk_name)
+    rows = db.session.execute(
+        select(fk, func.count()).where(fk.between(low_id, high_id)).group_by(fk)
+    )
+    return dict(rows.all())
+
+
+def save_checkpoint(name, last_id):
+    """在當前事務中記錄任務進度"""
+    table = ReconcileCheckpoint.__table__
+    db.session.execute(
+        insert(table)
+        .values(name=name, last_id=last_id, updated_at=datetime.utcnow())
+        .on_conflict_do_update(index_elements=['name'], set_={'last_id': last_id, 'updated_at': datetime.utcnow()})
+    )
+
+
+def load_checkpoint(name):
+    return db.session.query(ReconcileCheckpoint.last_id).filter_by(name=name).scalar() or 0
+
+
+def reconcile_chunk(name, after_id, chunk_size):
+    """校正 id 大於 after_id 的一批記錄，返回 (本批最大id或None, 掃描數, 修正數)
+
+    先在讀連接上比較計數器與分組統計結果，只有不一致的記錄才在寫事務中
+    用相關子查詢重新計算並更新，寫事務內的計數與並發的點讚/評論保持一致。
+    """
+    target_model, counters = COUNTER_JOBS[name]
+    columns = [getattr(target_model, column) for column, _, _ in counters]
+    rows = db.session.execute(
+        select(target_model.id, *columns).where(target_model.id > after_id).order_by(target_model.id).limit(chunk_size)
+    ).all()
+    if not rows:
+        db.session.rollback()
+        return None, 0, 0
+
+    low_id, high_id = rows[0][0], rows[-1][0]
+    actual = [_actual_counts(source_model, fk_name, low_id, high_id) for _, source_model, fk_name in counters]
+    drifted = [
+        row[0] for row in rows
+        if any((row[i + 1] or 0) != actual[i].get(row[0], 0) for i in range(len(counters)))
+    ]
+
+    fixed = []
+    if drifted:
+        table = target_model.__table__
+        values = {
+            column: select(func.count()).where(
+                source_model.__table__.c[fk_name] == table.c.id
+            ).scalar_subquery()
+            for column, source_model, fk_name in counters
+        }
+        post_id_column = table.c.id if name == 'post' else table.c.post_id
+        fixed = db.session.execute(
+            update(table).where(table.c.id.in_(drifted)).values(values)
+            .returning(table.c.id, post_id_column, *(table.c[column] for column, _, _ in counters))
+        ).all()
+        # 計數變化後熱度分也要重算
+        rescore_ids(name, [row[0] for row in fixed])
+        version_keys = {post_version_key(row[1]) for row in fixed}
+        if name == 'post':
+            version_keys.add(FEED_VERSION)
+        versions = bump_versions(*sorted(version_keys))
+    save_checkpoint(name, high_id)
+    db.session.commit()
+
+    if name == 'post' and fixed:
+        for row in fixed:
+            feed_cache.update_post(row[0], **{column: row[i + 2] for i, (column, _, _) in enumerate(counters)})
+        feed_cache.advance_version(versions[FEED_VERSION])
+    return high_id, len(rows), len(fixed)
+
+
+def reconcile_counters(names=None, chunk_size=1000, sleep_ratio=1.0, min_pause=0.01, restart=False, log=print):
+    """按 id 順序分批校正冗餘計數器，返回 {任務名: (掃描數, 修正數)}
+
+    每批結束後休眠 max(min_pause, 本批耗時 * sleep_ratio)，sleep_ratio 為 1 時
+    最多佔用一半的數據庫時間，寫事務很短，不會長時間阻塞正常的寫請求。
+    進度記錄在 reconcile_checkpoint 表中，中斷後再次運行從斷點繼續；
+    一輪完成後清除斷點，下次從頭開始。
+    """
+    results = {}
+    for name in names or COUNTER_JOBS:
+        after_id = 0 if restart else load_checkpoint(name)
+        if after_id:
+            log(f'{name}: 從 id {after_id} 之後繼續')
+        scanned = fixed = 0
+        while True:
+            started = time.perf_counter()
+            last_id, chunk_scanned, chunk_fixed = reconcile_chunk(name, after_id, chunk_size)
+            if last_id is None:
+                break
+            after_id = last_id
+            scanned += chunk_scanned
+            fixed += chunk_fixed
+            if chunk_fixed:
+                log(f'{name}: 已掃描到 id {last_id}，本批修正 {chunk_fixed} 條')
+            time.sleep(max(min_pause, (time.perf_counter() - started) * sleep_ratio))
+
+        db.session.execute(delete(ReconcileCheckpoint).where(ReconcileCheckpoint.name == name))
+        db.session.commit()
+        results[name] = (scanned, fixed)
+    return results
@@ -0,0 +1,104 @@
+from sqlalchemy.schema import CreateTable
+from src.models.user import db, Post, Comment, PostLike, CommentLike
+from src.utils.archive import archive
+from src.utils.ranking import start_rescore_checkpoints
+from src.utils.search import create_search_tables, index_missing_rows
+
+# 數據庫結構版本，記錄在 SQLite 的 PRAGMA user_version 中。
+# 修改表結構時遞增版本號，並在 MIGRATIONS 中加入對應的升級步驟。
+SCHEMA_VERSION = 8
+
+def _create_missing_indexes(conn):
+    """為已存在的表補建模型中新增的索引（create_all 不會為舊表建索引）
+
+    引用了尚未添加的列的索引先跳過，由添加該列的後續版本補建。
+    """
+    for table in db.metadata.sorted_tables:
+        columns = {row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info("{table.name}")')}
+        for index in table.indexes:
+            if all(column.name in columns for column in index.columns):
+                index.create(conn, checkfirst=True)
+
+def _add_hot_score(conn):
+    """為帖子和評論加上熱度分列，按現有數據回填後建索引"""
+    for table in ('post', 'comment'):
+        columns = {row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info({table})')}
+        if 'hot_score' not in columns:
+            conn.exec_driver_sql(f'ALTER TABLE {table} ADD COLUMN hot_score FLOAT NOT NULL DEFAULT 0')
+    # hot_score() 是在連接建立時註冊的 SQLite 自定義函數
+    conn.exec_driver_sql('UPDATE post SET hot_score = hot_score(likes_count, comments_count, created_at)')
+    conn.exec_driver_sql('UPDATE comment SET hot_score = hot_score(likes_count, 0, created_at)')
+    _create_missing_indexes(conn)
+    start_rescore_checkpoints(conn)
+
+def _use_autoincrement_ids(conn):
+    """把帖子、評論和點讚表重建為 AUTOINCREMENT 主鍵，歸檔或刪除的id不再分配給新行
+
+    SQLite 不能修改已有表的主鍵，按官方的做法新建表、複製數據、刪除舊表再改名，
+    然後重建索引，並把 sqlite_sequence 提高到歸檔庫中已用過的最大id。
+    """
+    preparer = conn.dialect.identifier_preparer
+    for model in (Post, Comment, PostLike, CommentLike):
+        table = model.__table__
+        sql = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                                   (table.name,)).scalar()
+        if 'AUTOINCREMENT' in sql.upper():
+            continue
+        new_name = f'{table.name}_autoincrement'
+        ddl = str(CreateTable(table).compile(dialect=conn.dialect)).strip()
+        prefix = f'CREATE TABLE {preparer.format_table(table)} '
+        conn.exec_driver_sql(f'CREATE TABLE {new_name} ' + ddl[len(prefix):])
+        columns = ', '.join(preparer.quote(column.name) for column in table.columns)
+        conn.exec_driver_sql(f'INSERT INTO {new_name} ({columns}) SELECT {columns} FROM {table.name}')
+        conn.exec_driver_sql(f'DROP TABLE {table.name}')
+        conn.exec_driver_sql(f'ALTER TABLE {new_name} RENAME TO {table.name}')
+        for index in table.indexes:
+            index.create(conn)
+    archive.raise_id_floor(conn)
+
+# 版本號 -> 升級到該版本需要執行的函數，參數為寫連接
+MIGRATIONS = {
+    1: _create_missing_indexes,
+    # FTS5 全文索引表；已有的帖子和評論由版本 7 在同一次升級中導入
+    2: create_search_tables,
+    # content_version 表，由 create_all 創建
+    3: None,
+    # reconcile_checkpoint 表由 create_all 創建；補建評論的 ix_comment_post_rank 索引
+    4: _create_missing_indexes,
+    # 熱度分列及 sort=hot / sort=new 的索引
+    5: _add_hot_score,
+    # deletion_job 表由 create_all 創建；按作者查找內容的索引
+    6: _create_missing_indexes,
+    # 導入尚未進入全文索引的帖子和評論，包括早先升級到版本 2 時留下的空索引
+    7: index_missing_rows,
+    # 帖子、評論和點讚表改為 AUTOINCREMENT 主鍵，歸檔後的id不會被新行重用
+    8: _use_autoincrement_ids,
+}
+
+def get_schema_version(conn):
+    return conn.exec_driver_sql('PRAGMA user_version').scalar()
+
+def ensure_schema():
+    """啟動時的結構檢查：版本一致時只需一條 PRAGMA 查詢
+
+    返回 True 表示本次新建或升級了數據庫結構。
+    """
+    with db.engine.connect() as conn:
+        version = get_schema_version(conn)
+    if version >= SCHEMA_VERSION:
+        return False
+
+    with db.engine.begin() as conn:
+        # 其他進程可能已經完成升級
+        version = get_schema_version(conn)
+        if version >= SCHEMA_VERSION:
+            return False
+        db.metadata.create_all(conn)
+        # 歸檔庫的表隨主庫結構一起創建，升級步驟中可以直接使用
+        archive.create_tables(conn)
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            if MIGRATIONS[target] is not None:
+                MIGRATIONS[target](conn)
+        conn.exec_driver_sql(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    print(f"數據庫結構已升級到版本 {SCHEMA_VERSION}")
+    return True
@@ -0,0 +1,166 @@
+import re
+from sqlalchemy import Integer, column, event, select, text
+from src.models.user import db, Post, Comment
+from src.utils.archive import ARCHIVE_SCHEMA, archive, archived_comment, archived_post
+
+# unicode61 分詞器會把連續的漢字當成一個詞，這裡在寫入索引和查詢前
+# 把每個漢字/假名拆成單獨的詞，再用短語查詢匹配相鄰的字，適合沒有空格分詞的中文內容。
+_CJK_CHAR = re.compile(r'([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\U00020000-\U0002ffff])')
+
+# 標題的 BM25 權重高於正文
+POST_TITLE_WEIGHT = 10.0
+POST_CONTENT_WEIGHT = 1.0
+
+FTS_TABLES_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS post_fts USING fts5("
+    "title, content, tokenize='unicode61 remove_diacritics 2')",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS comment_fts USING fts5("
+    "content, tokenize='unicode61 remove_diacritics 2')",
+)
+
+def segment(value):
+    """在每個漢字兩側加空格，使其成為獨立的詞"""
+    return _CJK_CHAR.sub(r' \1 ', value or '')
+
+def build_match_query(query):
+    """把用戶輸入轉為 FTS5 查詢：每個詞作為一個短語，多個詞之間為 AND
+
+    所有輸入都放在雙引號短語中，用戶無法注入 FTS5 查詢語法。
+    """
+    phrases = []
+    for term in query.split():
+        tokens = segment(term).split()
+        if tokens:
+            phrases.append('"' + ' '.join(tokens).replace('"', '""') + '"')
+    return ' AND '.join(phrases) or None
+
+# 全文索引表 -> (主庫中的來源表, 歸檔庫中的來源表, 索引的列)
+FTS_SOURCES = {
+    'post_fts': (Post.__table__, archived_post, ('title', 'content')),
+    'comment_fts': (Comment.__table__, archived_comment, ('content',)),
+}
+
+def create_search_tables(conn):
+    for ddl in FTS_TABLES_DDL:
+        conn.exec_driver_sql(ddl)
+
+def _index_statement(table, columns):
+    return text(
+        f"INSERT INTO {table}(rowid, {', '.join(columns)}) "
+        f"VALUES (:id, {', '.join(':' + column for column in columns)})"
+    )
+
+def _index_params(rows, columns):
+    return [
+        dict({'id': row[0]}, **{column: segment(value) for column, value in zip(columns, row[1:])})
+        for row in rows
+    ]
+
+def index_missing_rows(conn, chunk_size=2000):
+    """把尚未進入全文索引的帖子和評論（包括歸檔庫中的）寫入索引，在結構升級的事務中執行
+
+    已有數據庫升級時由此導入現有內容，升級完成後搜索即可用，不需要再手動 rebuild-search。
+    """
+    archived_tables = set()
+    if archive.enabled:
+        archived_tables = {row[0] for row in conn.exec_driver_sql(
+            f"SELECT name FROM {ARCHIVE_SCHEMA}.sqlite_master WHERE type = 'table'"
+        )}
+    for fts_table, (source, archived, columns) in FTS_SOURCES.items():
+        statement = _index_statement(fts_table, columns)
+        for source_table in (source, archived):
+            if source_table is archived and archived.name not in archived_tables:
+                continue
+            query = (
+                f"SELECT id, {', '.join(columns)} FROM {source_table.fullname} "
+                f"WHERE id > ? AND id NOT IN (SELECT rowid FROM {fts_table}) ORDER BY id LIMIT ?"
+            )
+            last_id = 0
+            while True:
+                rows = conn.exec_driver_sql(query, (last_id, chunk_size)).all()
+                if not rows:
+                    break
+                conn.execute(statement, _index_params(rows, columns))
+                last_id = rows[-1][0]
+
+# ORM 事件：帖子和評論的增刪在同一事務中同步到全文索引
+
+@event.listens_for(Post, 'after_insert')
+def _index_post(mapper, connection, post):
+    connection.execute(
+        text('INSERT INTO post_fts(rowid, title, content) VALUES (:id, :title, :content)'),
+        {'id': post.id, 'title': segment(post.title), 'content': segment(post.content)}
+    )
+
+@event.listens_for(Post, 'after_update')
+def _reindex_post(mapper, connection, post):
+    state = db.inspect(post)
+    if not (state.attrs.title.history.has_changes() or state.attrs.content.history.has_changes()):
+        return
+    connection.execute(
+        text('UPDATE post_fts SET title = :title, content = :content WHERE rowid = :id'),
+        {'id': post.id, 'title': segment(post.title), 'content': segment(post.content)}
+    )
+
+@event.listens_for(Post, 'after_delete')
+def _unindex_post(mapper, connection, post):
+    connection.execute(text('DELETE FROM post_fts WHERE rowid = :id'), {'id': post.id})
+
+@event.listens_for(Comment, 'after_insert')
+def _index_comment(mapper, connection, comment):
+    connection.execute(
+        text('INSERT INTO comment_fts(rowid, content) VALUES (:id, :content)'),
+        {'id': comment.id, 'content': segment(comment.content)}
+    )
+
+@event.listens_for(Comment, 'after_delete')
+def _unindex_comment(mapper, connection, comment):
+    connection.execute(text('DELETE FROM comment_fts WHERE rowid = :id'), {'id': comment.id})
+
+def search_post_ids(match, limit, offset=0):
+    """按 BM25 相關度返回匹配的帖子id"""
+    rows = db.session.execute(
+        text(
+            'SELECT rowid FROM post_fts WHERE post_fts MATCH :match '
+            'ORDER BY bm25(post_fts, :title_weight, :content_weight) LIMIT :limit OFFSET :offset'
+        ).columns(column('rowid', Integer)),
+        {'match': match, 'title_weight': POST_TITLE_WEIGHT, 'content_weight': POST_CONTENT_WEIGHT,
+         'limit': limit, 'offset': offset}
+    )
+    return [row[0] for row in rows]
+
+def search_comment_ids(match, limit, offset=0):
+    """按 BM25 相關度返回匹配的評論id"""
+    rows = db.session.execute(
+        text(
+            'SELECT rowid FROM comment_fts WHERE comment_fts MATCH :match '
+            'ORDER BY bm25(comment_fts) LIMIT :limit OFFSET :offset'
+        ).columns(column('rowid', Integer)),
+        {'match': match, 'limit': limit, 'offset': offset}
+    )
+    return [row[0] for row in rows]
+
+def rebuild_search_index(chunk_size=2000):
+    """按id分批重建全文索引（包括歸檔庫中的帖子和評論），返回 (帖子數, 評論數)"""
+    counts = []
+    for table, (source, archived, columns) in FTS_SOURCES.items():
+        db.session.execute(text(f'DELETE FROM {table}'))
+        db.session.commit()
+
+        statement = _index_statement(table, columns)
+        total = 0
+        for source_table in (source, archived) if archive.enabled else (source,):
+            fields = [source_table.c.id] + [source_table.c[column] for column in columns]
+            last_id = 0
+            while True:
+                rows = db.session.execute(
+                    select(*fields).where(source_table.c.id > last_id).order_by(source_table.c.id).limit(chunk_size)
+                ).all()
+                if not rows:
+                    break
+                db.session.execute(statement, _index_params(rows, columns))
+                db.session.commit()
+                last_id = rows[-1][0]
+                total += len(rows)
+        counts.append(total)
+    return tuple(counts)
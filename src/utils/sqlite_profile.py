@@ -0,0 +1,126 @@
+import sqlite3
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# 每個連接建立時執行的 PRAGMA，可通過 SQLITE_PRAGMAS 覆蓋
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -16000,
+    'temp_store': 'MEMORY',
+}
+
+READER_BIND = 'reader'
+
+# 按數據庫生效的 PRAGMA，ATTACH 的數據庫需要單獨設置
+SCHEMA_PRAGMAS = ('journal_mode', 'synchronous', 'cache_size', 'mmap_size')
+
+
+class ReadConnection(sqlite3.Connection):
+    """只讀連接池使用的連接類型，用於在 connect 事件中區分讀寫角色"""
+
+
+class RoutingSession(Session):
+    """按語句把會話路由到讀連接池或唯一的寫連接
+
+    SELECT 走讀連接池；寫語句、flush 以及同一事務中寫操作之後的所有語句都走寫連接，
+    保證事務內讀到自己的寫入。未配置讀連接池時與普通 Session 相同。
+    """
+
+    _use_writer = False
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and READER_BIND in self._db.engines:
+            if not self._use_writer and not self._flushing and clause is not None and clause.is_select:
+                return self._db.engines[READER_BIND]
+            self._use_writer = True
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def _reset_routing(session, transaction):
+    if transaction.parent is None:
+        session._use_writer = False
+
+
+class SQLiteProfile:
+    """SQLite 性能配置：WAL 等連接級 PRAGMA、讀寫分離的連接池
+
+    需要在 db.init_app(app) 之前調用 init_app，以便引擎按這裡的配置創建。
+    寫連接池只有一個連接，寫操作在 Python 側排隊而不是在 SQLite 鎖上忙等；
+    讀連接開啟 query_only，在 WAL 模式下與寫操作並發執行。
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.pragmas = dict(DEFAULT_PRAGMAS)
+        self._listening = False
+
+    def init_app(self, app):
+        uri = app.config.get('SQLALCHEMY_DATABASE_URI', '')
+        self.enabled = False
+        if not uri.startswith('sqlite:///') or app.config.setdefault('SQLITE_PROFILE_ENABLED', True) is False:
+            return
+        self.enabled = True
+
+        self.pragmas = dict(DEFAULT_PRAGMAS, **app.config.setdefault('SQLITE_PRAGMAS', {}))
+        pool_timeout = app.config.setdefault('SQLITE_WRITER_POOL_TIMEOUT', 30)
+
+        engine_options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+        engine_options.setdefault('pool_size', 1)
+        engine_options.setdefault('max_overflow', 0)
+        engine_options.setdefault('pool_timeout', pool_timeout)
+
+        read_pool_size = app.config.setdefault('SQLITE_READ_POOL_SIZE', 8)
+        if read_pool_size:
+            binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+            binds.setdefault(READER_BIND, {
+                'url': uri,
+                'pool_size': read_pool_size,
+                'max_overflow': app.config.setdefault('SQLITE_READ_POOL_OVERFLOW', read_pool_size * 2),
+                'pool_timeout': pool_timeout,
+                'connect_args': {'factory': ReadConnection},
+            })
+
+        if not self._listening:
+            event.listen(Engine, 'connect', self._on_connect)
+            self._listening = True
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        if not self.enabled or not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in self.pragmas.items():
+                if name == 'journal_mode' and isinstance(dbapi_connection, ReadConnection):
+                    # journal_mode 會持久化到數據庫文件，由寫連接設置即可
+                    continue
+                cursor.execute(f'PRAGMA {name}={value}')
+            if isinstance(dbapi_connection, ReadConnection):
+                cursor.execute('PRAGMA query_only=ON')
+        finally:
+            cursor.close()
+
+    def apply_to_schema(self, dbapi_connection, schema):
+        """對 ATTACH 為 schema 的數據庫執行按庫生效的 PRAGMA，在 ATTACH 之後調用
+
+        與主庫相同，journal_mode 只由寫連接設置（讀連接開啟了 query_only）。
+        """
+        if not self.enabled:
+            return
+        cursor = dbapi_connection.cursor()
+        try:
+            for name in SCHEMA_PRAGMAS:
+                if name not in self.pragmas:
+                    continue
+                if name == 'journal_mode' and isinstance(dbapi_connection, ReadConnection):
+                    continue
+                cursor.execute(f'PRAGMA {schema}.{name}={self.pragmas[name]}')
+        finally:
+            cursor.close()
+
+
+sqlite_profile = SQLiteProfile()
@@ -0,0 +1,140 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # brotli 為可選依賴，未安裝時只提供 gzip
+    brotli = None
+
+# 構建工具生成的帶內容哈希的文件名，例如 assets/index-C7MqmNJk.js：
+# Vite/Rollup 默認的 8 位 base64url 哈希，或十六進制哈希，以 - 與文件名相連
+HASHED_NAME = re.compile(r'-([A-Za-z0-9_-]{8}|[0-9a-f]{8,})\.[A-Za-z0-9]+$')
+# 構建輸出目錄（相對於靜態目錄），只有其中的文件可能帶內容哈希
+HASHED_DIR = 'assets'
+
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE = 'no-cache'
+
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml', 'image/x-icon',
+                      'image/vnd.microsoft.icon')
+MIN_COMPRESS_SIZE = 1024
+
+
+class Asset:
+    """內存中的靜態文件及其預壓縮版本"""
+
+    __slots__ = ('body', 'mimetype', 'etag', 'cache_control', 'variants')
+
+    def __init__(self, body, mimetype, cache_control):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.cache_control = cache_control
+        # 編碼 -> 壓縮後的內容
+        self.variants = {}
+
+
+class StaticAssets:
+    """啟動時把前端靜態文件讀入內存並預壓縮，請求時不再訪問文件系統
+
+    構建輸出目錄（STATIC_HASHED_DIR，默認 assets）中帶內容哈希的文件返回長期
+    immutable 緩存頭，其他文件（index.html、config.js 等）每次通過強 ETag 重新驗證。修改靜態文件後需要重啟服務。
+    """
+
+    def __init__(self):
+        self.assets = {}
+        self.hashed_dir = HASHED_DIR
+
+    def init_app(self, app):
+        self.hashed_dir = app.config.setdefault('STATIC_HASHED_DIR', HASHED_DIR).strip('/')
+        self.assets = {}
+        if app.static_folder and os.path.isdir(app.static_folder):
+            self.assets = self._build_manifest(app.static_folder)
+
+    def _build_manifest(self, root):
+        assets = {}
+        precompressed = {}
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                full_path = os.path.join(directory, filename)
+                relative = os.path.relpath(full_path, root).replace(os.sep, '/')
+                with open(full_path, 'rb') as f:
+                    body = f.read()
+                # 構建工具已生成的 .gz / .br 文件直接作為對應文件的壓縮版本
+                if relative.endswith('.gz'):
+                    precompressed[(relative[:-3], 'gzip')] = body
+                    continue
+                if relative.endswith('.br'):
+                    precompressed[(relative[:-3], 'br')] = body
+                    continue
+
+                mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                cache_control = IMMUTABLE_CACHE if self.is_hashed(relative) else REVALIDATE_CACHE
+                assets[relative] = Asset(body, mimetype, cache_control)
+
+        for relative, asset in assets.items():
+            if len(asset.body) < MIN_COMPRESS_SIZE or not asset.mimetype.startswith(COMPRESSIBLE_TYPES):
+                continue
+            for encoding, compress in (('br', _brotli), ('gzip', _gzip)):
+                body = precompressed.get((relative, encoding))
+                if body is None:
+                    body = compress(asset.body)
+                if body is not None and len(body) < len(asset.body):
+                    asset.variants[encoding] = body
+        return assets
+
+    def is_hashed(self, relative):
+        """構建輸出目錄中帶內容哈希的文件，內容變化時文件名隨之改變，可以永久緩存
+
+        哈希中至少要有一個數字或大寫字母，app-settings.js 這類普通文件名不會被當作哈希；
+        判斷不準時寧可按 REVALIDATE_CACHE 返回，也不能讓瀏覽器永遠使用舊文件。
+        """
+        directory, _, filename = relative.rpartition('/')
+        if directory != self.hashed_dir and not directory.startswith(self.hashed_dir + '/'):
+            return False
+        match = HASHED_NAME.search(filename)
+        return match is not None and any(char.isdigit() or char.isupper() for char in match.group(1))
+
+    def get(self, path):
+        return self.assets.get(path)
+
+    def respond(self, asset):
+        """按 Accept-Encoding 選擇壓縮版本，並處理 If-None-Match"""
+        encoding = None
+        for candidate in ('br', 'gzip'):
+            if candidate in asset.variants and request.accept_encodings[candidate]:
+                encoding = candidate
+                break
+
+        # 不同編碼是不同的表示，使用不同的強 ETag
+        etag = f'{asset.etag}-{encoding}' if encoding else asset.etag
+        headers = {
+            'ETag': f'"{etag}"',
+            'Cache-Control': asset.cache_control,
+            'Vary': 'Accept-Encoding',
+        }
+
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers=headers)
+
+        body = asset.variants[encoding] if encoding else asset.body
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        return Response(body, mimetype=asset.mimetype, headers=headers)
+
+
+def _gzip(body):
+    return gzip.compress(body, compresslevel=9, mtime=0)
+
+
+def _brotli(body):
+    if brotli is None:
+        return None
+    return brotli.compress(body, quality=11)
+
+
+static_assets = StaticAssets()
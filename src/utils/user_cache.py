@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+from src.models.user import db, User
+
+
+class CachedUser:
+    """require_auth 使用的輕量用戶記錄，只包含序列化需要的字段"""
+
+    __slots__ = ('id', 'username', 'created_at')
+
+    def __init__(self, id, username, created_at):
+        self.id = id
+        self.username = username
+        self.created_at = created_at
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'username': self.username,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class UserCache:
+    """進程內的已登錄用戶緩存（TTL + LRU）
+
+    緩存命中時 require_auth 不需要查詢數據庫。刪除或修改用戶時需顯式調用 invalidate；
+    其他工作進程中的舊記錄最多保留 USER_CACHE_TTL 秒。
+    """
+
+    def __init__(self, max_size=10000, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def init_app(self, app):
+        self.max_size = app.config.setdefault('USER_CACHE_MAX_SIZE', self.max_size)
+        self.ttl = app.config.setdefault('USER_CACHE_TTL', self.ttl)
+        self.clear()
+
+    def get(self, user_id):
+        """返回用戶記錄，未命中時從數據庫加載；用戶不存在時返回 None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        row = db.session.query(User.id, User.username, User.created_at).filter(User.id == user_id).first()
+        if row is None:
+            self.invalidate(user_id)
+            return None
+
+        user = CachedUser(*row)
+        with self._lock:
+            self._entries[user_id] = (user, now + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return user
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """命中率等統計，用於調整緩存大小"""
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+user_cache = UserCache()
@@ -0,0 +1,73 @@
+import hashlib
+from functools import wraps
+from flask import Response, g, make_response, request
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from src.models.user import db, ContentVersion
+
+# 首頁列表的版本：發帖、帖子點讚、評論增刪時遞增
+FEED_VERSION = 'feed'
+
+def post_version_key(post_id):
+    """單個帖子及其評論列表的版本：帖子點讚、評論增刪、評論點讚時遞增"""
+    return f'post:{post_id}'
+
+def user_likes_version_key(user_id):
+    """用戶點讚狀態的版本：該用戶點讚或取消點讚帖子、評論時遞增
+
+    響應中的 liked_by_user 依賴它，點讚索引也用它判斷緩存的數組是否已被其他進程的切換作廢。
+    """
+    return f'likes:{user_id}'
+
+def bump_versions(*keys):
+    """在當前事務中遞增版本號，與數據修改一起提交；返回 {key: 新版本號}"""
+    table = ContentVersion.__table__
+    versions = {}
+    for key in keys:
+        versions[key] = db.session.execute(
+            insert(table)
+            .values(key=key, version=1)
+            .on_conflict_do_update(index_elements=['key'], set_={'version': table.c.version + 1})
+            .returning(table.c.version)
+        ).scalar_one()
+    return versions
+
+def read_versions(keys):
+    """一條主鍵查詢讀取多個版本號，不存在的視為 0"""
+    rows = db.session.execute(select(ContentVersion.key, ContentVersion.version).where(ContentVersion.key.in_(keys)))
+    versions = dict.fromkeys(keys, 0)
+    versions.update({key: version for key, version in rows})
+    return versions
+
+def conditional_get(keys_fn, also_read=()):
+    """根據版本號生成 ETag，If-None-Match 匹配時在執行視圖之前返回 304
+
+    keys_fn 接收視圖參數並返回相關的版本鍵。ETag 同時包含當前用戶、用戶的點讚版本和
+    完整的查詢路徑，因為響應中有 liked_by_user 且分頁參數不同內容也不同。讀到的版本號
+    （包括 also_read 中不參與 ETag 的鍵）放在 g.content_versions 中供視圖和點讚索引使用。
+    需放在 require_auth 之後。
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # 其他進程中的點讚切換不改變內容版本，但會改變 liked_by_user
+            keys = list(keys_fn(*args, **kwargs)) + [user_likes_version_key(request.current_user.id)]
+            versions = read_versions(keys + [key for key in also_read if key not in keys])
+            g.content_versions = versions
+
+            fingerprint = '|'.join(
+                [str(request.current_user.id), request.full_path] + [f'{key}={versions[key]}' for key in keys]
+            )
+            etag = hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()
+
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
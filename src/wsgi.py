@@ -0,0 +1,15 @@
+"""多進程部署的 WSGI 入口，例如
+
+    flask --app src.main init-db                       # 部署時執行一次
+    SCHEMA_CHECK_ON_STARTUP=0 gunicorn -k gevent -w 8 --preload src.wsgi:app
+
+--preload 時應用只在主進程中創建一次，worker 由 fork 得到，啟動更快；
+fork 後的連接池處理見 src/utils/prefork.py。/api/stream 的 SSE 長連接需要 gevent worker
+（-k gevent），在同步 worker 中該接口返回 503。
+"""
+import os
+from src.main import create_app
+
+app = create_app({
+    'SCHEMA_CHECK_ON_STARTUP': os.environ.get('SCHEMA_CHECK_ON_STARTUP', '1') not in ('0', 'false', 'False'),
+})
@@ -0,0 +1,88 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.main import create_app
+from src.models.user import db, User, Post, Comment
+from src.utils.n_plus_one import QueryBudget
+
+# 測試用配置：密碼哈希在當前線程中用最低強度計算，刪除任務不進入後台線程，
+# 任何請求中出現 N+1 延遲加載都直接報錯
+TEST_CONFIG = {
+    'TESTING': True,
+    'N_PLUS_ONE_MODE': 'raise',
+    'PASSWORD_POOL_WORKERS': 0,
+    'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1',
+    'DELETE_IN_BACKGROUND': False,
+}
+
+
+@pytest.fixture
+def app(request, tmp_path):
+    """每個測試一個新的 SQLite 文件；可用 indirect 參數化覆蓋配置"""
+    config = dict(TEST_CONFIG, SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'app.db'}")
+    config.update(getattr(request, 'param', None) or {})
+    app = create_app(config)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def make_user(app):
+    def make_user(username):
+        with app.app_context():
+            user = User(username=username, invite_code=f'invite-{username}', password_hash='-')
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+    return make_user
+
+
+@pytest.fixture
+def make_post(app):
+    def make_post(user_id, title='title', content='content'):
+        with app.app_context():
+            post = Post(title=title, content=content, user_id=user_id)
+            db.session.add(post)
+            db.session.commit()
+            return post.id
+    return make_post
+
+
+@pytest.fixture
+def make_comment(app):
+    def make_comment(post_id, user_id, content='comment'):
+        with app.app_context():
+            comment = Comment(content=content, post_id=post_id, user_id=user_id)
+            db.session.add(comment)
+            db.session.get(Post, post_id).comments_count += 1
+            db.session.commit()
+            return comment.id
+    return make_comment
+
+
+@pytest.fixture
+def login(app):
+    """返回已登錄指定用戶的 test_client"""
+    def login(user_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = user_id
+        return client
+    return login
+
+
+@pytest.fixture
+def query_budget():
+    """限制代碼塊中的 SQL 語句數和延遲加載次數：
+
+        def test_feed(client, query_budget):
+            with query_budget(max_statements=5, max_lazy_loads=0):
+                client.get('/api/posts')
+    """
+    return QueryBudget
@@ -0,0 +1,105 @@
+import pytest
+from sqlalchemy import insert
+from src.models.user import db, Post, Comment, PostLike, CommentLike
+from src.utils.archive import archive, archived_post
+from src.utils.schema import ensure_schema
+
+
+def _archive_all(app):
+    with app.app_context():
+        return archive.archive_posts(older_than_days=0, idle_days=0, min_pause=0, sleep_ratio=0, log=lambda _: None)
+
+
+@pytest.fixture
+def archived_forum(app, make_user, make_post, make_comment, login):
+    """三個帖子（各帶評論和點讚）已歸檔，主庫中沒有任何帖子；返回用戶id"""
+    user_id = make_user('user')
+    client = login(user_id)
+    for i in range(3):
+        post_id = make_post(user_id, title=f'舊帖子{i}')
+        comment_id = make_comment(post_id, user_id, content=f'舊評論{i}')
+        client.post(f'/api/posts/{post_id}/like')
+        client.post(f'/api/comments/{comment_id}/like')
+    assert _archive_all(app) == 3
+    with app.app_context():
+        assert db.session.query(Post).count() == 0
+    return user_id
+
+
+def test_new_rows_do_not_reuse_archived_ids(app, archived_forum, login):
+    client = login(archived_forum)
+    response = client.post('/api/posts', json={'title': 'new', 'content': 'c'})
+    assert response.status_code == 201
+    post = response.get_json()['post']
+    assert post['id'] > 3
+    assert post['liked_by_user'] is False
+
+    response = client.post(f'/api/posts/{post["id"]}/comments', json={'content': 'new comment'})
+    assert response.status_code == 201
+    assert response.get_json()['comment']['id'] > 3
+
+    # 新帖子和同id範圍內的歸檔帖子都能讀到，點讚狀態互不影響
+    assert client.get(f'/api/posts/{post["id"]}').get_json()['post']['liked_by_user'] is False
+    archived = client.get('/api/posts/1').get_json()['post']
+    assert archived['title'] == '舊帖子0'
+    assert archived['liked_by_user'] is True
+    comments = client.get('/api/posts/1/comments').get_json()['comments']
+    assert [comment['content'] for comment in comments] == ['舊評論0']
+    assert client.get(f'/api/posts/{post["id"]}/comments').get_json()['comments'][0]['liked_by_user'] is False
+
+    assert [item['id'] for item in client.get('/api/search?q=new').get_json()['posts']] == [post['id']]
+    assert len(client.get('/api/search?q=舊帖子').get_json()['posts']) == 3
+
+    with app.app_context():
+        # 新的點讚行也不重用歸檔過的id
+        client.post(f'/api/posts/{post["id"]}/like')
+        assert db.session.query(PostLike.id).filter_by(post_id=post['id']).scalar() > 3
+
+
+def test_comment_on_archived_or_missing_post_returns_404(app, archived_forum, login):
+    client = login(archived_forum)
+    assert client.post('/api/posts/1/comments', json={'content': 'x'}).status_code == 404
+    assert client.post('/api/posts/999/comments', json={'content': 'x'}).status_code == 404
+    assert client.post('/api/posts/1/like').status_code == 404
+
+
+def test_upgrade_to_autoincrement_skips_archived_ids(app, make_user, make_post):
+    user_id = make_user('user')
+    make_post(user_id)
+    with app.app_context():
+        with db.engine.begin() as conn:
+            # 模擬升級前的數據庫：表沒有 AUTOINCREMENT，歸檔庫中已有更大的id
+            for model in (Post, Comment, PostLike, CommentLike):
+                table = model.__table__
+                sql = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE name = ?", (table.name,)).scalar()
+                conn.exec_driver_sql(sql.replace(f'CREATE TABLE {table.name}', 'CREATE TABLE legacy', 1)
+                                     .replace(' AUTOINCREMENT', ''))
+                conn.exec_driver_sql(f'INSERT INTO legacy SELECT * FROM {table.name}')
+                conn.exec_driver_sql(f'DROP TABLE {table.name}')
+                conn.exec_driver_sql(f'ALTER TABLE legacy RENAME TO {table.name}')
+                for index in table.indexes:
+                    index.create(conn)
+            conn.exec_driver_sql('DELETE FROM sqlite_sequence')
+            conn.execute(insert(archived_post).values(id=10, title='t', content='c', user_id=user_id, hot_score=0))
+            conn.exec_driver_sql('PRAGMA user_version = 7')
+
+        assert ensure_schema()
+        with db.engine.connect() as conn:
+            sql = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE name = 'post'").scalar()
+            assert 'AUTOINCREMENT' in sql
+            assert db.session.query(Post).count() == 1
+        post = Post(title='new', content='c', user_id=user_id)
+        db.session.add(post)
+        db.session.commit()
+        assert post.id == 11
+
+
+def test_archive_uses_sqlite_profile_pragmas(app):
+    with app.app_context():
+        archive.ensure_tables()
+        with db.engine.connect() as conn:
+            assert conn.exec_driver_sql('PRAGMA archive.journal_mode').scalar() == 'wal'
+            assert conn.exec_driver_sql('PRAGMA archive.synchronous').scalar() == 1
+        with db.engines['reader'].connect() as conn:
+            assert conn.exec_driver_sql('PRAGMA archive.journal_mode').scalar() == 'wal'
+            assert conn.exec_driver_sql('PRAGMA archive.cache_size').scalar() == -16000
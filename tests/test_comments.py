@@ -0,0 +1,36 @@
+import threading
+from sqlalchemy import func
+from src.models.user import db, Post, Comment
+from src.utils.ranking import hot_score
+
+USERS = 8
+COMMENTS_PER_USER = 10
+
+
+def test_concurrent_comments_keep_count_equal_to_rows(app, make_user, make_post, login):
+    user_ids = [make_user(f'user{i}') for i in range(USERS)]
+    post_id = make_post(user_ids[0])
+    clients = [login(user_id) for user_id in user_ids]
+    barrier = threading.Barrier(USERS)
+    failures = []
+
+    def worker(client):
+        barrier.wait()
+        for i in range(COMMENTS_PER_USER):
+            response = client.post(f'/api/posts/{post_id}/comments', json={'content': f'comment {i}'})
+            if response.status_code != 201:
+                failures.append((response.status_code, response.get_json()))
+
+    threads = [threading.Thread(target=worker, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert failures == []
+
+    with app.app_context():
+        rows = db.session.query(func.count()).select_from(Comment).filter_by(post_id=post_id).scalar()
+        post = db.session.get(Post, post_id)
+        assert rows == post.comments_count == USERS * COMMENTS_PER_USER
+        assert post.hot_score == hot_score(post.likes_count, post.comments_count, post.created_at)
+
@@ -0,0 +1,60 @@
+import pytest
+from src.models.user import db, User, Post, Comment, PostLike
+
+
+@pytest.fixture
+def author(make_user, make_post, make_comment, login):
+    """有帖子、評論和點讚的用戶"""
+    user_id = make_user('author')
+    post_id = make_post(user_id)
+    make_comment(post_id, user_id)
+    login(user_id).post(f'/api/posts/{post_id}/like')
+    return user_id
+
+
+def _content_counts(app, user_id):
+    with app.app_context():
+        return (
+            db.session.query(User).filter_by(id=user_id).count(),
+            db.session.query(Post).filter_by(user_id=user_id).count(),
+            db.session.query(Comment).filter_by(user_id=user_id).count(),
+            db.session.query(PostLike).filter_by(user_id=user_id).count(),
+        )
+
+
+def test_delete_user_requires_login(app, author):
+    assert app.test_client().delete(f'/api/users/{author}').status_code == 401
+    assert _content_counts(app, author) == (1, 1, 1, 1)
+
+
+def test_cannot_delete_other_user(app, author, make_user, login):
+    client = login(make_user('other'))
+    assert client.delete(f'/api/users/{author}').status_code == 403
+    assert _content_counts(app, author) == (1, 1, 1, 1)
+
+
+def test_delete_self(app, author, login):
+    assert login(author).delete(f'/api/users/{author}').status_code == 204
+    assert _content_counts(app, author) == (0, 0, 0, 0)
+
+
+@pytest.mark.parametrize('app', [{'ADMIN_USER_IDS': (1,)}], indirect=True)
+def test_admin_can_delete_any_user(app, make_user, make_post, login):
+    admin_id = make_user('admin')
+    assert admin_id == 1
+    user_id = make_user('user')
+    make_post(user_id)
+    client = login(admin_id)
+    assert client.delete(f'/api/users/{user_id}').status_code == 204
+    assert _content_counts(app, user_id) == (0, 0, 0, 0)
+    assert client.delete('/api/users/999').status_code == 404
+
+
+def test_delete_post_only_by_author(app, author, make_user, login):
+    with app.app_context():
+        post_id = db.session.query(Post.id).filter_by(user_id=author).scalar()
+    assert login(make_user('other')).delete(f'/api/posts/{post_id}').status_code == 403
+    assert login(author).delete(f'/api/posts/{post_id}').status_code == 200
+    with app.app_context():
+        assert db.session.query(Comment).filter_by(post_id=post_id).count() == 0
+        assert db.session.query(PostLike).filter_by(post_id=post_id).count() == 0
@@ -0,0 +1,82 @@
+import pytest
+
+
+def _etag(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    return response.headers['ETag']
+
+
+def _revalidate(client, url, etag):
+    return client.get(url, headers={'If-None-Match': etag}).status_code
+
+
+@pytest.fixture
+def forum(app, make_user, make_post, make_comment, login):
+    author, reader = make_user('author'), make_user('reader')
+    post_id = make_post(author)
+    other_post_id = make_post(author)
+    comment_id = make_comment(post_id, author)
+    return login(author), login(reader), post_id, other_post_id, comment_id
+
+
+URLS = ['/api/posts', '/api/posts/{post_id}', '/api/posts/{post_id}/comments', '/api/posts?ids={post_id}']
+
+
+@pytest.mark.parametrize('url', URLS)
+def test_unchanged_content_returns_304(forum, url):
+    _, reader, post_id, _, _ = forum
+    url = url.format(post_id=post_id)
+    etag = _etag(reader, url)
+    assert _revalidate(reader, url, etag) == 304
+    assert _revalidate(reader, url, '"stale"') == 200
+
+
+@pytest.mark.parametrize('url', URLS)
+@pytest.mark.parametrize('write', ['like_post', 'comment', 'like_comment', 'delete_comment'])
+def test_writes_invalidate_etag(forum, url, write):
+    author, reader, post_id, _, comment_id = forum
+    url = url.format(post_id=post_id)
+    etag = _etag(reader, url)
+
+    if write == 'like_post':
+        assert author.post(f'/api/posts/{post_id}/like').status_code == 200
+    elif write == 'comment':
+        assert author.post(f'/api/posts/{post_id}/comments', json={'content': 'new'}).status_code == 201
+    elif write == 'like_comment':
+        assert author.post(f'/api/comments/{comment_id}/like').status_code == 200
+    else:
+        assert author.delete(f'/api/comments/{comment_id}').status_code == 200
+
+    if write == 'like_comment' and url == '/api/posts':
+        # 評論點讚不改變首頁內容
+        assert _revalidate(reader, url, etag) == 304
+    else:
+        assert _revalidate(reader, url, etag) == 200
+        assert _revalidate(reader, url, _etag(reader, url)) == 304
+
+
+def test_own_like_invalidates_liked_by_user(forum):
+    _, reader, post_id, _, _ = forum
+    url = f'/api/posts/{post_id}'
+    etag = _etag(reader, url)
+    assert reader.post(f'/api/posts/{post_id}/like').status_code == 200
+    response = reader.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['post']['liked_by_user'] is True
+
+
+def test_writes_to_other_posts_keep_etag(forum):
+    author, reader, post_id, other_post_id, _ = forum
+    urls = [f'/api/posts/{post_id}', f'/api/posts/{post_id}/comments']
+    etags = [_etag(reader, url) for url in urls]
+    assert author.post(f'/api/posts/{other_post_id}/comments', json={'content': 'elsewhere'}).status_code == 201
+    assert author.post(f'/api/posts/{other_post_id}/like').status_code == 200
+    assert [_revalidate(reader, url, etag) for url, etag in zip(urls, etags)] == [304, 304]
+
+
+def test_etag_is_per_user(forum):
+    author, reader, post_id, _, _ = forum
+    url = f'/api/posts/{post_id}'
+    assert _revalidate(author, url, _etag(reader, url)) == 200
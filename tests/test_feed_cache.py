@@ -0,0 +1,66 @@
+import random
+import pytest
+from src.models.user import db, Post
+from src.utils.feed_cache import feed_cache
+
+POSTS = 12
+USERS = 4
+OPERATIONS = 40
+
+# 緩存只保存前 5 個帖子，每頁 3 個，分頁會跨過緩存邊界
+SMALL_CACHE = {'FEED_CACHE_MAX_POSTS': 5, 'FEED_CACHE_MAX_PAYLOADS': 8}
+
+
+@pytest.fixture(autouse=True)
+def restore_cache_size(monkeypatch):
+    """init_app 以單例上的當前值作為默認配置，測試結束後恢復，避免小緩存帶到後面的測試"""
+    monkeypatch.setattr(feed_cache, 'max_posts', feed_cache.max_posts)
+    monkeypatch.setattr(feed_cache, 'max_payloads', feed_cache.max_payloads)
+
+
+def _walk_feed(client, limit=3):
+    """沿游標讀完整個首頁，返回 [(id, likes_count, comments_count), ...]"""
+    posts, cursor = [], None
+    while True:
+        url = f'/api/posts?limit={limit}' + (f'&cursor={cursor}' if cursor else '')
+        data = client.get(url).get_json()
+        posts += [(post['id'], post['likes_count'], post['comments_count']) for post in data['posts']]
+        cursor = data['next_cursor']
+        if cursor is None:
+            return posts
+
+
+def _database_feed(app):
+    with app.app_context():
+        rows = db.session.execute(
+            db.select(Post.id, Post.likes_count, Post.comments_count)
+            .order_by(Post.likes_count.desc(), Post.created_at.desc(), Post.id.desc())
+        )
+        return [tuple(row) for row in rows]
+
+
+@pytest.mark.parametrize('app', [SMALL_CACHE], indirect=True)
+def test_cached_feed_matches_database_after_writes(app, make_user, make_post, login):
+    user_ids = [make_user(f'user{i}') for i in range(USERS)]
+    post_ids = [make_post(user_ids[i % USERS], title=f'post {i}') for i in range(POSTS)]
+    clients = {user_id: login(user_id) for user_id in user_ids}
+    reader = clients[user_ids[0]]
+    authors = dict(zip(post_ids, (user_ids[i % USERS] for i in range(POSTS))))
+    rng = random.Random(0)
+
+    assert _walk_feed(reader) == _database_feed(app)
+    for _ in range(OPERATIONS):
+        post_id = rng.choice(post_ids)
+        action = rng.random()
+        if action < 0.6:
+            assert clients[rng.choice(user_ids)].post(f'/api/posts/{post_id}/like').status_code == 200
+        elif action < 0.9:
+            response = clients[rng.choice(user_ids)].post(f'/api/posts/{post_id}/comments', json={'content': 'hi'})
+            assert response.status_code == 201
+        elif len(post_ids) > 3:
+            assert clients[authors[post_id]].delete(f'/api/posts/{post_id}').status_code == 200
+            post_ids.remove(post_id)
+        # 每次寫入後緩存的分頁結果都應與數據庫中的完整排序一致
+        assert _walk_feed(reader) == _database_feed(app)
+
+    assert feed_cache.get_page(None, 3) is not None
@@ -0,0 +1,69 @@
+from src.models.user import db
+from src.utils.liked_index import liked_index
+from src.utils.likes import flip_post_like, flip_comment_like
+from src.utils.versions import FEED_VERSION, bump_versions, post_version_key, user_likes_version_key
+
+
+def _toggle_in_other_process(app, user_id, post_id=None, comment_id=None):
+    """與點讚路由相同的數據庫寫入，但不更新本進程的點讚索引，相當於另一個工作進程中的切換"""
+    with app.app_context():
+        if post_id is not None:
+            flip_post_like(post_id, user_id)
+            bump_versions(FEED_VERSION, post_version_key(post_id), user_likes_version_key(user_id))
+        else:
+            post_id = flip_comment_like(comment_id, user_id)[2]
+            bump_versions(post_version_key(post_id), user_likes_version_key(user_id))
+        db.session.commit()
+
+
+def _post_data(response):
+    data = response.get_json()
+    return data['post'] if 'post' in data else data['posts'][0]
+
+
+def test_like_in_other_process_changes_etag_and_flag(app, make_user, make_post, login):
+    user_id = make_user('user')
+    post_id = make_post(user_id)
+    client = login(user_id)
+
+    liked = False
+    for url in (f'/api/posts/{post_id}', f'/api/posts?ids={post_id}', '/api/posts'):
+        response = client.get(url)
+        assert _post_data(response)['liked_by_user'] is liked
+
+        _toggle_in_other_process(app, user_id, post_id=post_id)
+        liked = not liked
+        response = client.get(url, headers={'If-None-Match': response.headers['ETag']})
+        assert response.status_code == 200
+        assert _post_data(response)['liked_by_user'] is liked
+        assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_index_reloads_after_other_process_toggle(app, make_user, make_post, make_comment, login):
+    user_id = make_user('user')
+    post_id = make_post(user_id)
+    comment_id = make_comment(post_id, user_id)
+    client = login(user_id)
+
+    assert client.get(f'/api/posts/{post_id}').get_json()['post']['liked_by_user'] is False
+    _toggle_in_other_process(app, user_id, post_id=post_id)
+    assert client.get(f'/api/posts/{post_id}').get_json()['post']['liked_by_user'] is True
+
+    assert client.get(f'/api/posts/{post_id}/comments').get_json()['comments'][0]['liked_by_user'] is False
+    _toggle_in_other_process(app, user_id, comment_id=comment_id)
+    assert client.get(f'/api/posts/{post_id}/comments').get_json()['comments'][0]['liked_by_user'] is True
+    assert client.get('/api/search?q=comment&type=comments').get_json()['comments'][0]['liked_by_user'] is True
+
+
+def test_own_toggle_keeps_index_entry(app, make_user, make_post, login):
+    user_id = make_user('user')
+    post_ids = [make_post(user_id) for _ in range(3)]
+    client = login(user_id)
+    client.get('/api/posts')
+    misses = liked_index.stats()['misses']
+
+    client.post(f'/api/posts/{post_ids[1]}/like')
+    posts = client.get('/api/posts').get_json()['posts']
+    assert [post['liked_by_user'] for post in sorted(posts, key=lambda post: post['id'])] == [False, True, False]
+    # 本進程的切換直接更新索引，不需要重新加載
+    assert liked_index.stats()['misses'] == misses
@@ -0,0 +1,70 @@
+import threading
+import pytest
+from sqlalchemy import func
+from src.models.user import db, Post, PostLike, Comment, CommentLike
+from src.utils.like_buffer import like_buffer
+
+USERS = 8
+TOGGLES_PER_USER = 15
+
+DIRECT = {}
+WRITE_BEHIND = {'LIKE_WRITE_BEHIND': True, 'LIKE_FLUSH_INTERVAL_MS': 5, 'LIKE_FLUSH_MAX_EVENTS': 4}
+
+
+def _toggle_concurrently(clients, urls):
+    """每個客戶端在自己的線程中對每個 url 連續切換點讚，所有線程同時開始"""
+    barrier = threading.Barrier(len(clients))
+    failures = []
+
+    def worker(client):
+        barrier.wait()
+        for i in range(TOGGLES_PER_USER):
+            for url in urls:
+                response = client.post(url)
+                if response.status_code != 200:
+                    failures.append((url, response.status_code, response.get_json()))
+
+    threads = [threading.Thread(target=worker, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return failures
+
+
+@pytest.mark.parametrize('app', [DIRECT, WRITE_BEHIND], ids=['direct', 'write-behind'], indirect=True)
+def test_concurrent_toggles_keep_counts_equal_to_like_rows(app, make_user, make_post, make_comment, login):
+    user_ids = [make_user(f'user{i}') for i in range(USERS)]
+    post_id = make_post(user_ids[0])
+    comment_id = make_comment(post_id, user_ids[0])
+    clients = [login(user_id) for user_id in user_ids]
+
+    failures = _toggle_concurrently(clients, [f'/api/posts/{post_id}/like', f'/api/comments/{comment_id}/like'])
+    assert failures == []
+    if like_buffer.enabled:
+        like_buffer.flush()
+
+    with app.app_context():
+        post_likes = db.session.query(func.count()).select_from(PostLike).filter_by(post_id=post_id).scalar()
+        comment_likes = db.session.query(func.count()).select_from(CommentLike).filter_by(comment_id=comment_id).scalar()
+        assert db.session.get(Post, post_id).likes_count == post_likes
+        assert db.session.get(Comment, comment_id).likes_count == comment_likes
+        # 每個用戶切換了奇數次，最終都處於已點讚狀態
+        assert post_likes == comment_likes == USERS
+
+
+def test_double_click_does_not_fail(app, make_user, make_post, login):
+    user_id = make_user('user')
+    post_id = make_post(user_id)
+    clients = [login(user_id) for _ in range(2)]
+
+    assert _toggle_concurrently(clients, [f'/api/posts/{post_id}/like']) == []
+    with app.app_context():
+        likes = db.session.query(func.count()).select_from(PostLike).filter_by(post_id=post_id).scalar()
+        assert db.session.get(Post, post_id).likes_count == likes
+
+
+def test_like_missing_post_returns_404(app, make_user, login):
+    client = login(make_user('user'))
+    assert client.post('/api/posts/999/like').status_code == 404
+    assert client.post('/api/comments/999/like').status_code == 404
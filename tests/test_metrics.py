@@ -0,0 +1,57 @@
+import json
+import os
+import subprocess
+import sys
+import time
+import pytest
+from src.utils.metrics import metrics
+
+
+def _write_snapshot(directory, pid, requests, age=0):
+    path = directory / f'metrics-{pid}.json'
+    counters = [['http_requests_total', [['endpoint', 'other'], ['method', 'GET'], ['status', '200']], requests]]
+    path.write_text(json.dumps({'pid': pid, 'counters': counters, 'histograms': [], 'gauges': []}))
+    if age:
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+@pytest.fixture
+def live_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+    yield process.pid
+    process.kill()
+    process.wait()
+
+
+@pytest.fixture
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def _other_requests(client):
+    for line in client.get('/metrics').get_data(as_text=True).splitlines():
+        if line.startswith('http_requests_total{endpoint="other"'):
+            return int(line.split()[-1])
+    return 0
+
+
+def test_snapshots_of_exited_or_stale_workers_are_not_merged(app, tmp_path, live_pid, dead_pid, monkeypatch):
+    directory = tmp_path / 'metrics'
+    directory.mkdir()
+    monkeypatch.setattr(metrics, 'directory', str(directory))
+    client = app.test_client()
+
+    live = _write_snapshot(directory, live_pid, 3)
+    dead = _write_snapshot(directory, dead_pid, 5)
+    assert _other_requests(client) == 3
+    # 已退出進程的快照被刪除
+    assert live.exists() and not dead.exists()
+
+    # 長時間沒有更新的快照跳過但保留
+    _write_snapshot(directory, live_pid, 3, age=metrics.stale_after + 1)
+    assert _other_requests(client) == 0
+    assert live.exists()
@@ -0,0 +1,23 @@
+import pytest
+
+TOO_LARGE = str(2 ** 63)
+
+
+@pytest.mark.parametrize('ids', [TOO_LARGE, '99999999999999999999', '0', '-1', f'1,{TOO_LARGE}'])
+def test_batch_ids_out_of_range_return_400(app, make_user, make_post, login, ids):
+    user_id = make_user('user')
+    make_post(user_id)
+    assert login(user_id).get(f'/api/posts?ids={ids}').status_code == 400
+
+
+@pytest.mark.parametrize('method,url', [
+    ('get', '/api/posts/{}'),
+    ('post', '/api/posts/{}/like'),
+    ('get', '/api/posts/{}/comments'),
+    ('post', '/api/comments/{}/like'),
+    ('get', '/api/users/{}'),
+])
+def test_routes_with_ids_out_of_range_return_404(app, make_user, login, method, url):
+    client = login(make_user('user'))
+    assert getattr(client, method)(url.format(TOO_LARGE)).status_code == 404
+    assert getattr(client, method)(url.format(2 ** 63 - 1)).status_code == 404
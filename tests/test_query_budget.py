@@ -0,0 +1,87 @@
+import pytest
+from src.models.user import db, Post, Comment, PostLike, CommentLike
+
+POSTS = 20
+COMMENTS_PER_POST = 3
+
+
+@pytest.fixture
+def forum(app, make_user):
+    """幾個用戶、若干帖子和評論，部分已點讚；返回 (用戶id, 評論最多的帖子id)"""
+    user_ids = [make_user(f'user{i}') for i in range(3)]
+    with app.app_context():
+        posts = [Post(title=f'話題 {i}', content=f'內容 {i}', user_id=user_ids[i % 3]) for i in range(POSTS)]
+        db.session.add_all(posts)
+        db.session.flush()
+        comments = [
+            Comment(content=f'評論 {j}', post_id=post.id, user_id=user_ids[j % 3])
+            for post in posts for j in range(COMMENTS_PER_POST)
+        ]
+        db.session.add_all(comments)
+        db.session.flush()
+        db.session.add_all([PostLike(post_id=post.id, user_id=user_ids[0]) for post in posts[::2]])
+        db.session.add_all([CommentLike(comment_id=comment.id, user_id=user_ids[0]) for comment in comments[::2]])
+        for post in posts:
+            post.comments_count = COMMENTS_PER_POST
+        db.session.commit()
+        return user_ids[0], posts[0].id
+
+
+# 以下預算都是緩存為空時的語句數：加載當前用戶、讀取版本號、主查詢、加載點讚索引；
+# 語句數與帖子數和評論數無關，且不允許任何延遲加載
+
+def test_feed_budget(forum, login, query_budget):
+    user_id, _ = forum
+    client = login(user_id)
+    with query_budget(max_statements=4, max_lazy_loads=0):
+        response = client.get('/api/posts?limit=20')
+    posts = response.get_json()['posts']
+    assert len(posts) == POSTS
+    assert sum(post['liked_by_user'] for post in posts) == POSTS // 2
+
+
+@pytest.mark.parametrize('sort', ['hot', 'new'])
+def test_sorted_feed_budget(forum, login, query_budget, sort):
+    user_id, _ = forum
+    client = login(user_id)
+    with query_budget(max_statements=4, max_lazy_loads=0):
+        response = client.get(f'/api/posts?sort={sort}&limit=20')
+    assert len(response.get_json()['posts']) == POSTS
+
+
+def test_post_detail_budget(forum, login, query_budget):
+    user_id, post_id = forum
+    client = login(user_id)
+    with query_budget(max_statements=4, max_lazy_loads=0):
+        response = client.get(f'/api/posts/{post_id}')
+    assert response.get_json()['post']['liked_by_user'] is True
+
+
+def test_comments_budget(forum, login, query_budget):
+    user_id, post_id = forum
+    client = login(user_id)
+    # 另有一條查詢確認帖子在主庫中
+    with query_budget(max_statements=5, max_lazy_loads=0):
+        response = client.get(f'/api/posts/{post_id}/comments')
+    assert len(response.get_json()['comments']) == COMMENTS_PER_POST
+
+
+def test_post_batch_budget(forum, login, query_budget):
+    user_id, _ = forum
+    client = login(user_id)
+    ids = ','.join(str(post_id) for post_id in range(1, POSTS + 1))
+    # 帖子、評論各一條查詢，帖子和評論的點讚索引各加載一次
+    with query_budget(max_statements=6, max_lazy_loads=0):
+        response = client.get(f'/api/posts?ids={ids}&include=comments,me')
+    posts = response.get_json()['posts']
+    assert len(posts) == POSTS
+    assert all(len(post['comments']) == COMMENTS_PER_POST for post in posts)
+
+
+def test_search_budget(forum, login, query_budget):
+    user_id, _ = forum
+    client = login(user_id)
+    # 全文檢索、按id加載帖子、批量取作者用戶名；沒有 ETag，點讚版本號單獨讀取
+    with query_budget(max_statements=6, max_lazy_loads=0):
+        response = client.get('/api/search?q=話題&limit=20')
+    assert len(response.get_json()['posts']) == POSTS
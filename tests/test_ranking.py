@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta
+import pytest
+from src.models.user import db, Post
+from src.utils.ranking import hot_score, rescore
+
+POSTS = 9
+SORT_ORDER = {
+    'hot': (Post.hot_score.desc(), Post.id.desc()),
+    'new': (Post.created_at.desc(), Post.id.desc()),
+}
+
+
+def _rescore(**kwargs):
+    return rescore(sleep_ratio=0, min_pause=0, log=lambda _: None, **kwargs)
+
+
+def _walk(client, sort, limit=2):
+    """沿游標讀完某種排序的全部帖子，返回 id 列表"""
+    ids, cursor = [], None
+    while True:
+        url = f'/api/posts?sort={sort}&limit={limit}' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(url)
+        assert response.status_code == 200
+        data = response.get_json()
+        assert len(data['posts']) <= limit
+        ids += [post['id'] for post in data['posts']]
+        cursor = data['next_cursor']
+        if cursor is None:
+            return ids
+
+
+def _database_order(app, sort):
+    with app.app_context():
+        return list(db.session.execute(db.select(Post.id).order_by(*SORT_ORDER[sort])).scalars())
+
+
+@pytest.fixture
+def forum(app, make_user, make_post, make_comment, login):
+    """帖子的互動數各不相同；其中三個帖子創建時間相同、沒有互動，排序只能靠 id 區分"""
+    user_ids = [make_user(f'user{i}') for i in range(3)]
+    clients = [login(user_id) for user_id in user_ids]
+    post_ids = [make_post(user_ids[0], title=f'post {i}') for i in range(POSTS)]
+    base = datetime(2024, 1, 1)
+    with app.app_context():
+        for i, post_id in enumerate(post_ids):
+            post = db.session.get(Post, post_id)
+            post.created_at = base if i < 3 else base + timedelta(hours=i * 5)
+        db.session.commit()
+    for i, post_id in enumerate(post_ids[3:]):
+        for client in clients[:i % 3 + 1]:
+            client.post(f'/api/posts/{post_id}/like')
+        for _ in range(i % 2):
+            make_comment(post_id, user_ids[1])
+    # 直接修改 created_at 不會更新熱度分
+    _rescore_all(app)
+    return clients[0], post_ids
+
+
+def _rescore_all(app):
+    with app.app_context():
+        _rescore(full=True)
+
+
+@pytest.mark.parametrize('sort', ['hot', 'new'])
+def test_cursor_pages_follow_index_order(app, forum, sort):
+    client, post_ids = forum
+    ids = _walk(client, sort)
+    assert ids == _database_order(app, sort)
+    assert sorted(ids) == sorted(post_ids)
+
+
+def test_hot_order_matches_hot_score(app, forum):
+    client, _ = forum
+    ids = _walk(client, 'hot', limit=100)
+    with app.app_context():
+        posts = [db.session.get(Post, post_id) for post_id in ids]
+        scores = [hot_score(post.likes_count, post.comments_count, post.created_at) for post in posts]
+        assert scores == [post.hot_score for post in posts]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_new_pages_are_stable_under_writes(app, forum, make_post):
+    client, post_ids = forum
+    first = client.get('/api/posts?sort=new&limit=3').get_json()
+    # 讀第一頁之後發帖、點讚，後面的頁不會重複或漏掉原有的帖子
+    make_post(1, title='newer')
+    client.post(f'/api/posts/{post_ids[0]}/like')
+    ids, cursor = [post['id'] for post in first['posts']], first['next_cursor']
+    while cursor:
+        data = client.get(f'/api/posts?sort=new&limit=3&cursor={cursor}').get_json()
+        ids += [post['id'] for post in data['posts']]
+        cursor = data['next_cursor']
+    assert sorted(ids) == sorted(post_ids)
+
+
+def test_cursor_cannot_switch_sort(app, forum):
+    client, _ = forum
+    cursor = client.get('/api/posts?sort=hot&limit=2').get_json()['next_cursor']
+    assert client.get(f'/api/posts?sort=new&cursor={cursor}').status_code == 400
+    assert client.get('/api/posts?sort=hot&cursor=garbage').status_code == 400
+    assert client.get('/api/posts?sort=cold').status_code == 400
+
+
+def test_incremental_rescore_only_touches_active_posts(app, forum):
+    _, post_ids = forum
+    active, idle = post_ids[4], post_ids[5]
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql('UPDATE post SET hot_score = 0 WHERE id IN (%d, %d)' % (active, idle))
+            # 繞過增量更新的寫入，例如批量導入
+            conn.exec_driver_sql(
+                "INSERT INTO post_like (post_id, user_id, created_at) VALUES (%d, 3, CURRENT_TIMESTAMP)" % active
+            )
+            conn.exec_driver_sql('UPDATE post SET likes_count = likes_count + 1 WHERE id = %d' % active)
+        assert _rescore() == {'post': 1, 'comment': 0}
+        assert db.session.get(Post, idle).hot_score == 0
+        db.session.rollback()
+        assert _rescore(full=True)['post'] == 1
+        assert db.session.get(Post, idle).hot_score != 0
+    assert _walk(forum[0], 'hot') == _database_order(app, 'hot')
@@ -0,0 +1,102 @@
+import pytest
+from sqlalchemy import func
+from src.models.user import db, Post, PostLike, Comment, CommentLike
+from src.utils import reconcile
+from src.utils.ranking import hot_score
+
+POSTS = 5
+
+
+@pytest.fixture
+def forum(app, make_user, make_post, make_comment, login):
+    """5 個帖子，第 i 個有 i 條評論，每條評論和帖子都被兩個用戶點讚"""
+    user_ids = [make_user(f'user{i}') for i in range(2)]
+    clients = [login(user_id) for user_id in user_ids]
+    post_ids = [make_post(user_ids[0], title=f'post {i}') for i in range(POSTS)]
+    for i, post_id in enumerate(post_ids):
+        for _ in range(i):
+            comment_id = make_comment(post_id, user_ids[1])
+            for client in clients:
+                client.post(f'/api/comments/{comment_id}/like')
+        for client in clients:
+            client.post(f'/api/posts/{post_id}/like')
+    return clients[0], post_ids
+
+
+def _drift(statement):
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql(statement)
+
+
+def _assert_counts_match(app):
+    with app.app_context():
+        for post in db.session.query(Post):
+            assert post.likes_count == db.session.query(func.count(PostLike.id)).filter_by(post_id=post.id).scalar()
+            assert post.comments_count == db.session.query(func.count(Comment.id)).filter_by(post_id=post.id).scalar()
+            assert post.hot_score == hot_score(post.likes_count, post.comments_count, post.created_at)
+        for comment in db.session.query(Comment):
+            likes = db.session.query(func.count(CommentLike.id)).filter_by(comment_id=comment.id).scalar()
+            assert comment.likes_count == likes
+
+
+def _run(**kwargs):
+    return reconcile.reconcile_counters(chunk_size=2, sleep_ratio=0, min_pause=0, log=lambda _: None, **kwargs)
+
+
+def test_reconcile_fixes_drifted_counters(app, forum):
+    client, post_ids = forum
+    with app.app_context():
+        _drift('UPDATE post SET likes_count = 50, comments_count = 0 WHERE id IN (%d, %d)' % (post_ids[1], post_ids[4]))
+        _drift('UPDATE comment SET likes_count = -3 WHERE id = (SELECT MIN(id) FROM comment)')
+        assert _run() == {'post': (POSTS, 2), 'comment': (10, 1)}
+        assert reconcile.load_checkpoint('post') == reconcile.load_checkpoint('comment') == 0
+        # 沒有漂移時再運行一輪不修改任何記錄
+        assert _run() == {'post': (POSTS, 0), 'comment': (10, 0)}
+    _assert_counts_match(app)
+
+    # 首頁緩存隨之更新，帖子按校正後的點讚數排序
+    posts = client.get('/api/posts').get_json()['posts']
+    assert {post['likes_count'] for post in posts} == {2}
+    assert [post['id'] for post in posts] == sorted(post_ids, reverse=True)
+
+
+def test_interrupted_run_resumes_from_checkpoint(app, forum, monkeypatch):
+    _, post_ids = forum
+    with app.app_context():
+        _drift('UPDATE post SET likes_count = likes_count + 7')
+
+        # 第一批之後中斷，斷點停在第二個帖子
+        def interrupt(seconds):
+            raise KeyboardInterrupt
+        monkeypatch.setattr(reconcile.time, 'sleep', interrupt)
+        with pytest.raises(KeyboardInterrupt):
+            _run(names=['post'])
+        monkeypatch.undo()
+        db.session.rollback()
+        assert reconcile.load_checkpoint('post') == post_ids[1]
+
+        # 斷點之前漂移的計數器這一輪不會再檢查
+        _drift('UPDATE post SET comments_count = 99 WHERE id = %d' % post_ids[0])
+        logs = []
+        results = reconcile.reconcile_counters(['post'], chunk_size=2, sleep_ratio=0, min_pause=0, log=logs.append)
+        assert results == {'post': (POSTS - 2, POSTS - 2)}
+        assert logs[0] == f'post: 從 id {post_ids[1]} 之後繼續'
+        assert db.session.get(Post, post_ids[0]).comments_count == 99
+        assert reconcile.load_checkpoint('post') == 0
+
+        # 下一輪從頭開始
+        assert _run(names=['post']) == {'post': (POSTS, 1)}
+    _assert_counts_match(app)
+
+
+def test_restart_ignores_checkpoint(app, forum):
+    _, post_ids = forum
+    with app.app_context():
+        reconcile.save_checkpoint('post', post_ids[-1])
+        db.session.commit()
+        _drift('UPDATE post SET likes_count = 0')
+        assert _run(names=['post']) == {'post': (0, 0)}
+        reconcile.save_checkpoint('post', post_ids[-1])
+        db.session.commit()
+        assert _run(names=['post'], restart=True) == {'post': (POSTS, POSTS)}
+    _assert_counts_match(app)
@@ -0,0 +1,45 @@
+from src.models.user import db
+from src.utils.schema import SCHEMA_VERSION, ensure_schema, get_schema_version
+
+
+def test_search_finds_new_posts_and_comments(app, make_user, login):
+    client = login(make_user('user'))
+    post_id = client.post('/api/posts', json={'title': '今天天氣很好', 'content': 'hello world'}).get_json()['post']['id']
+    client.post(f'/api/posts/{post_id}/comments', json={'content': '同意，天氣不錯'})
+
+    posts = client.get('/api/search?q=天氣').get_json()['posts']
+    assert [post['id'] for post in posts] == [post_id]
+    comments = client.get('/api/search?q=不錯&type=comments').get_json()['comments']
+    assert [comment['content'] for comment in comments] == ['同意，天氣不錯']
+
+
+def test_upgrade_indexes_existing_rows(app, make_user, make_post, make_comment, login):
+    user_id = make_user('user')
+    post_id = make_post(user_id, title='舊帖子', content='升級之前發布')
+    make_comment(post_id, user_id, content='舊評論')
+    with app.app_context():
+        # 模擬升級前的數據庫：沒有全文索引表，結構版本為 1
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql('DROP TABLE post_fts')
+            conn.exec_driver_sql('DROP TABLE comment_fts')
+            conn.exec_driver_sql('PRAGMA user_version = 1')
+        assert ensure_schema()
+        with db.engine.connect() as conn:
+            assert get_schema_version(conn) == SCHEMA_VERSION
+
+    client = login(user_id)
+    assert [post['id'] for post in client.get('/api/search?q=舊帖子').get_json()['posts']] == [post_id]
+    assert len(client.get('/api/search?q=舊評論&type=comments').get_json()['comments']) == 1
+
+
+def test_upgrade_fills_empty_index_left_by_version_2(app, make_user, make_post, login):
+    user_id = make_user('user')
+    post_id = make_post(user_id, title='漏掉的帖子')
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql('DELETE FROM post_fts')
+            conn.exec_driver_sql('PRAGMA user_version = 6')
+        assert ensure_schema()
+
+    client = login(user_id)
+    assert [post['id'] for post in client.get('/api/search?q=漏掉').get_json()['posts']] == [post_id]
@@ -0,0 +1,17 @@
+from src.main import create_app
+from src.models.user import db
+from src.utils.archive import archive
+
+
+def test_startup_on_current_schema_reads_only_user_version(app, query_budget):
+    # 第一次創建應用時已完成建表和升級；同一數據庫上再次啟動只讀取結構版本
+    with query_budget(max_statements=1) as budget:
+        create_app(app.config)
+    assert budget.statements == ['PRAGMA user_version']
+
+
+def test_new_database_gets_archive_tables(app):
+    with app.app_context():
+        names = {row[0] for row in db.session.execute(db.text("SELECT name FROM archive.sqlite_master"))}
+    assert {'post', 'comment', 'post_like', 'comment_like'} <= names
+    assert archive.enabled
@@ -0,0 +1,31 @@
+import pytest
+from src.utils.static_assets import IMMUTABLE_CACHE, REVALIDATE_CACHE, static_assets
+
+
+@pytest.mark.parametrize('path, hashed', [
+    ('assets/index-C7MqmNJk.js', True),
+    ('assets/index-BBFIUfkp.css', True),
+    ('assets/vendor-3f9a1c2b7d.js', True),
+    ('assets/chunks/page-a1B2c3D4.js', True),
+    ('assets/app-settings.js', False),
+    ('assets/form.validate.js', False),
+    ('assets/jquery.min_bundle.css', False),
+    ('index-C7MqmNJk.js', False),
+    ('lib/index-C7MqmNJk.js', False),
+    ('config.js', False),
+])
+def test_only_bundler_hashes_are_immutable(app, path, hashed):
+    assert static_assets.is_hashed(path) is hashed
+
+
+def test_cache_headers(app):
+    client = app.test_client()
+    assert client.get('/assets/index-C7MqmNJk.js').headers['Cache-Control'] == IMMUTABLE_CACHE
+    for path in ('/config.js', '/index.html', '/some/spa/route'):
+        assert client.get(path).headers['Cache-Control'] == REVALIDATE_CACHE
+
+
+def test_if_none_match(app):
+    client = app.test_client()
+    etag = client.get('/config.js').headers['ETag']
+    assert client.get('/config.js', headers={'If-None-Match': etag}).status_code == 304
@@ -0,0 +1,18 @@
+import pytest
+from src.utils.event_hub import event_hub
+
+
+def test_stream_requires_async_worker(app, make_user, login):
+    response = login(make_user('user')).get('/api/stream')
+    assert response.status_code == 503
+
+
+@pytest.mark.parametrize('app', [{'EVENT_STREAM_REQUIRE_ASYNC': False}], indirect=True)
+def test_stream_delivers_published_events(app, make_user, login):
+    response = login(make_user('user')).get('/api/stream', buffered=False)
+    assert response.status_code == 200
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b'retry:')
+    event_hub.publish('post_liked', {'post_id': 1, 'likes_count': 3})
+    assert b'event: post_liked' in next(chunks)
+    response.close()